@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the pipeline from kernel messages to rendered output.
+
+Each scenario runs in its own process with an offscreen Qt platform. It builds a Receiver, feeds
+synthetic kernel messages through Importer.convert in bursts, posting the items converted to the receiver
+as TabContent does, processing events between bursts as the event loop would, and waits until the receiver
+is idle, with all output rendered. It reports messages per second,
+percentiles of the time from conversion to rendering, render times per item class and peak RSS.
+
+Results are stored as JSON in benchmarks/results/<version>.json and compared to the results of the
+most recent other version stored there, so that regressions show up between releases.
+
+    python benchmarks/pipeline.py                       # run all scenarios
+    python benchmarks/pipeline.py line_flood chatter    # run some scenarios
+    python benchmarks/pipeline.py --list                # list the scenarios
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+results_dir = os.path.join(here, 'results')
+sys.path.insert(0, os.path.dirname(here))  # benchmark the working tree
+
+
+def _message(msg_type, content, username='alice', parent_username=None):
+    """
+    Raw kernel message.
+    :param msg_type: message type.
+    :param content: message content.
+    :param username: user name in the header.
+    :param parent_username: user name in the parent header; username if None.
+    :return: dict.
+    """
+    return {'header': {'msg_type': msg_type, 'msg_id': str(uuid.uuid4()), 'username': username,
+                       'session': 'benchmark', 'date': datetime.utcnow().isoformat(), 'version': '5.0'},
+            'parent_header': {'username': parent_username if parent_username is not None else username,
+                              'session': 'benchmark'},
+            'metadata': {},
+            'content': content}
+
+
+def _stream(text, name='stdout', username='alice'):
+    return _message('stream', {'name': name, 'text': text}, username)
+
+
+def _png(size):
+    """
+    Base64 encoded png image.
+    :param size: width and height in pixels.
+    :return: str.
+    """
+    from qtconsole.qt import QtGui, QtCore
+    image = QtGui.QImage(size, size, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(40, 120, 200))
+    data = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(data)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return base64.b64encode(bytes(data)).decode('ascii')
+
+
+_svg = '<svg xmlns="http://www.w3.org/2000/svg" width="120" height="80">' \
+       '<rect x="{0}" y="10" width="40" height="40" fill="blue"/></svg>'
+
+
+def line_flood():
+    """20000 one-line stream messages."""
+    for burst in range(100):
+        yield [_stream('line {}\n'.format(burst * 200 + i)) for i in range(200)]
+
+
+def large_writes():
+    """20 stream messages of 20000 lines each."""
+    text = ''.join('row {:06d} of a large single write\n'.format(i) for i in range(20000))
+    for _ in range(20):
+        yield [_stream(text)]
+
+
+def ansi_text():
+    """10000 lines of colored text."""
+    for burst in range(50):
+        yield [_stream('\x1b[3{}mcolored\x1b[0m line \x1b[1m{}\x1b[0m\n'.format(i % 8, burst * 200 + i))
+               for i in range(200)]
+
+
+def progress_bar():
+    """20000 carriage-return progress updates."""
+    for burst in range(100):
+        yield [_stream('\r{:5d}/20000 [{:<50}]'.format(burst * 200 + i, '#' * ((burst * 200 + i) // 400)),
+                       name='stderr') for i in range(200)]
+    yield [_stream('\n', name='stderr')]
+
+
+def images():
+    """200 png and 200 svg displays."""
+    png = _png(200)
+    for burst in range(20):
+        messages = list()
+        for i in range(10):
+            messages.append(_message('display_data', {'data': {'image/png': png, 'text/plain': 'png'},
+                                                      'metadata': {}}))
+            messages.append(_message('display_data', {'data': {'image/svg+xml': _svg.format(burst * 10 + i)},
+                                                      'metadata': {}}))
+        yield messages
+
+
+def clear_animation():
+    """2000 frames of clear_output(wait=True) followed by a stream."""
+    for burst in range(100):
+        messages = list()
+        for i in range(20):
+            messages.append(_message('clear_output', {'wait': True}))
+            messages.append(_stream('frame {}\n'.format(burst * 20 + i)))
+        yield messages
+
+
+def chatter():
+    """50 users exchanging 2000 inputs and results."""
+    count = 0
+    for burst in range(200):
+        messages = list()
+        for i in range(5):
+            count += 1
+            user = 'user{:02d}'.format(count % 50)
+            code = '#hello from {} number {}'.format(user, count) if count % 2 else 'x = {}'.format(count)
+            messages.append(_message('execute_input', {'code': code, 'execution_count': count}, user))
+            messages.append(_message('execute_result', {'data': {'text/plain': str(count)}, 'metadata': {},
+                                                        'execution_count': count}, user))
+        yield messages
+
+
+scenarios = [line_flood, large_writes, ansi_text, progress_bar, images, clear_animation, chatter]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_scenario(name):
+    """
+    Run a scenario in this process.
+    :param name: name of the scenario.
+    :return: dict of results.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qtconsole.qt import QtGui, QtCore
+    app = QtGui.QApplication.instance() or QtGui.QApplication([])
+
+    from chconsole.messages import KernelMessage
+    from chconsole.receiver import receiver_template
+    from chconsole.tab import Importer
+
+    class Host(QtCore.QObject):
+        show_other = True  # show messages of all clients, like a tab in a shared session
+
+    host = Host()
+    receiver = receiver_template(QtGui.QTextEdit)()
+    receiver.resize(800, 600)
+    receiver.show()
+    importer = Importer(host, client_id='benchmark-client', user_name='alice')
+    importer.please_process.connect(receiver.post)
+
+    converted = list()  # time of conversion of each message not known to be rendered
+    latencies = list()
+
+    def rendered():
+        now = time.perf_counter()
+        latencies.extend(now - stamp for stamp in converted)
+        del converted[:]
+
+    receiver.output_rendered.connect(rendered)
+
+    bursts = [[KernelMessage(raw) for raw in burst] for burst in globals()[name]()]
+    count = sum(len(burst) for burst in bursts)
+    size = sum(len(json.dumps(msg.raw)) for burst in bursts for msg in burst)
+
+    start = time.perf_counter()
+    for burst in bursts:
+        for msg in burst:
+            importer.convert(msg)
+            converted.append(time.perf_counter())
+        app.processEvents()
+    while converted or not receiver.idle:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    elapsed = time.perf_counter() - start
+
+    metrics = receiver.metrics.snapshot()
+    render = {histogram[len('render_ms.'):]: {key: summary[key] for key in ('count', 'mean', 'p50', 'p95', 'max')}
+              for histogram, summary in metrics['histograms'].items() if histogram.startswith('render_ms.')}
+    return {'scenario': name,
+            'messages': count,
+            'message_bytes': size,
+            'seconds': elapsed,
+            'messages_per_second': count / elapsed if elapsed else 0.0,
+            'latency_ms': {'p50': _percentile(latencies, 0.5) * 1000, 'p95': _percentile(latencies, 0.95) * 1000,
+                           'p99': _percentile(latencies, 0.99) * 1000, 'max': max(latencies or [0]) * 1000},
+            'render_ms': render,
+            'flushes': metrics['histograms'].get('flush.ms', {}).get('count', 0),
+            'gauges': metrics['gauges'],
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def _previous_results(version):
+    """
+    Stored results of the most recent other version.
+    :param version: current version.
+    :return: dict or None if there are none.
+    """
+    paths = [path for path in glob.glob(os.path.join(results_dir, '*.json'))
+             if os.path.basename(path) != version + '.json']
+    if not paths:
+        return None
+    with open(max(paths, key=os.path.getmtime)) as f:
+        return json.load(f)
+
+
+def _report(results, previous):
+    """
+    Print results, compared to previous results if available.
+    :param results: dict of results.
+    :param previous: dict of previous results or None.
+    :return:
+    """
+    before = {entry['scenario']: entry for entry in previous['scenarios']} if previous else dict()
+    if previous:
+        print('compared to version {}'.format(previous['version']))
+    print('{:<16} {:>10} {:>12} {:>10} {:>10} {:>10}'.format('scenario', 'msgs/s', 'change', 'p50 ms',
+                                                             'p95 ms', 'rss MB'))
+    for entry in results['scenarios']:
+        old = before.get(entry['scenario'], None)
+        change = '{:+.1%}'.format(entry['messages_per_second'] / old['messages_per_second'] - 1) \
+            if old and old['messages_per_second'] else ''
+        print('{:<16} {:>10.0f} {:>12} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            entry['scenario'], entry['messages_per_second'], change, entry['latency_ms']['p50'],
+            entry['latency_ms']['p95'], entry['peak_rss_kb'] / 1024))
+
+
+def main():
+    from chconsole import __version__
+
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline from kernel messages to rendered output.')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run; all if none are given')
+    parser.add_argument('--list', action='store_true', help='list the scenarios')
+    parser.add_argument('--output', default=os.path.join(results_dir, __version__ + '.json'),
+                        help='file to store the results')
+    parser.add_argument('--in-process', metavar='SCENARIO', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in scenarios:
+            print('{:<16} {}'.format(scenario.__name__, scenario.__doc__))
+        return
+    if args.in_process:
+        print(json.dumps(run_scenario(args.in_process)))
+        return
+
+    names = args.scenarios or [scenario.__name__ for scenario in scenarios]
+    unknown = set(names) - set(scenario.__name__ for scenario in scenarios)
+    if unknown:
+        parser.error('unknown scenarios: ' + ', '.join(sorted(unknown)))
+
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    results = {'version': __version__, 'date': datetime.utcnow().isoformat(), 'python': platform.python_version(),
+               'platform': platform.platform(), 'scenarios': list()}
+    for name in names:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--in-process', name], env=env)
+        results['scenarios'].append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+
+    previous = _previous_results(__version__)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    _report(results, previous)
+    print('results stored in ' + args.output)
+
+
+if __name__ == '__main__':
+    main()
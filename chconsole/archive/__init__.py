@@ -0,0 +1,5 @@
+from .spool import Spool, default_spool_dir
+from .pool import ConnectionPool, pool_key, shared_pool, close_pools
+from .archiver import Archiver, extended_dumps
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
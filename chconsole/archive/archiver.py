@@ -0,0 +1,329 @@
+import json
+import datetime
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extras
+from traitlets.config.configurable import LoggingConfigurable
+
+from .spool import encode_record, decode_record
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class _DateTimeEncoder(json.JSONEncoder):
+    """ To encode datetime.datetime ocrring in kernel message dicts."""
+    def default(self, obj):
+        if isinstance(obj, datetime.datetime):
+            return str(obj.timestamp())
+        else:
+            return json.JSONEncoder.default(self, obj)
+
+
+def extended_dumps(obj, *args, **kwargs):
+    """
+    Extend dumps with DateTimeEncoder.
+    :param: obj to be encoded as json.
+    :return: json.
+    """
+    return json.dumps(obj, *args, cls=_DateTimeEncoder, **kwargs)
+
+
+class Archiver(LoggingConfigurable):
+    """
+    Archive kernel messages in the importer table of a database.
+    Messages are put into a bounded in-memory queue, from which a writer thread appends them in batches
+    to a local Spool. A replayer thread drains the sealed segments of the spool to the database,
+    one transaction per segment, and keeps them while the database is unreachable.
+    So archiving neither stalls the thread that puts the messages nor loses them during database outages.
+    With dedup, rows carry the id of the kernel message and a message already archived, e.g. by another client
+    of the same kernel, is not inserted again. This relies on a unique index on msg_id of the importer table;
+    without it, rows are inserted as without dedup.
+    """
+    overflow_policies = ('drop_oldest', 'drop_newest', 'block')
+
+    queue_size = 10000  # maximum number of rows waiting to be spooled
+    batch_size = 200  # maximum number of rows spooled at once
+    flush_interval = 1.0  # seconds to wait for a batch to fill up before spooling it anyway
+    overflow = 'drop_oldest'  # what to do with a row if the queue is full; one of overflow_policies
+    block_timeout = 0.5  # seconds to wait for space in the queue with overflow == 'block'
+    replay_interval = 1.0  # seconds between looking for sealed segments
+    dedup = False  # whether to archive each kernel message only once
+    max_backoff = 60.0  # maximum seconds to wait before retrying the database
+
+    queued = 0  # number of rows accepted into the queue
+    spooled = 0  # number of rows appended to the spool
+    written = 0  # number of rows written to the database
+    dropped = 0  # number of rows dropped because of overflow or malformed data
+
+    _pool = None  # ConnectionPool of the database
+    _spool = None  # Spool
+    _rows = None  # deque of rows waiting to be spooled
+    _lock = None  # threading.Condition guarding _rows and the counters
+    _writer = None  # threading.Thread spooling the rows
+    _replayer = None  # threading.Thread replaying the spool
+    _stop_replay = None  # threading.Event to stop the replayer
+    _closing = False  # whether the writer should spool the remaining rows and stop
+
+    _unique_msg_id = False  # whether the importer table has been found to have a unique index on msg_id
+    _missing_msg_id_logged = False  # whether the missing unique index on msg_id has been logged
+
+    _insert = 'insert into importer (client_id, user_name, chat_secret, msg_raw) values %s;'
+    _template = '(%s, %s, %s, %s::jsonb)'
+    _insert_once = 'insert into importer (client_id, user_name, chat_secret, msg_id, msg_raw) values %s ' \
+                   'on conflict (msg_id) do nothing;'
+    _template_once = '(%s, %s, %s, %s, %s::jsonb)'
+
+    def __init__(self, pool, spool, queue_size=10000, batch_size=200, flush_interval=1.0,
+                 overflow='drop_oldest', replay_interval=1.0, dedup=False, **kwargs):
+        """
+        Initialize and start the writer and replayer threads.
+        :param pool: ConnectionPool of the database with the importer table; only used by the replayer thread.
+        :param spool: Spool for the rows.
+        :param queue_size: maximum number of rows waiting to be spooled.
+        :param batch_size: maximum number of rows spooled at once.
+        :param flush_interval: seconds to wait for a batch to fill up before spooling it anyway.
+        :param overflow: 'drop_oldest', 'drop_newest' or 'block' (for at most block_timeout seconds);
+            'block' only for callers that may wait, not for the GUI thread.
+        :param replay_interval: seconds between looking for sealed segments.
+        :param dedup: whether to archive each kernel message only once.
+        :param kwargs: arguments for LoggingConfigurable.
+        """
+        super(Archiver, self).__init__(**kwargs)
+        if overflow not in self.overflow_policies:
+            raise ValueError('Unknown overflow policy: {}'.format(overflow))
+        self._pool = pool
+        self._spool = spool
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.replay_interval = replay_interval
+        self.dedup = dedup
+
+        self._rows = deque()
+        self._lock = threading.Condition()
+        self._stop_replay = threading.Event()
+        self._writer = threading.Thread(target=self._run, name='chconsole-archiver', daemon=True)
+        self._writer.start()
+        self._replayer = threading.Thread(target=self._replay, name='chconsole-replayer', daemon=True)
+        self._replayer.start()
+
+    def put(self, client_id, user_name, chat_secret, msg_raw, shared=True):
+        """
+        Queue a kernel message for archiving; does not wait for the disk or the database.
+        :param client_id: id of the client that received the message.
+        :param user_name: name of the user of the client.
+        :param chat_secret: secret of the chat session.
+        :param msg_raw: kernel message dict.
+        :param shared: whether other clients may archive the message too, so that it is deduplicated with dedup.
+        :return: True if the message has been queued.
+        """
+        row = (client_id, user_name, chat_secret, msg_raw, shared)
+        with self._lock:
+            if self._closing:
+                self.dropped += 1
+                return False
+            if len(self._rows) >= self.queue_size:
+                if self.overflow == 'block':
+                    self._lock.wait_for(lambda: len(self._rows) < self.queue_size, self.block_timeout)
+                if len(self._rows) >= self.queue_size:
+                    if self.overflow == 'drop_oldest':
+                        self._rows.popleft()
+                        self.dropped += 1
+                    else:
+                        self.dropped += 1
+                        return False
+            self._rows.append(row)
+            self.queued += 1
+            if len(self._rows) >= self.batch_size:
+                self._lock.notify_all()
+        return True
+
+    @property
+    def pending(self):
+        """
+        Number of rows waiting to be spooled.
+        :return: int.
+        """
+        with self._lock:
+            return len(self._rows)
+
+    @property
+    def stats(self):
+        """
+        Counters of the archiver.
+        :return: dict with the number of rows queued, spooled, written, dropped and pending.
+        """
+        with self._lock:
+            return {'queued': self.queued, 'spooled': self.spooled, 'written': self.written,
+                    'dropped': self.dropped, 'pending': len(self._rows)}
+
+    def close(self, timeout=5.0, wait=False):
+        """
+        Spool the remaining rows, seal the spool and stop the threads.
+        The replayer is only signalled to stop, since it may be waiting for the database; a segment it is replaying
+        is finished or recovered later. Segments not yet replayed stay in the spool for the next archiver.
+        :param timeout: seconds to wait for the writer, which only waits for the local disk,
+                        and with wait for the replayer.
+        :param wait: whether to wait for the replayer to stop; not for the GUI thread.
+        :return:
+        """
+        with self._lock:
+            self._closing = True
+            self._lock.notify_all()
+        if self._writer.is_alive() and self._writer is not threading.current_thread():
+            self._writer.join(timeout)
+        self._spool.close()
+        self._stop_replay.set()
+        if wait and self._replayer.is_alive() and self._replayer is not threading.current_thread():
+            self._replayer.join(timeout)
+
+    def _next_batch(self):
+        """
+        Wait for a full batch, the flush interval or closing, whichever comes first.
+        :return: list of rows; empty if there are none.
+        """
+        with self._lock:
+            self._lock.wait_for(lambda: self._rows or self._closing, self._spool.segment_age)
+            deadline = time.monotonic() + self.flush_interval
+            while self._rows and len(self._rows) < self.batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            count = min(len(self._rows), self.batch_size)
+            batch = [self._rows.popleft() for _ in range(count)]
+            self._lock.notify_all()  # wake producers blocked by overflow == 'block'
+            return batch
+
+    def _run(self):
+        """
+        Writer thread: spool batches until closing and all rows are spooled.
+        :return:
+        """
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            else:
+                with self._lock:
+                    if self._closing:
+                        break
+            self._spool.seal()  # seal idle segments so that they can be replayed
+
+    def _write(self, batch):
+        """
+        Append a batch of rows to the spool.
+        :param batch: list of rows.
+        :return:
+        """
+        records = list()
+        for client_id, user_name, chat_secret, msg_raw, shared in batch:
+            try:
+                msg_id = msg_raw['header']['msg_id'] if self.dedup and shared else None
+                records.append(encode_record(client_id, user_name, chat_secret, msg_id, extended_dumps(msg_raw)))
+            except (TypeError, KeyError):
+                pass
+                # drop it
+        spooled = 0
+        try:
+            self._spool.append(records)
+            spooled = len(records)
+        except OSError as e:
+            self.log.warn('spooling %i messages failed: %s', len(records), e)
+        with self._lock:
+            self.spooled += spooled
+            self.dropped += len(batch) - spooled
+
+    def _replay(self):
+        """
+        Replayer thread: write the sealed segments of the spool to the database, retrying with backoff.
+        :return:
+        """
+        backoff = self.replay_interval
+        try:
+            self._spool.recover()
+        except OSError as e:
+            self.log.warn('recovering the archive spool failed: %s', e)
+        while not self._stop_replay.is_set():
+            try:
+                claimed = self._spool.claim()
+            except OSError as e:
+                self.log.warn('reading the archive spool failed: %s', e)
+                claimed = None
+            if claimed is None:
+                self._stop_replay.wait(self.replay_interval)
+                continue
+            if self._replay_segment(claimed):
+                backoff = self.replay_interval
+            else:
+                self._stop_replay.wait(backoff)
+                backoff = min(2 * backoff, self.max_backoff)
+
+    def _replay_segment(self, claimed):
+        """
+        Write a claimed segment to the database in one transaction and remove it.
+        :param claimed: path of the segment.
+        :return: whether the segment has been written.
+        """
+        values = list()
+        malformed = 0
+        try:
+            for line in self._spool.read(claimed):
+                try:
+                    values.append(decode_record(line))
+                except ValueError:
+                    malformed += 1  # torn by a crash while writing
+        except OSError as e:
+            self.log.warn('reading %s failed: %s', claimed, e)
+            self._spool.release(claimed)
+            return False
+        if not values:
+            self._spool.remove(claimed)
+            with self._lock:
+                self.dropped += malformed
+            return True
+
+        def insert(conn):
+            with conn.cursor() as cur:
+                if self.dedup and self._has_unique_msg_id(cur):
+                    psycopg2.extras.execute_values(cur, self._insert_once, values,
+                                                   template=self._template_once, page_size=1000)
+                else:
+                    rows = [(client_id, user_name, chat_secret, msg_json)
+                            for client_id, user_name, chat_secret, msg_id, msg_json in values]
+                    psycopg2.extras.execute_values(cur, self._insert, rows,
+                                                   template=self._template, page_size=1000)
+
+        try:
+            self._pool.run(insert)
+        except psycopg2.Error as e:
+            self.log.warn('archiving %i messages failed, keeping them for later: %s', len(values), e)
+            self._spool.release(claimed)
+            return False
+        self._spool.remove(claimed)
+        with self._lock:
+            self.written += len(values)
+            self.dropped += malformed
+        return True
+
+    def _has_unique_msg_id(self, cur):
+        """
+        Determine whether the importer table has the unique index on msg_id that dedup relies on.
+        Once found, the index is assumed to stay; until then, it is looked up again for every segment replayed,
+        so that a migration of the table is picked up without restarting.
+        :param cur: psycopg2 cursor.
+        :return: bool.
+        """
+        if not self._unique_msg_id:
+            cur.execute("select 1 from pg_indexes where tablename = 'importer' "
+                        "and indexdef like 'CREATE UNIQUE INDEX %(msg_id)%';")
+            self._unique_msg_id = cur.fetchone() is not None
+            if not self._unique_msg_id and not self._missing_msg_id_logged:
+                self._missing_msg_id_logged = True
+                self.log.error('the importer table has no unique index on msg_id, so messages saved by several '
+                               'clients are saved several times; migrate the table with chconsole/tab/addMsgId')
+        return self._unique_msg_id
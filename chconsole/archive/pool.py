@@ -0,0 +1,144 @@
+import hashlib
+import threading
+
+import psycopg2
+import psycopg2.pool
+
+from chconsole.storage import SharedInstances
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def pool_key(**params):
+    """
+    Key of the database that connection parameters refer to.
+    :param params: connection parameters for psycopg2.connect.
+    :return: hex string, which does not depend on the password and does not reveal the parameters.
+    """
+    digest = hashlib.sha1()
+    for name in ('host', 'port', 'dbname', 'user'):
+        digest.update('\0{!r}'.format(params.get(name, None)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections, which are only opened when they are needed.
+    Connections found broken are discarded and replaced by new ones.
+    """
+    maxconn = 4  # maximum number of connections in use at the same time
+    params = None  # dict of connection parameters for psycopg2.connect
+    key = ''  # pool_key of the connection parameters
+
+    _idle = None  # list of idle connections
+    _slots = None  # threading.BoundedSemaphore limiting the connections in use
+    _lock = None  # threading.Lock guarding _idle and _closed
+    _closed = False  # whether the pool has been closed
+
+    def __init__(self, maxconn=4, **params):
+        """
+        Initialize without connecting.
+        :param maxconn: maximum number of connections in use at the same time.
+        :param params: connection parameters for psycopg2.connect.
+        """
+        self.maxconn = max(1, maxconn)
+        self.params = params
+        self.key = pool_key(**params)
+        self._idle = list()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+
+    def _get(self):
+        """
+        Take an idle connection or open a new one; requires a slot.
+        :return: psycopg2 connection.
+        """
+        with self._lock:
+            if self._closed:
+                raise psycopg2.pool.PoolError('connection pool is closed')
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    return conn
+        return psycopg2.connect(**self.params)
+
+    def _put(self, conn, discard=False):
+        """
+        Return a connection to the pool.
+        :param conn: psycopg2 connection.
+        :param discard: whether the connection is broken and is to be closed.
+        :return:
+        """
+        with self._lock:
+            if not (discard or self._closed or conn.closed):
+                self._idle.append(conn)
+                return
+        if not conn.closed:
+            conn.close()
+
+    def run(self, work, timeout=None):
+        """
+        Call work with a connection inside a transaction, which is committed if work returns
+        and rolled back if it raises.
+        If the connection turns out to be broken, work is retried once with a new connection.
+        :param work: callable taking a psycopg2 connection.
+        :param timeout: seconds to wait for a connection to become available; None waits indefinitely.
+        :return: return value of work.
+        :raise psycopg2.Error: if the database cannot be reached or work fails.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError('no database connection available')
+        try:
+            for attempt in range(2):
+                conn = self._get()
+                try:
+                    with conn:  # one transaction
+                        result = work(conn)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self._put(conn, discard=True)
+                    if attempt:
+                        raise
+                except BaseException:
+                    self._put(conn)
+                    raise
+                else:
+                    self._put(conn)
+                    return result
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Close the idle connections; connections in use are closed when they are returned.
+        :return:
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, list()
+        for conn in idle:
+            conn.close()
+
+
+_pools = SharedInstances()  # shared pools by connection parameters
+
+
+def shared_pool(maxconn=4, connect_timeout=5, **params):
+    """
+    Pool shared by the whole process for the given connection parameters; created on first use.
+    :param maxconn: maximum number of connections in use at the same time, if the pool is created.
+    :param connect_timeout: seconds to wait for a connection to the database, so that an unreachable database
+                            does not hold up the threads using the pool indefinitely.
+    :param params: connection parameters for psycopg2.connect.
+    :return: ConnectionPool.
+    """
+    params['connect_timeout'] = connect_timeout
+    return _pools.get(lambda: ConnectionPool(maxconn, **params), tuple(sorted(params.items())))
+
+
+def close_pools():
+    """
+    Close all shared pools.
+    :return:
+    """
+    for pool in _pools.pop_all():
+        pool.close()
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import threading
+import itertools
+
+from chconsole.storage import chconsole_data_dir
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def default_spool_dir():
+    """
+    Default directory of the archive spool.
+    :return: path of the directory.
+    """
+    return os.path.join(chconsole_data_dir(), 'archive')
+
+
+def encode_record(client_id, user_name, chat_secret, msg_id, msg_json):
+    """
+    Encode a row of the importer table as one line of a spool segment.
+    :param client_id: id of the client.
+    :param user_name: name of the user.
+    :param chat_secret: secret of the chat session.
+    :param msg_id: id of the kernel message if it is to be archived only once; None otherwise.
+    :param msg_json: kernel message encoded as json.
+    :return: bytes of the line, including the terminating newline.
+    """
+    # json escapes tabs and newlines inside strings, so the separators are unambiguous
+    return (json.dumps([client_id, user_name, chat_secret, msg_id]) + '\t' + msg_json + '\n').encode('utf-8')
+
+
+def decode_record(line):
+    """
+    Decode a line of a spool segment.
+    :param line: bytes of the line.
+    :return: (client_id, user_name, chat_secret, msg_id, msg_json).
+    :raise ValueError: if the line is incomplete or malformed.
+    """
+    head, sep, msg_json = line.decode('utf-8').rstrip('\n').partition('\t')
+    if not sep or not msg_json:
+        raise ValueError('incomplete spool record')
+    client_id, user_name, chat_secret, msg_id = json.loads(head)
+    return client_id, user_name, chat_secret, msg_id, msg_json
+
+
+class Spool:
+    """
+    Append-only local spool of archived rows, rotated into segment files.
+    The segment being written ends with .open; full or idle segments are sealed by renaming them to .seg.
+    A sealed segment is claimed for replay by renaming it to .claimed, and removed once it has been replayed.
+    Several spools, also of different processes, may share a directory. Spools of different databases
+    keep their segments in subdirectories named by the key of the database, so that segments are only
+    replayed into the database they were spooled for.
+    """
+    open_suffix = '.open'
+    sealed_suffix = '.seg'
+    claimed_suffix = '.claimed'
+
+    _ids = itertools.count()  # distinguishes spools of the same process
+
+    directory = ''  # directory of the segment files, specific to the database if keyed
+    segment_size = 4 * 1024 * 1024  # bytes after which a segment is sealed
+    segment_age = 5.0  # seconds after which a segment with data is sealed
+    stale_after = 600.0  # seconds after which unmodified .open or .claimed files of others are recovered
+
+    _prefix = ''  # prefix of the names of the segments of this spool
+    _seq = None  # itertools.count of segments
+    _file = None  # file object of the open segment
+    _path = ''  # path of the open segment
+    _opened = 0.0  # time.monotonic() when the open segment received its first record
+    _lock = None  # threading.Lock guarding the open segment
+
+    def __init__(self, directory='', segment_size=4 * 1024 * 1024, segment_age=5.0, key=''):
+        """
+        Initialize and create the directory if needed.
+        :param directory: base directory of the segment files; default_spool_dir() if empty.
+        :param segment_size: bytes after which a segment is sealed.
+        :param segment_age: seconds after which a segment with data is sealed.
+        :param key: key of the database the segments are replayed into, such as ConnectionPool.key;
+                    the segments are kept in the subdirectory of this name if not empty.
+        """
+        self.directory = directory if directory else default_spool_dir()
+        if key:
+            self.directory = os.path.join(self.directory, key)
+        self.segment_size = segment_size
+        self.segment_age = segment_age
+        os.makedirs(self.directory, exist_ok=True)
+        self._prefix = '{}-{}-{}-'.format(int(time.time() * 1000), os.getpid(), next(Spool._ids))
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def append(self, records):
+        """
+        Append encoded records to the open segment and seal it if it is full.
+        :param records: list of bytes as returned by encode_record.
+        :return:
+        """
+        if not records:
+            return
+        with self._lock:
+            if self._file is None:
+                self._path = os.path.join(self.directory,
+                                          '{}{:08d}{}'.format(self._prefix, next(self._seq), self.open_suffix))
+                self._file = open(self._path, 'ab')
+                self._opened = time.monotonic()
+            self._file.write(b''.join(records))
+            self._file.flush()
+            if self._file.tell() >= self.segment_size:
+                self._seal()
+
+    def seal(self, force=False):
+        """
+        Seal the open segment if it is old enough to be replayed.
+        :param force: whether to seal it regardless of its age.
+        :return: whether a segment has been sealed.
+        """
+        with self._lock:
+            if self._file is None:
+                return False
+            if not force and time.monotonic() - self._opened < self.segment_age:
+                return False
+            self._seal()
+            return True
+
+    def _seal(self):
+        """
+        Seal the open segment; requires _lock.
+        :return:
+        """
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self._path, self._path[:-len(self.open_suffix)] + self.sealed_suffix)
+
+    def claim(self):
+        """
+        Claim the oldest sealed segment for replay.
+        :return: path of the claimed segment or None if there is none.
+        """
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(self.sealed_suffix):
+                path = os.path.join(self.directory, name)
+                claimed = path[:-len(self.sealed_suffix)] + self.claimed_suffix
+                try:
+                    os.rename(path, claimed)
+                except OSError:
+                    continue  # claimed by somebody else
+                return claimed
+        return None
+
+    def release(self, claimed):
+        """
+        Return a claimed segment that could not be replayed.
+        :param claimed: path returned by claim.
+        :return:
+        """
+        os.replace(claimed, claimed[:-len(self.claimed_suffix)] + self.sealed_suffix)
+
+    @staticmethod
+    def remove(claimed):
+        """
+        Remove a claimed segment after it has been replayed.
+        :param claimed: path returned by claim.
+        :return:
+        """
+        os.remove(claimed)
+
+    @staticmethod
+    def read(claimed):
+        """
+        Lines of a segment.
+        :param claimed: path returned by claim.
+        :return: list of bytes.
+        """
+        with open(claimed, 'rb') as f:
+            return f.readlines()
+
+    def recover(self):
+        """
+        Seal .open segments and release .claimed segments left behind by terminated clients.
+        :return: number of recovered segments.
+        """
+        recovered = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if name.startswith(self._prefix):
+                continue
+            path = os.path.join(self.directory, name)
+            for suffix in (self.open_suffix, self.claimed_suffix):
+                if name.endswith(suffix):
+                    try:
+                        if now - os.path.getmtime(path) > self.stale_after:
+                            os.rename(path, path[:-len(suffix)] + self.sealed_suffix)
+                            recovered += 1
+                    except OSError:
+                        pass  # recovered by somebody else
+        return recovered
+
+    def close(self):
+        """
+        Seal the open segment.
+        :return:
+        """
+        self.seal(force=True)
@@ -2,5 +2,6 @@ from .code_area import code_area_template
 from .code_area_filter import CodeAreaFilter
 from .line_prompt import LinePrompt
 from .entry import entry_template
+from .history_cache import HistoryCache, history_key
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -14,6 +14,7 @@ from chconsole.messages import Source, ExportItem, Inspect
 from chconsole.standards import DocumentConfig, ViewportFilter, TextAreaFilter
 from .code_area_filter import CodeAreaFilter
 from .history import History
+from .history_search import HistorySearch
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
@@ -90,6 +91,7 @@ def code_area_template(edit_class):
 
         kill_ring = None  # QKillRing
         history = None  # History object
+        history_search = None  # HistorySearch, popup for a ranked search of the history
 
         _comment_prefix = '#'  # prefix for line comments
 
@@ -151,6 +153,7 @@ def code_area_template(edit_class):
             self.setUndoRedoEnabled(True)
             self.kill_ring = QtKillRing(self)
             self.history = History(self)
+            self.history_search = HistorySearch(self, self.history.fuzzy_search)
             self._comment_prefix = comment_prefix
 
         def _set_font(self, font):
@@ -18,13 +18,22 @@ def complete_possible(cursor):
 
 
 class CodeAreaFilter(BaseEventFilter):
+    # Keys that are handled with the control key down even if they are window-level shortcuts,
+    # such as Ctrl+R for Rename Current Tab.
+    _shortcuts = {QtCore.Qt.Key_R}
+
     def __init__(self, target):
         super(CodeAreaFilter, self).__init__(target)
 
     def eventFilter(self, obj, event):
         intercepted = False
 
-        if event.type() == QtCore.QEvent.KeyPress:
+        if event.type() == QtCore.QEvent.ShortcutOverride and \
+                self.control_key_down(event.modifiers()) and \
+                event.key() in self._shortcuts:
+            event.accept()  # deliver the key press to the code area instead of triggering the shortcut
+
+        elif event.type() == QtCore.QEvent.KeyPress:
             intercepted = True  # eat the key by default
             key = event.key()
             alt_down = event.modifiers() & QtCore.Qt.AltModifier
@@ -118,6 +127,9 @@ class CodeAreaFilter(BaseEventFilter):
                 elif key == QtCore.Qt.Key_O:
                     self.target.release_focus.emit()
 
+                elif key == QtCore.Qt.Key_R:
+                    self.target.history_search.start()
+
                 elif key == QtCore.Qt.Key_D:
                     new_event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress, QtCore.Qt.Key_Delete, QtCore.Qt.NoModifier)
                     QtGui.qApp.sendEvent(self.target, new_event)
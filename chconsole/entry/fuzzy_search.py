@@ -0,0 +1,154 @@
+import heapq
+import time
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+_separators = ' \t\n_.,;:()[]{}=+-*/\'"'  # characters after which a match starts a word
+
+
+def fuzzy_score(pattern, text):
+    """
+    Score of a text containing the characters of a pattern in order.
+    Matches in a shorter window, starting words or following each other score higher.
+    :param pattern: str.
+    :param text: str.
+    :return: score, or None if the text does not contain the pattern.
+    """
+    if not pattern:
+        return 0
+    # leftmost end of a match, then the rightmost start of a match ending there: the tightest window
+    position = -1
+    for char in pattern:
+        position = text.find(char, position + 1)
+        if position < 0:
+            return None
+    end = position
+    for char in reversed(pattern[:-1]):
+        position = text.rfind(char, 0, position)
+    start = position
+
+    score = 8 * len(pattern) - (end - start + 1 - len(pattern))
+    previous = None
+    position = start - 1
+    for char in pattern:
+        position = text.find(char, position + 1)
+        if previous is not None and position == previous + 1:
+            score += 4  # consecutive
+        if position == 0 or text[position - 1] in _separators:
+            score += 3  # word start
+        previous = position
+    return score
+
+
+class FuzzySearch:
+    """
+    Ranked search of history items for a pattern, ignoring case, scored by fuzzy_score plus a bonus for recent items.
+    The items are scored incrementally within a time budget, most recent first, so that the best matches found
+    so far can be shown while the rest is scored. When the pattern grows, only the items matching the shorter
+    pattern are scored again; when it shrinks, the results for the shorter pattern are restored.
+    """
+    recency_bonus = 4.0  # bonus of the most recent item, decreasing to zero for the oldest one
+    limit = 10  # number of best matches shown
+
+    _items = None  # list of history items, oldest first
+    _lower = None  # list of the items in lower case
+    _states = None  # list of [pattern, list of (score, index) found, list of indexes to score, most recent first],
+    # each pattern extending the previous one
+
+    def __init__(self, items=()):
+        """
+        Initialize.
+        :param items: iterable of history items, oldest first.
+        """
+        self.reset(items)
+
+    def reset(self, items):
+        """
+        Replace the items searched.
+        :param items: iterable of history items, oldest first.
+        :return:
+        """
+        self._items = list(items)
+        self._lower = [item.lower() for item in self._items]
+        self.search('')
+
+    def append(self, item):
+        """
+        Add an item more recent than all others; takes effect with the next search from scratch.
+        :param item: history item.
+        :return:
+        """
+        self._items.append(item)
+        self._lower.append(item.lower())
+
+    @property
+    def pattern(self):
+        return self._states[-1][0]
+
+    @property
+    def done(self):
+        """
+        Whether all items have been scored for the pattern.
+        :return: bool.
+        """
+        return not self._states[-1][2]
+
+    def search(self, pattern):
+        """
+        Start searching for a pattern, continuing the search for a shorter pattern it extends.
+        The search for the empty pattern starts from scratch.
+        :param pattern: str.
+        :return:
+        """
+        pattern = pattern.lower()
+        if not pattern:
+            self._states = [['', list(), list(range(len(self._items) - 1, -1, -1))]]
+            return
+        while len(self._states) > 1 and not pattern.startswith(self._states[-1][0]):
+            self._states.pop()
+        last, found, pending = self._states[-1]
+        if pattern != last:
+            # items not matching the shorter pattern do not match this one
+            self._states.append([pattern, list(), [index for score, index in found] + pending])
+
+    def work(self, budget=None):
+        """
+        Score pending items.
+        :param budget: time budget in msec.; unlimited if None.
+        :return: whether all items have been scored.
+        """
+        pattern, found, pending = self._states[-1]
+        deadline = None if budget is None else time.perf_counter() + budget / 1000
+        lower = self._lower
+        bonus = self.recency_bonus / max(1, len(lower) - 1)
+        done = 0
+        while done < len(pending):
+            for index in pending[done:done + 256]:
+                score = fuzzy_score(pattern, lower[index])
+                if score is not None:
+                    found.append((score + bonus * index, index))
+            done += 256
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        del pending[:done]
+        return not pending
+
+    def top(self):
+        """
+        Best distinct matches found so far.
+        :return: list of (score, history item), best first.
+        """
+        found = self._states[-1][1]
+        count = self.limit
+        while True:
+            best = list()
+            seen = set()
+            for score, index in heapq.nlargest(count, found):
+                item = self._items[index]
+                if item not in seen:
+                    seen.add(item)
+                    best.append((score, item))
+            if len(best) >= self.limit or count >= len(found):
+                return best[:self.limit]
+            count *= 4
@@ -1,6 +1,12 @@
+from bisect import bisect_left
+
 from ipython_genutils.py3compat import unicode_type
-from qtconsole.qt import QtGui
+from qtconsole.qt import QtGui, QtCore
+
+from chconsole.messages import RangeHistory
 from .history_filter import HistoryFilter
+from .fuzzy_search import FuzzySearch
+from .history_index import HistoryIndex
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
@@ -12,6 +18,22 @@ class History:
     _edits = None  # dict (index, str) of edited history items
     _index = 0  # index of current history item
     _prefix = ''  # string used as prefix to only show history items with this prefix
+    _search_index = None  # HistoryIndex of _items
+    fuzzy_search = None  # FuzzySearch of _items
+
+    page = 500  # number of older history items requested from the kernel at a time
+    fetch_ahead = 20  # older history items are requested when browsing gets this close to the oldest one
+    _known = None  # dict (session, line) -> input of the history items received from the kernel or the cache
+    _keys = None  # list of (session, line) of the first len(_keys) items of _items, which are from the kernel;
+    # the remaining items were stored locally since
+    _ranges = None  # list of (oldest, newest) (session, line) of the runs of history items known without gaps,
+    # ordered; the last one reaches the most recent item; the others are older items from the cache
+    _requested = None  # (session, start, stop) lines of the older history items requested; None if not waiting
+    _exhausted = False  # whether the kernel has no history items older than _bottom
+    _cache = None  # HistoryCache or None
+    save_delay = 2000  # msec. after receiving history items until they are written to the cache
+    _save_timer = None  # QTimer, single shot, writing the cache
+    _unsaved = False  # whether history items have been received since the cache was written
 
     _filter = None  # HistoryFilter
 
@@ -19,6 +41,11 @@ class History:
         self.target = target
         self._items = []
         self._edits = {}
+        self._known = {}
+        self._keys = []
+        self._ranges = []
+        self._search_index = HistoryIndex()
+        self.fuzzy_search = FuzzySearch()
         self._filter = HistoryFilter(self.target)
         self.target.installEventFilter(self._filter)
 
@@ -48,6 +75,8 @@ class History:
             item = source.code.rstrip()
             if item and (not self._items or self._items[-1] != item):
                 self._items.append(item)
+                self._search_index.append(item)
+                self.fuzzy_search.append(item)
 
             # Reset all history edits.
             self._edits = {}
@@ -70,19 +99,10 @@ class History:
         -------
         Whether the input buffer was changed.
         """
-        replace = False
-        index = self._index
-        while index > 0:
-            index -= 1
-            history = self._get_edited_item(index)
-            if (as_prefix and history.startswith(substring)) or (not as_prefix and substring in history):
-                self._store_edits()
-                self._index = index
-                self.target.document().setPlainText(history)
-                replace = True
-                break
-
-        return replace
+        found = self._find(substring, as_prefix, backward=True)
+        if found is None or found < self.fetch_ahead:
+            self._request_older()
+        return self._go_to(found)
 
     # HistoryConsoleWidget
     def next(self, substring='', as_prefix=True):
@@ -99,19 +119,54 @@ class History:
         -------
         Whether the input buffer was changed.
         """
-        replace = False
-        index = self._index
-        while index < len(self._items):
-            index += 1
-            history = self._get_edited_item(index)
-            if (as_prefix and history.startswith(substring)) or (not as_prefix and substring in history):
-                self._store_edits()
-                self._index = index
-                self.target.document().setPlainText(history)
-                replace = True
-                break
+        return self._go_to(self._find(substring, as_prefix, backward=False))
 
-        return replace
+    def _matches(self, index, substring, as_prefix):
+        """
+        Determine whether a history item, possibly with temporary edits, matches a search.
+        :param index: index of the item.
+        :param substring: text searched for.
+        :param as_prefix: whether the item starts with the text; otherwise it contains it.
+        :return: bool.
+        """
+        history = self._get_edited_item(index)
+        return history.startswith(substring) if as_prefix else substring in history
+
+    def _find(self, substring, as_prefix, backward):
+        """
+        Find the nearest history item, possibly with temporary edits, before or after the current one that matches
+        a search. Items without edits are looked up in the index; the few edited ones are checked directly.
+        :param substring: text searched for.
+        :param as_prefix: whether the item starts with the text; otherwise it contains it.
+        :param backward: whether to search before the current item; otherwise after it.
+        :return: index of the item or None if there is none.
+        """
+        search = self._search_index.previous if backward else self._search_index.next
+        found = search(substring, self._index, as_prefix)
+        while found is not None and found in self._edits and not self._matches(found, substring, as_prefix):
+            found = search(substring, found, as_prefix)
+        if not backward and found is None and len(self._items) not in self._edits and not substring \
+                and self._index < len(self._items):
+            found = len(self._items)  # the empty input following the history
+        for index in self._edits:
+            if (index < self._index if backward else index > self._index) and \
+                    (found is None or (index > found if backward else index < found)) and \
+                    self._matches(index, substring, as_prefix):
+                found = index
+        return found
+
+    def _go_to(self, index):
+        """
+        Set the input buffer to a history item, possibly with temporary edits, storing the edits of the current one.
+        :param index: index of the item; nothing is done if None.
+        :return: whether the input buffer was changed.
+        """
+        if index is None:
+            return False
+        self._store_edits()
+        self._index = index
+        self.target.document().setPlainText(self._get_edited_item(index))
+        return True
 
     def key_up(self, shift_down):
         """
@@ -185,6 +240,155 @@ class History:
     def set_history(self, history):
         """ Replace the current history with a sequence of history items.
         """
+        self._known = {}
+        self._keys = []
+        self._ranges = []
+        self._requested = None
+        self._exhausted = False
         self._items = list(history)
+        self._search_index.reset(self._items)
+        self.fuzzy_search.reset(self._items)
         self._edits = {}
         self._index = len(self._items)
+
+    @property
+    def _bottom(self):
+        """
+        Oldest history item from which on all history items are known.
+        :return: (session, line) or None if there are none.
+        """
+        return self._ranges[-1][0] if self._ranges else None
+
+    def _add_range(self, oldest, newest):
+        """
+        Record that the history items in a range are known, joining the ranges that overlap or adjoin.
+        :param oldest: (session, line) of the oldest item.
+        :param newest: (session, line) of the newest item.
+        :return:
+        """
+        ranges = sorted(self._ranges + [(oldest, newest)])
+        self._ranges = ranges[:1]
+        for bottom, top in ranges[1:]:
+            last_bottom, last_top = self._ranges[-1]
+            if bottom <= (last_top[0], last_top[1] + 1):
+                self._ranges[-1] = (last_bottom, max(last_top, top))
+            else:
+                self._ranges.append((bottom, top))
+
+    def set_cache(self, cache):
+        """
+        Load the history from a cache, which is updated with the history items received from the kernel from now on.
+        The cache is written save_delay after items have been received and when save_cache is called.
+        :param cache: HistoryCache.
+        :return:
+        """
+        self._cache = None
+        self.merge_history(cache.load())
+        self._cache = cache
+        self._unsaved = False
+        if self._save_timer is None:
+            self._save_timer = QtCore.QTimer(self.target)
+            self._save_timer.setSingleShot(True)
+            self._save_timer.timeout.connect(self.save_cache)
+        self._save_timer.setInterval(self.save_delay)
+
+    def save_cache(self):
+        """
+        Write the history items received to the cache unless they have been written already.
+        :return:
+        """
+        if self._cache is not None and self._unsaved:
+            self._unsaved = False
+            self._cache.save([key + (self._known[key],) for key in sorted(self._known)])
+
+    def merge_history(self, entries):
+        """
+        Merge history items received from the kernel or the cache. Items older than the ones known are placed before
+        them and newer ones after them; consecutive duplicates are dropped. Items stored locally remain the most recent.
+        :param entries: iterable of (session, line, input), ordered by session and line.
+        :return:
+        """
+        entries = [((session, line), cell) for session, line, cell in entries]
+        if self._requested is not None and all(key < self._bottom for key, cell in entries):
+            # reply to the request for older items
+            session, start, stop = self._requested
+            self._requested = None
+            if session == self._bottom[0] or len(entries) < stop - start:
+                # the lines up to the ones known, or the rest of the previous session, are known
+                self._add_range((session, start), self._bottom)
+            else:
+                self._add_range((session, start), (session, stop - 1))
+            if not entries or len(self._ranges) > 1:
+                self._request_older()  # there may be an empty session before, or a gap before the cached items
+        else:
+            self._requested = None  # an aborted request for older items is retried when needed
+            if entries:
+                self._add_range(entries[0][0], entries[-1][0])
+                if len(self._ranges) > 1:
+                    self._request_older()  # fill the gap between the cached items and the ones received
+
+        new = dict((key, cell) for key, cell in entries if key not in self._known)
+        if not new:
+            return
+        newest = max(self._known) if self._known else None
+        self._known.update(new)
+
+        keys = list()
+        items = list()
+        last_cell = ''
+        for key in sorted(self._known):
+            cell = self._known[key].rstrip()
+            if cell != last_cell:
+                keys.append(key)
+                items.append(cell)
+                last_cell = cell
+        # items stored locally since are among the items newer than the ones known before, not among older ones
+        received = set(cell.rstrip() for key, cell in new.items() if newest is None or key > newest)
+        local = [item for item in self._items[len(self._keys):] if item not in received]
+
+        old_keys = self._keys
+        old_length = len(self._items)
+        length = len(items) + len(local)
+
+        def position(index):
+            # position of an item after the merge: kernel items by key, the others counted from the end
+            if index < len(old_keys):
+                return bisect_left(keys, old_keys[index])
+            return max(len(items), length - (old_length - index))
+
+        self._keys = keys
+        self._items = items + local
+        self._search_index.reset(self._items)
+        self.fuzzy_search.reset(self._items)
+        self._edits = dict((position(index), text) for index, text in self._edits.items())
+        self._index = position(self._index)
+
+        if self._cache is not None:
+            self._unsaved = True
+            if not self._save_timer.isActive():
+                self._save_timer.start()
+
+    def _request_older(self):
+        """
+        Request a page of history items older than the ones known from the kernel, unless a request is pending or
+        there are none. Lines are requested backwards within the session of the oldest item known, stopping at
+        the cached items; a previous session, whose last line is not known, is requested forwards page by page
+        until a reply falls short of a page.
+        :return:
+        """
+        if self._requested is not None or self._exhausted or self._bottom is None:
+            return
+        session, line = self._bottom
+        older = self._ranges[-2][1] if len(self._ranges) > 1 else None  # newest item of the next older run
+        if line > 1:
+            start = max(1, line - self.page)
+            if older is not None and older[0] == session:
+                start = max(start, older[1] + 1)
+            self._requested = (session, start, line)
+        elif session > 1:
+            start = older[1] + 1 if older is not None and older[0] == session - 1 else 1
+            self._requested = (session - 1, start, start + self.page)
+        else:
+            self._exhausted = True
+            return
+        self.target.please_export.emit(RangeHistory(*self._requested))
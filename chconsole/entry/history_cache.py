@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+
+from chconsole.storage import chconsole_data_dir, write_atomically
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def default_history_dir():
+    """
+    Default directory of the input history cache.
+    :return: path of the directory.
+    """
+    return os.path.join(chconsole_data_dir(), 'history')
+
+
+def history_key(*parts):
+    """
+    Key of the history of a kernel session.
+    :param parts: values identifying the session, such as the connection ip, shell port and session key.
+    :return: hex string, which does not reveal the parts.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update('\0{!r}'.format(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class HistoryCache:
+    """
+    Input history of a kernel session kept in a file across sessions of the console,
+    so that only history items not cached need to be requested from the kernel.
+    The file is written with write_atomically.
+    """
+    max_entries = 10000  # maximum number of history items kept, the most recent ones
+    directory = ''  # directory of the history files; no persistence if empty
+    key = ''  # key from history_key
+
+    def __init__(self, key, directory=None, max_entries=10000):
+        """
+        Initialize.
+        :param key: key from history_key.
+        :param directory: directory of the history files; default_history_dir() if None; no persistence if ''.
+        :param max_entries: maximum number of history items kept.
+        """
+        self.key = key
+        self.directory = default_history_dir() if directory is None else directory
+        self.max_entries = max_entries
+
+    def _path(self):
+        return os.path.join(self.directory, self.key + '.json')
+
+    def load(self):
+        """
+        Read the cached history.
+        :return: list of (session, line, input), ordered by session and line; empty if nothing is cached.
+        """
+        if not self.directory:
+            return list()
+        try:
+            with open(self._path(), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return [(int(session), int(line), str(cell)) for session, line, cell in entries]
+        except (OSError, ValueError, TypeError):
+            return list()  # missing or damaged; the kernel is asked instead
+
+    def save(self, entries):
+        """
+        Write the history to the cache.
+        :param entries: list of (session, line, input), ordered by session and line.
+        :return:
+        """
+        if not self.directory:
+            return
+        try:
+            write_atomically(self._path(), json.dumps(entries[-self.max_entries:]))
+        except OSError:
+            pass  # only kept in memory
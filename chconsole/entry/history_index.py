@@ -0,0 +1,143 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def _grams(text, n=3):
+    """
+    Distinct substrings of a given length.
+    :param text: str.
+    :param n: length of the substrings.
+    :return: set of str.
+    """
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class HistoryIndex:
+    """
+    Index of history items for finding the nearest item before or after a given index that starts with a prefix
+    or contains a substring. Prefixes are looked up in the items sorted by text, substrings of at least three
+    characters through the items containing each of their trigrams. The indexes of the matches of recent searches
+    are kept sorted, so that repeated searches for the same text, as when holding the up key, only bisect them.
+    """
+    gram = 3  # length of the substrings indexed
+    cache_size = 16  # number of recent searches whose matches are kept
+
+    _items = None  # list of items, by index
+    _sorted = None  # list of (item, index) sorted by item
+    _postings = None  # dict: substring of length gram -> array of the indexes of the items containing it
+    _matches = None  # OrderedDict: (substring, as_prefix) -> list of the indexes of the items matching, ascending
+
+    def __init__(self, items=()):
+        """
+        Initialize.
+        :param items: iterable of history items.
+        """
+        self.reset(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def reset(self, items):
+        """
+        Replace the items indexed.
+        :param items: iterable of history items.
+        :return:
+        """
+        self._items = list(items)
+        self._sorted = sorted((item, index) for index, item in enumerate(self._items))
+        self._postings = dict()
+        for index, item in enumerate(self._items):
+            self._post(item, index)
+        self._matches = OrderedDict()
+
+    def _post(self, item, index):
+        for gram in _grams(item, self.gram):
+            postings = self._postings.get(gram, None)
+            if postings is None:
+                postings = self._postings[gram] = array('I')
+            postings.append(index)
+
+    def append(self, item):
+        """
+        Index an item following all other items.
+        :param item: history item.
+        :return:
+        """
+        index = len(self._items)
+        self._items.append(item)
+        insort(self._sorted, (item, index))
+        self._post(item, index)
+        for (substring, as_prefix), matches in self._matches.items():
+            if (as_prefix and item.startswith(substring)) or (not as_prefix and substring in item):
+                matches.append(index)
+
+    def _find(self, substring, as_prefix):
+        """
+        Indexes of the items matching a search.
+        :param substring: text searched for, not empty.
+        :param as_prefix: whether the items start with the text; otherwise they contain it.
+        :return: list of indexes, ascending.
+        """
+        if as_prefix:
+            start = bisect_left(self._sorted, (substring,))
+            matches = list()
+            for item, index in self._sorted[start:]:
+                if not item.startswith(substring):
+                    break
+                matches.append(index)
+            matches.sort()
+        elif len(substring) >= self.gram:
+            candidates = min((self._postings.get(gram, ()) for gram in _grams(substring, self.gram)), key=len)
+            matches = [index for index in candidates if substring in self._items[index]]
+        else:
+            matches = [index for index, item in enumerate(self._items) if substring in item]
+        return matches
+
+    def matches(self, substring, as_prefix=True):
+        """
+        Indexes of the items matching a search.
+        :param substring: text searched for, not empty.
+        :param as_prefix: whether the items start with the text; otherwise they contain it.
+        :return: list of indexes, ascending; not to be modified.
+        """
+        key = (substring, as_prefix)
+        matches = self._matches.get(key, None)
+        if matches is None:
+            matches = self._matches[key] = self._find(substring, as_prefix)
+            if len(self._matches) > self.cache_size:
+                self._matches.popitem(last=False)
+        else:
+            self._matches.move_to_end(key)
+        return matches
+
+    def previous(self, substring, index, as_prefix=True):
+        """
+        Nearest item before an index that matches a search.
+        :param substring: text searched for; all items match if empty.
+        :param index: index.
+        :param as_prefix: whether the item starts with the text; otherwise it contains it.
+        :return: index of the item or None if there is none.
+        """
+        index = min(index, len(self._items))
+        if not substring:
+            return index - 1 if index > 0 else None
+        matches = self.matches(substring, as_prefix)
+        position = bisect_left(matches, index)
+        return matches[position - 1] if position > 0 else None
+
+    def next(self, substring, index, as_prefix=True):
+        """
+        Nearest item after an index that matches a search.
+        :param substring: text searched for; all items match if empty.
+        :param index: index.
+        :param as_prefix: whether the item starts with the text; otherwise it contains it.
+        :return: index of the item or None if there is none.
+        """
+        if not substring:
+            return index + 1 if index + 1 < len(self._items) else None
+        matches = self.matches(substring, as_prefix)
+        position = bisect_right(matches, index)
+        return matches[position] if position < len(matches) else None
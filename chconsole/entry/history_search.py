@@ -0,0 +1,132 @@
+from qtconsole.qt import QtGui, QtCore
+
+from .history_search_filter import HistorySearchFilter
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class HistorySearch(QtGui.QFrame):
+    """
+    Popup above a code area for a ranked fuzzy reverse search of its history.
+    The best matches are shown while they are typed; the items are scored in slices between events.
+    """
+    frame_budget = 10  # time in msec. spent scoring items per pass of the event loop
+    lines = 10  # number of matches shown
+
+    _target = None  # CodeArea
+    _search = None  # FuzzySearch
+    _line = None  # QLineEdit for the pattern
+    _matches = None  # QListWidget of the best matches found so far
+    _timer = None  # QTimer, single shot, firing when the event loop is idle to score more items
+    history_search_filter = None  # HistorySearchFilter
+
+    def __init__(self, target, search):
+        """
+        Initialize.
+        :param target: CodeArea, which receives the match accepted.
+        :param search: FuzzySearch of the history of target.
+        """
+        super(HistorySearch, self).__init__(target, QtCore.Qt.Popup)
+        self.hide()
+        self._target = target
+        self._search = search
+        self.setFrameShape(QtGui.QFrame.Box)
+
+        self._line = QtGui.QLineEdit()
+        self._line.textChanged.connect(self._on_text_changed)
+        self.history_search_filter = HistorySearchFilter(self)
+        self._line.installEventFilter(self.history_search_filter)
+        self._matches = QtGui.QListWidget()
+        self._matches.setFocusPolicy(QtCore.Qt.NoFocus)
+        self._matches.itemActivated.connect(self.accept)
+
+        layout = QtGui.QVBoxLayout(self)
+        layout.setContentsMargins(2, 2, 2, 2)
+        prompt = QtGui.QHBoxLayout()
+        prompt.addWidget(QtGui.QLabel('reverse search:'))
+        prompt.addWidget(self._line)
+        layout.addLayout(prompt)
+        layout.addWidget(self._matches)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._work)
+
+    def start(self):
+        """
+        Show the popup and search the history from scratch.
+        :return:
+        """
+        self._line.clear()
+        self._search.search('')
+        font = self._target.font
+        self._line.setFont(font)
+        self._matches.setFont(font)
+        height = QtGui.QFontMetrics(font).lineSpacing() * (self.lines + 3)
+        self.resize(self._target.width(), height)
+        top_left = self._target.mapToGlobal(QtCore.QPoint(0, 0))
+        self.move(top_left.x(), max(0, top_left.y() - height))
+        self.show()
+        self._line.setFocus()
+        self._schedule()
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @QtCore.Slot(str)
+    def _on_text_changed(self, text):
+        self._search.search(text)
+        self._matches.setCurrentRow(0)
+        self._schedule()
+
+    @QtCore.Slot()
+    def _work(self):
+        """
+        Score items within the time budget and show the best matches found so far.
+        :return:
+        """
+        done = self._search.work(self.frame_budget)
+        row = max(0, self._matches.currentRow())
+        self._matches.clear()
+        for score, item in self._search.top():
+            lines = item.split('\n')
+            entry = QtGui.QListWidgetItem(lines[0] + (' ...' if len(lines) > 1 else ''))
+            entry.setData(QtCore.Qt.UserRole, item)
+            self._matches.addItem(entry)
+        if self._matches.count():
+            self._matches.setCurrentRow(min(row, self._matches.count() - 1))
+        if not done and self.isVisible():
+            self._schedule()
+
+    def select(self, step):
+        """
+        Select another match.
+        :param step: number of rows to move down; up if negative.
+        :return:
+        """
+        count = self._matches.count()
+        if count:
+            self._matches.setCurrentRow(max(0, min(count - 1, self._matches.currentRow() + step)))
+
+    @QtCore.Slot()
+    def accept(self):
+        """
+        Replace the input of the code area by the selected match.
+        :return:
+        """
+        entry = self._matches.currentItem()
+        self.cancel()
+        if entry is not None:
+            self._target.clear()
+            self._target.insertPlainText(entry.data(QtCore.Qt.UserRole))
+
+    def cancel(self):
+        """
+        Close the popup and return to the code area.
+        :return:
+        """
+        self._timer.stop()
+        self.hide()
+        self._target.setFocus()
@@ -0,0 +1,34 @@
+from qtconsole.qt import QtCore
+
+from chconsole.standards import BaseEventFilter
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class HistorySearchFilter(BaseEventFilter):
+    """
+    Filter of the pattern line of a HistorySearch to choose, accept or cancel a match.
+    """
+    def __init__(self, target):
+        super(HistorySearchFilter, self).__init__(target)
+
+    def eventFilter(self, obj, event):
+        intercepted = False
+
+        if event.type() == QtCore.QEvent.KeyPress:
+            intercepted = True
+            key = event.key()
+            ctrl_down = self.control_key_down(event.modifiers())
+
+            if key in (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter):
+                self.target.accept()
+            elif key == QtCore.Qt.Key_Escape or (ctrl_down and key == QtCore.Qt.Key_G):
+                self.target.cancel()
+            elif key == QtCore.Qt.Key_Down or (ctrl_down and key == QtCore.Qt.Key_R):
+                self.target.select(1)
+            elif key == QtCore.Qt.Key_Up:
+                self.target.select(-1)
+            else:
+                intercepted = False
+
+        return intercepted
@@ -210,6 +210,20 @@ class ExpandedMainWindow(MainWindow):
                                                triggered=self.list_users)
         self.add_menu_action(self.view_menu, self.list_users_action)
 
+        self.view_menu.addSeparator()
+
+        self.receiver_stats_action = QtGui.QAction("&Receiver Statistics",
+                                                   self,
+                                                   checkable=False,
+                                                   triggered=self.show_receiver_stats)
+        self.add_menu_action(self.view_menu, self.receiver_stats_action)
+
+        self.export_receiver_stats_action = QtGui.QAction("E&xport Receiver Statistics...",
+                                                          self,
+                                                          checkable=False,
+                                                          triggered=self.export_receiver_stats)
+        self.add_menu_action(self.view_menu, self.export_receiver_stats_action)
+
     def toggle_confirm_show_users(self):
         widget = self.active_frontend
         widget.main_content.show_users = not widget.main_content.show_users
@@ -224,6 +238,18 @@ class ExpandedMainWindow(MainWindow):
     def list_users(self):
         self.active_frontend.main_content.list_users()
 
+    def show_receiver_stats(self):
+        self.active_frontend.main_content.show_receiver_stats()
+
+    def export_receiver_stats(self):
+        filename, _ = QtGui.QFileDialog.getSaveFileName(self, 'Export Receiver Statistics',
+                                                        'receiver-stats.json', 'JSON (*.json)')
+        if filename:
+            try:
+                self.active_frontend.main_content.export_receiver_stats(filename)
+            except OSError as e:
+                QtGui.QMessageBox.warning(self, 'Export Receiver Statistics', str(e))
+
     # MM: This method does not seem to be in use.
     def _set_active_frontend_focus(self):
         QtCore.QTimer.singleShot(200, self.active_frontend.main_content.entry.set_focus)
@@ -15,6 +15,8 @@ from jupyter_core.paths import jupyter_runtime_dir
 from qtconsole.qt import QtGui, QtCore
 from qtconsole.usage import gui_reference
 
+from chconsole.archive import close_pools
+
 
 def background(f):
     """call a function in a simple thread, to prevent blocking"""
@@ -810,6 +812,7 @@ class MainWindow(QtGui.QMainWindow):
         """
         if self.tab_widget.count() == 0:
             # no tabs, just close
+            close_pools()
             event.accept()
             return
         # Do Not loop on the widget count as it change while closing
@@ -849,4 +852,5 @@ class MainWindow(QtGui.QMainWindow):
                 widget._confirm_exit = False
 
                 self.close_tab(widget)
+            close_pools()
             event.accept()
@@ -1,9 +1,11 @@
+from base64 import decodebytes
 from qtconsole.qt import QtGui, QtCore
 from qtconsole.svg import svg_to_image
 try:
     from IPython.lib.latextools import latex_to_png
 except ImportError:
     latex_to_png = None
+from .latex_cache import shared_latex_cache
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
@@ -28,7 +30,7 @@ def png_to_qimage(img, metadata=None):
 def jpg_png_to_qimage(img, fmt='png', metadata=None):
     """
     Convert jpg or png to QImage.
-    :param img: image as jpg or png.
+    :param img: image as jpg or png, either bytes or a base64 encoded string as sent by the kernel.
     :param fmt: 'jpg' or 'png'
     :param metadata: optional metadata dict with width and height.
     :return: QImage representation of img, or raises ValueError if img cannot be converted.
@@ -39,6 +41,8 @@ def jpg_png_to_qimage(img, fmt='png', metadata=None):
     else:
         width = height = None
 
+    if isinstance(img, str):
+        img = decodebytes(img.encode('ascii'))
     image = QtGui.QImage()
     image.loadFromData(img, fmt.upper())
     if width and height:
@@ -51,8 +55,19 @@ def jpg_png_to_qimage(img, fmt='png', metadata=None):
     return image
 
 
-def latex_to_qimage(text):
-    png = latex_to_png(text)
+def latex_to_qimage(text, color='Black', scale=1.0):
+    """
+    Convert LaTeX to QImage; renderings are cached in memory and on disk.
+    :param text: LaTeX source.
+    :param color: color of the text.
+    :param scale: scale factor of the rendering.
+    :return: QImage representation of text, or raises ValueError if text cannot be rendered.
+    """
+    if latex_to_png is None:
+        raise ValueError('LaTeX rendering requires IPython.')
+    png = shared_latex_cache().render(latex_to_png, text, color=color, scale=scale)
+    if not png:
+        raise ValueError('LaTeX could not be rendered.')
     return jpg_png_to_qimage(png, 'png')
 
 
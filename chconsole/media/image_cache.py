@@ -0,0 +1,121 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from chconsole.storage import SharedInstances
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def image_key(kind, data, metadata=None):
+    """
+    Key of an image determined by its content.
+    :param kind: kind of the image, such as 'png' or 'latex'.
+    :param data: str or bytes of the image source.
+    :param metadata: optional metadata dict with width and height.
+    :return: hex string.
+    """
+    digest = hashlib.sha1(kind.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(data.encode('utf-8') if isinstance(data, str) else bytes(data))
+    if metadata:
+        digest.update('\0{}x{}'.format(metadata.get('width', None), metadata.get('height', None)).encode('ascii'))
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Thread-safe cache of rendered images by content key, evicting the least recently used images
+    beyond a memory budget.
+    """
+    max_bytes = 64 * 1024 * 1024  # memory budget for the images
+    hits = 0  # number of successful lookups
+    misses = 0  # number of failed lookups
+
+    _images = None  # OrderedDict: key -> QImage, least recently used first
+    _bytes = 0  # bytes of the cached images
+    _lock = None  # threading.Lock
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Initialize empty cache.
+        :param max_bytes: memory budget for the images.
+        """
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._images)
+
+    @property
+    def size(self):
+        """
+        Memory used by the cached images.
+        :return: number of bytes.
+        """
+        return self._bytes
+
+    def get(self, key):
+        """
+        Look up an image and mark it as recently used.
+        :param key: content key of the image.
+        :return: QImage or None if not cached.
+        """
+        with self._lock:
+            image = self._images.get(key, None)
+            if image is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        """
+        Cache an image and evict least recently used images beyond the budget.
+        Images larger than the budget are not cached.
+        :param key: content key of the image.
+        :param image: QImage.
+        :return:
+        """
+        size = image.byteCount()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._bytes -= old.byteCount()
+            self._images[key] = image
+            self._bytes += size
+            self._shrink()
+
+    def set_budget(self, max_bytes):
+        """
+        Change the memory budget.
+        :param max_bytes: memory budget for the images.
+        :return:
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def _shrink(self):
+        """
+        Evict least recently used images beyond the budget; requires _lock.
+        :return:
+        """
+        while self._bytes > self.max_bytes and self._images:
+            key, image = self._images.popitem(last=False)
+            self._bytes -= image.byteCount()
+
+
+_shared = SharedInstances()  # ImageCache shared by all documents of the process
+
+
+def shared_image_cache():
+    """
+    Image cache shared by all tabs of the process, created on first use.
+    :return: ImageCache.
+    """
+    return _shared.get(ImageCache)
@@ -0,0 +1,164 @@
+from collections import deque
+
+from qtconsole.qt import QtGui, QtCore
+
+from .image import insert_qimage_format
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def _image_at(anchor, name):
+    """
+    Determine whether the image with a given resource name is still at an anchor.
+    :param anchor: QTextCursor at the position of the image.
+    :param name: resource name of the image.
+    :return: True iff the character after the anchor is the image.
+    """
+    probe = QtGui.QTextCursor(anchor)
+    probe.clearSelection()
+    if not probe.movePosition(QtGui.QTextCursor.NextCharacter, QtGui.QTextCursor.KeepAnchor):
+        return False
+    image_format = probe.charFormat()
+    return image_format.isImageFormat() and image_format.toImageFormat().name() == name
+
+
+class ImageRegister:
+    """
+    Image resources of a document by content key, counting the images in the document that show them.
+    A resource is released when the last image showing it has been removed from the document,
+    for example by truncation to the maximum block count or by clearing output.
+    """
+    _document = None  # QTextDocument
+    _counts = None  # dict: resource name -> number of images showing it
+    _images = None  # deque of (resource name, QTextCursor at the image) in document order
+    released = None  # callable taking a resource name, called when a resource is released
+
+    def __init__(self, document, released=None):
+        """
+        Initialize.
+        :param document: QTextDocument.
+        :param released: optional callable taking a resource name, called when a resource is released.
+        """
+        self._document = document
+        self._counts = dict()
+        self._images = deque()
+        self.released = released
+        document.contentsChange.connect(self._on_contents_change)
+
+    def __len__(self):
+        """
+        Number of resources held.
+        :return: int.
+        """
+        return len(self._counts)
+
+    @staticmethod
+    def name(key):
+        """
+        Resource name of an image.
+        :param key: content key of the image.
+        :return: resource name.
+        """
+        return 'image-' + key
+
+    def _acquire(self, key, image):
+        """
+        Count another image showing a resource and add the resource if it is new.
+        :param key: content key of the image.
+        :param image: QImage.
+        :return: QTextImageFormat referencing the resource.
+        """
+        name = self.name(key)
+        count = self._counts.get(name, 0)
+        if count == 0:
+            self._document.addResource(QtGui.QTextDocument.ImageResource, QtCore.QUrl(name), image)
+        self._counts[name] = count + 1
+        image_format = QtGui.QTextImageFormat()
+        image_format.setName(name)
+        return image_format
+
+    def _release(self, name):
+        """
+        Uncount an image showing a resource and drop the resource if it is not shown anymore.
+        :param name: resource name.
+        :return:
+        """
+        count = self._counts.pop(name, 0) - 1
+        if count > 0:
+            self._counts[name] = count
+        else:
+            # QTextDocument cannot remove resources; replace it by a null image to free its memory
+            self._document.addResource(QtGui.QTextDocument.ImageResource, QtCore.QUrl(name), QtGui.QImage())
+            if self.released:
+                self.released(name)
+
+    def _track(self, name, position):
+        """
+        Keep track of an image inserted at the end of the document.
+        :param name: resource name.
+        :param position: position of the image.
+        :return:
+        """
+        anchor = QtGui.QTextCursor(self._document)
+        anchor.setPosition(position)
+        self._images.append((name, anchor))
+
+    def insert(self, cursor, key, image):
+        """
+        Insert an image into its own block at a cursor at the end of the document.
+        :param cursor: QTextCursor.
+        :param key: content key of the image.
+        :param image: QImage.
+        :return: resource name of the image.
+        """
+        image_format = self._acquire(key, image)
+        insert_qimage_format(cursor, image_format)
+        # the image precedes a block separator; positions before it may have shifted by truncation
+        self._track(image_format.name(), cursor.position() - 2)
+        return image_format.name()
+
+    def replace(self, anchor, key, image):
+        """
+        Replace an image, such as a placeholder, by another one.
+        :param anchor: QTextCursor at the image to replace.
+        :param key: content key of the new image.
+        :param image: QImage.
+        :return: resource name of the new image.
+        """
+        image_format = self._acquire(key, image)
+        cursor = QtGui.QTextCursor(anchor)
+        cursor.clearSelection()
+        cursor.movePosition(QtGui.QTextCursor.NextCharacter, QtGui.QTextCursor.KeepAnchor)
+        cursor.setCharFormat(image_format)  # releases the old image through _on_contents_change
+        self._track(image_format.name(), cursor.selectionStart())
+        self._sort()
+        return image_format.name()
+
+    def _sort(self):
+        """
+        Restore document order of the tracked images after a replacement.
+        :return:
+        """
+        self._images = deque(sorted(self._images, key=lambda entry: entry[1].position()))
+
+    def prune(self):
+        """
+        Release the images removed from the start or the end of the document.
+        :return:
+        """
+        while self._images and not _image_at(self._images[0][1], self._images[0][0]):
+            self._release(self._images.popleft()[0])
+        while self._images and not _image_at(self._images[-1][1], self._images[-1][0]):
+            self._release(self._images.pop()[0])
+
+    def clear(self):
+        """
+        Release all images.
+        :return:
+        """
+        while self._images:
+            self._release(self._images.popleft()[0])
+
+    def _on_contents_change(self, position, removed, added):
+        if removed > 0:
+            self.prune()
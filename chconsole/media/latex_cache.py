@@ -0,0 +1,130 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from chconsole.storage import chconsole_data_dir, write_atomically, SharedInstances
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def default_latex_dir():
+    """
+    Default directory of the LaTeX rendering cache.
+    :return: path of the directory.
+    """
+    return os.path.join(chconsole_data_dir(), 'latex')
+
+
+def latex_key(text, **params):
+    """
+    Key of a LaTeX rendering.
+    :param text: LaTeX source.
+    :param params: rendering parameters passed to latex_to_png.
+    :return: hex string.
+    """
+    digest = hashlib.sha1(text.encode('utf-8'))
+    for name in sorted(params):
+        digest.update('\0{}={!r}'.format(name, params[name]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LatexCache:
+    """
+    Two-level cache of LaTeX rendered as png: a least recently used in-memory cache,
+    backed by png files in a directory that persist across sessions.
+    Thread-safe; the files are written with write_atomically.
+    """
+    max_entries = 500  # maximum number of renderings kept in memory
+    directory = ''  # directory of the png files; no persistence if empty
+
+    _memory = None  # OrderedDict: key -> png bytes, least recently used first
+    _lock = None  # threading.Lock guarding _memory
+
+    def __init__(self, directory=None, max_entries=500):
+        """
+        Initialize.
+        :param directory: directory of the png files; default_latex_dir() if None; no persistence if ''.
+        :param max_entries: maximum number of renderings kept in memory.
+        """
+        self.directory = default_latex_dir() if directory is None else directory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.png')
+
+    def get(self, key):
+        """
+        Look up a rendering, first in memory, then on disk.
+        :param key: key from latex_key.
+        :return: png bytes or None if not cached.
+        """
+        with self._lock:
+            png = self._memory.get(key, None)
+            if png is not None:
+                self._memory.move_to_end(key)
+                return png
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    png = f.read()
+            except OSError:
+                return None
+            self._remember(key, png)
+        return png
+
+    def put(self, key, png):
+        """
+        Cache a rendering in memory and on disk.
+        :param key: key from latex_key.
+        :param png: png bytes.
+        :return:
+        """
+        self._remember(key, png)
+        if self.directory:
+            try:
+                write_atomically(self._path(key), png)
+            except OSError:
+                pass  # only cached in memory
+
+    def _remember(self, key, png):
+        """
+        Keep a rendering in memory.
+        :param key: key from latex_key.
+        :param png: png bytes.
+        :return:
+        """
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def render(self, render, text, **params):
+        """
+        Render LaTeX through the cache.
+        :param render: function like latex_to_png taking text and params and returning png bytes or None.
+        :param text: LaTeX source.
+        :param params: rendering parameters for render.
+        :return: png bytes or None if it cannot be rendered.
+        """
+        key = latex_key(text, **params)
+        png = self.get(key)
+        if png is None:
+            png = render(text, **params)
+            if png:  # failures are not cached; a LaTeX installation may be added later
+                self.put(key, png)
+        return png
+
+
+_shared = SharedInstances()  # LatexCache shared by the process
+
+
+def shared_latex_cache():
+    """
+    LaTeX cache of the process, created on first use.
+    :return: LatexCache.
+    """
+    return _shared.get(LatexCache)
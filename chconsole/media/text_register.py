@@ -1,66 +1,115 @@
+from collections import deque
+
+from qtconsole.qt import QtGui
 from traitlets import Int
 from traitlets.config.configurable import LoggingConfigurable
-from .right_aligned import RightAligned
+from .user_gutter import UserGutter
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
 
 class TextRegister(LoggingConfigurable):
     """
-    Register text that can either be shown or hidden simultaneously.
+    Register text labelling blocks of a document, such as user names of inputs, that can either be shown or
+    hidden simultaneously. The text is painted in a gutter beside the document, so that showing or hiding it
+    does not edit the document. Each labelled block refers to its label through its user state.
+    Labels are forgotten when their blocks are removed from the document, for example by truncation to the maximum
+    block count, so that the register only holds the labels of the document.
     """
-    _target = None  # QTextDocument
+    _target = None  # Q(Plain)TextEdit
     _visible = True  # whether the text is shown.
-    _register = None  # list of CenteredText
+    _labels = None  # dict: label id -> (text, style)
+    _anchors = None  # deque of (label id, QTextCursor at the start of the labelled block) in document order
+    _next_id = 0  # id of the next label
     _field = 0  # length of the field to show the text.
+    gutter = None  # UserGutter showing the text
 
     max_field = Int(30, config=True, help='Maximum field length')
+    field_step = Int(4, config=True, help='Number of characters by which the field length grows at least')
 
     def __init__(self, target, visible=True, **kwargs):
         """
         Initialize.
         :param target: Q(Plain)TextEdit
         :param visible: whether the text should be visible by default
-        :param style: html style to use for text; plain text if None.
         :return:
         """
         super(LoggingConfigurable, self).__init__(**kwargs)
         self._target = target
         self._visible = visible
-        self._register = list()
+        self._labels = dict()
+        self._anchors = deque()
+        self.gutter = UserGutter(target, self.label, shown=visible)
+        target.document().contentsChange.connect(self._on_contents_change)
+
+    def __len__(self):
+        """
+        Number of labels held.
+        :return: int.
+        """
+        return len(self._labels)
 
     def _update_field(self, new_text):
         """
         Update the field length; if the new text is longer than the existing field.
+        The field grows in steps, so that a few longer texts widen it only once.
         :param new_text: new text
-        :return: total offset resulting from updating the field length.
-        """
-        offset = 0
-        if new_text is not None:
-            new_field = min(len(new_text), self.max_field)
-            if new_field > self._field:
-                if self._visible:
-                    for item in self._register:
-                        item.shift(offset)
-                        item.adjust(self._target, self._field, new_field)
-                        offset += new_field - self._field
-                self._field = new_field
-        return offset
+        :return:
+        """
+        step = max(1, self.field_step)
+        new_field = min(-(-len(new_text) // step) * step, self.max_field)
+        if new_field > self._field:
+            self._field = new_field
+            self.gutter.set_field(new_field)
 
     def append(self, pos, text=None, style=None):
         """
-        Append text to the register and update the field length to accommodate the string.
-        :param pos: position of the text in the document; assumed to be after all other positions in the register.
-        :param text: string to be inserted.
+        Label the block at a position with text and update the field length to accommodate the text.
+        :param pos: position in the document; assumed to be after all other labelled blocks.
+        :param text: string labelling the block; nothing is shown if None.
         :param style: html style of text; plain text if None.
         :return:
         """
-        new_text = RightAligned(pos, text, style=style)
-        offset = self._update_field(text)
-        new_text.shift(offset)
-        self._register.append(new_text)
-        if self._visible:
-            new_text.insert(self._target, self._field)
+        if text is None:
+            return
+        block = self._target.document().findBlock(pos)
+        block.setUserState(self._next_id)
+        anchor = QtGui.QTextCursor(block)
+        anchor.setKeepPositionOnInsert(True)  # stay at the start of the block while its text is inserted
+        self._labels[self._next_id] = (text, style)
+        self._anchors.append((self._next_id, anchor))
+        self._next_id += 1
+        self._update_field(text)
+
+    def label(self, block):
+        """
+        Label of a block.
+        :param block: QTextBlock.
+        :return: (text, style) or None if the block is not labelled.
+        """
+        return self._labels.get(block.userState(), None)
+
+    def clear(self):
+        """
+        Forget all text, for example when the document has been cleared.
+        :return:
+        """
+        self._labels = dict()
+        self._anchors = deque()
+
+    def prune(self):
+        """
+        Forget the labels of the blocks removed from the start or the end of the document.
+        :return:
+        """
+        while self._anchors and self._anchors[0][1].block().userState() != self._anchors[0][0]:
+            del self._labels[self._anchors.popleft()[0]]
+        while self._anchors and self._anchors[-1][1].block().userState() != self._anchors[-1][0]:
+            del self._labels[self._anchors.pop()[0]]
+
+    def _on_contents_change(self, position, removed, added):
+        if removed > 0:
+            self.prune()
 
     def show(self):
         """
@@ -68,11 +117,7 @@ class TextRegister(LoggingConfigurable):
         :return:
         """
         if not self._visible:
-            offset = 0
-            for item in self._register:
-                item.shift(offset)
-                item.insert(self._target, self._field)
-                offset += self._field + item.right_length
+            self.gutter.set_shown(True)
             self._visible = True
 
     def hide(self):
@@ -81,11 +126,7 @@ class TextRegister(LoggingConfigurable):
         :return:
         """
         if self._visible:
-            offset = 0
-            for item in self._register:
-                item.shift(offset)
-                item.remove(self._target, self._field)
-                offset -= (self._field + item.right_length)
+            self.gutter.set_shown(False)
             self._visible = False
 
     def get_visible(self):
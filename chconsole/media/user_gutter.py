@@ -0,0 +1,159 @@
+from xml.sax.saxutils import escape
+
+from qtconsole.qt import QtGui, QtCore
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class UserGutter(QtGui.QWidget):
+    """
+    Area at the left of the viewport of a text edit, like a line number area, that paints the labels
+    of the visible blocks of the document right-aligned in a field.
+    Widening the field changes the width of the viewport, which lays out the document again; therefore the gutter
+    is widened once the event loop is idle, for all fields set until then.
+    """
+    _target = None  # Q(Plain)TextEdit
+    _label = None  # callable taking a QTextBlock, returning (text, style) of its label or None
+    _right_end = '> '  # right terminator of the labels
+    _field = 0  # length of the field for the text of the labels
+    _shown = True  # whether the labels are shown
+    _margin = 0  # width of the gutter reserved at the left of the viewport
+    _rendered = None  # dict: (text, style) -> QTextDocument of the label
+    _rendered_for = None  # (style sheet, font, field) of the labels rendered
+    _timer = None  # QTimer, single shot, firing when the event loop is idle to fit the gutter to the field
+
+    def __init__(self, target, label, right_end='> ', shown=True):
+        """
+        Initialize.
+        :param target: Q(Plain)TextEdit.
+        :param label: callable taking a QTextBlock, returning (text, style) of its label or None;
+        style is an html class of the text or None for plain text.
+        :param right_end: right terminator of the labels.
+        :param shown: whether the labels are shown.
+        """
+        super(UserGutter, self).__init__(target)
+        self._target = target
+        self._label = label
+        self._right_end = right_end
+        self._shown = shown
+        self._rendered = dict()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.fit)
+        target.installEventFilter(self)
+        target.verticalScrollBar().valueChanged.connect(self._repaint)
+        target.document().documentLayout().update.connect(self._repaint)
+        target.document().documentLayout().documentSizeChanged.connect(self.fit)
+        self.fit()
+
+    def _font(self):
+        return self._target.document().defaultFont()
+
+    def set_field(self, field):
+        """
+        Set the length of the field for the text of the labels; the gutter is fitted to it when the event loop is idle.
+        :param field: number of characters.
+        :return:
+        """
+        self._field = field
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def set_shown(self, shown):
+        """
+        Show or hide the labels.
+        :param shown: whether the labels are shown.
+        :return:
+        """
+        self._shown = shown
+        self.fit()
+
+    def margin(self):
+        """
+        Width needed for the labels.
+        :return: width in pixels; 0 if no labels are shown.
+        """
+        if not self._shown or self._field == 0:
+            return 0
+        return QtGui.QFontMetrics(self._font()).width('M' * self._field + self._right_end) + 4
+
+    @QtCore.Slot()
+    def fit(self):
+        """
+        Reserve the width needed for the labels at the left of the viewport.
+        :return:
+        """
+        margin = self.margin()
+        if margin != self._margin:
+            self._margin = margin
+            self._target.setViewportMargins(margin, 0, 0, 0)
+        self.setVisible(margin > 0)
+        self._place()
+
+    def _place(self):
+        rect = self._target.contentsRect()
+        self.setGeometry(rect.left(), rect.top(), self._margin, rect.height())
+
+    def _repaint(self, *args):
+        if self._margin:
+            self.update()
+
+    def eventFilter(self, obj, event):
+        if obj is self._target and event.type() == QtCore.QEvent.Resize:
+            self._place()
+        return False
+
+    def _block_top(self, block):
+        """
+        Top of a block in the coordinates of the viewport.
+        :param block: QTextBlock.
+        :return: number.
+        """
+        target = self._target
+        if isinstance(target, QtGui.QPlainTextEdit):
+            return target.blockBoundingGeometry(block).translated(target.contentOffset()).top()
+        rect = target.document().documentLayout().blockBoundingRect(block)
+        return rect.top() - target.verticalScrollBar().value()
+
+    def _render(self, text, style):
+        """
+        Document showing a label.
+        :param text: text of the label.
+        :param style: html class of the text or None for plain text.
+        :return: QTextDocument.
+        """
+        font = self._font()
+        sheet = self._target.document().defaultStyleSheet()
+        rendered_for = (sheet, font.toString(), self._field)
+        if self._rendered_for != rendered_for:
+            self._rendered = dict()
+            self._rendered_for = rendered_for
+        doc = self._rendered.get((text, style), None)
+        if doc is None:
+            doc = QtGui.QTextDocument()
+            doc.setDocumentMargin(0)
+            doc.setDefaultFont(font)
+            doc.setDefaultStyleSheet(sheet)
+            shown = escape(text[:self._field] + self._right_end, {' ': '&nbsp;'})
+            doc.setHtml('<span class="{}">{}</span>'.format(style, shown) if style else shown)
+            self._rendered[(text, style)] = doc
+        return doc
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(event.rect(), self.palette().color(QtGui.QPalette.Base))
+        height = self.height()
+        block = self._target.cursorForPosition(QtCore.QPoint(0, 0)).block()
+        while block.isValid():
+            top = self._block_top(block)
+            if top > height:
+                break
+            label = self._label(block)
+            if label is not None and block.isVisible():
+                doc = self._render(*label)
+                painter.save()
+                painter.translate(self._margin - 2 - doc.idealWidth(), top)
+                doc.drawContents(painter)
+                painter.restore()
+            block = block.next()
@@ -1,10 +1,11 @@
 from .export_item import ExportItem, Execute, Exit, Complete, Inspect, Restart, Interrupt, TailHistory, UserInput
+from .export_item import RangeHistory
 from .meta_command import AddUser, DropUser, filter_meta_command, StartRoundTable, StopRoundTable
 from .import_item import AtomicText, SplitText, ImportItem, ClearAll, History, ClearCurrentEntry
 from .import_item import InText, CompleteItems, CallTip, ExitRequested, InputRequest, EditFile, SplitItem
 from .import_item import Stderr, Stdout, HtmlText, PageDoc, Banner, Input, Result, ClearOutput
-from .import_item import SvgXml, Png, Jpeg, LaTeX, Image, to_qimage
-from .kernel_message import KernelMessage
+from .import_item import SvgXml, Png, Jpeg, LaTeX, Image, to_qimage, Content
+from .kernel_message import KernelMessage, broadcast_types
 from .source import Source
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -50,6 +50,21 @@ class TailHistory(ExportItem):
         self.length = length
 
 
+class RangeHistory(ExportItem):
+    """
+    Request of the history items of a session from a start line up to, excluding, a stop line.
+    """
+    session = 0  # session number
+    start = 1  # first line
+    stop = None  # line after the last one; to the end of the session if None
+
+    def __init__(self, session, start=1, stop=None):
+        super(RangeHistory, self).__init__()
+        self.session = session
+        self.start = start
+        self.stop = stop
+
+
 class Code(ExportItem):
     source = None  # Source
 
@@ -199,6 +199,7 @@ class HtmlText(AtomicText):
 class Image(SplitItem):
     image = None   # the image
     metadata = None  # metadata on the image such as dimensions
+    ticket = None  # ImageTicket of the image being rendered
 
     def __init__(self, image, metadata=None, username=''):
         super(Image, self).__init__(username=username)
@@ -222,6 +223,8 @@ class LaTeX(AtomicText):
     """
     LaTeX text.
     """
+    ticket = None  # ImageTicket of the image being rendered
+
     def __init__(self, text, username=''):
         super(LaTeX, self).__init__(text, ansi_codes=False, username=username)
 
@@ -3,6 +3,11 @@ from chconsole.standards import Importable
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
 
+# messages the kernel broadcasts to all clients on the iopub channel
+broadcast_types = frozenset(['stream', 'display_data', 'update_display_data', 'execute_input', 'execute_result',
+                             'error', 'status', 'clear_output', 'comm_open', 'comm_msg', 'comm_close'])
+
+
 class KernelMessage(Importable):
     raw = None  # dict, kernel message
     from_here = True  # whether the message is from the current session
@@ -32,6 +37,15 @@ class KernelMessage(Importable):
     def content(self):
         return self.raw['content']
 
+    @property
+    def broadcast(self):
+        """
+        Determine whether the kernel sends the message to all clients, rather than only to the client whose
+        request it replies to.
+        :return: True iff the message is broadcast on the iopub channel.
+        """
+        return self.type in broadcast_types
+
     @property
     def session(self):
         return self.raw['header']['session']
@@ -118,14 +118,33 @@ def pager_template(edit_class):
                 target.setCurrentIndex((index+1) % target.count())
             super(edit_class, self).hide()
 
-        def post(self, item):
+        def _render(self, item):
+            """
+            Replace the text of the pager by that of an item.
+            :param item: PageDoc.
+            :return:
+            """
             self.clear()
             if hasattr(self, 'insertHtml') and item.html_stream:
                 _post(item.html_stream.content, self)
             else:
                 _post(item.text_stream.content, self)
+
+        def post(self, item):
+            self._render(item)
             self.moveCursor(QtGui.QTextCursor.Start)
             self.setFocus()
             self.show()
 
+        def replace(self, item):
+            """
+            Replace the text of the pager by that of an item, keeping the scroll position and the focus.
+            :param item: PageDoc.
+            :return:
+            """
+            bar = self.verticalScrollBar()
+            value = bar.value()
+            self._render(item)
+            bar.setValue(value)
+
     return Pager
@@ -1,4 +1,6 @@
 from .receiver import receiver_template
 from .receiver_filter import ReceiverFilter
+from .output_queue import OutputQueue
+from .metrics import Metrics
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -0,0 +1,122 @@
+import threading
+
+from qtconsole.qt import QtCore
+
+from chconsole.media import image_key, shared_image_cache
+from chconsole.messages import LaTeX, to_qimage
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+_pool = None  # QThreadPool shared by all renderers
+_latex_lock = threading.Lock()  # LaTeX rendering through matplotlib is not thread-safe
+
+
+def _thread_pool():
+    """
+    Thread pool for rendering images, created on first use.
+    :return: QThreadPool.
+    """
+    global _pool
+    if _pool is None:
+        _pool = QtCore.QThreadPool()
+        _pool.setMaxThreadCount(max(2, QtCore.QThread.idealThreadCount() - 1))
+    return _pool
+
+
+def _content_key(item):
+    """
+    Content key of an item to be rendered.
+    :param item: Image or LaTeX item.
+    :return: content key for the image cache.
+    """
+    if isinstance(item, LaTeX):
+        return image_key('latex', item.text)
+    else:
+        return image_key(type(item).__name__.lower(), item.image, item.metadata)
+
+
+class ImageTicket:
+    """
+    Claim on an image being rendered.
+    """
+    item = None  # Image or LaTeX item to be rendered
+    key = ''  # content key of the image
+    ready = False  # whether rendering has finished
+    image = None  # QImage if rendering succeeded
+    error = None  # exception if rendering failed
+
+    def __init__(self, item):
+        """
+        Initialize.
+        :param item: Image or LaTeX item to be rendered.
+        """
+        self.item = item
+
+
+class _RenderJob(QtCore.QRunnable):
+    """
+    Render an image in a thread of the pool.
+    """
+    _ticket = None  # ImageTicket
+    _renderer = None  # ImageRenderer to notify
+
+    def __init__(self, ticket, renderer):
+        super(_RenderJob, self).__init__()
+        self._ticket = ticket
+        self._renderer = renderer
+
+    def run(self):
+        ticket = self._ticket
+        cache = shared_image_cache()
+        try:
+            ticket.key = _content_key(ticket.item)
+            image = cache.get(ticket.key)
+            if image is None:
+                if isinstance(ticket.item, LaTeX):
+                    with _latex_lock:
+                        image = to_qimage(ticket.item)
+                else:
+                    image = to_qimage(ticket.item)
+                if image.isNull():
+                    raise ValueError('Image could not be decoded.')
+                cache.put(ticket.key, image)
+            ticket.image = image
+        except Exception as e:
+            ticket.image = None
+            ticket.error = e
+        ticket.ready = True
+        try:
+            self._renderer.finished.emit(ticket)
+        except RuntimeError:
+            pass  # renderer deleted with its tab
+
+
+class ImageRenderer(QtCore.QObject):
+    """
+    Decode, scale and rasterize images in a thread pool; notifies about finished images in the thread of the renderer.
+    Identical images are rendered once and shared through the image cache of the process.
+    """
+    finished = QtCore.Signal(object)  # ImageTicket that has become ready
+    image_ready = QtCore.Signal(object)  # ImageTicket, delivered in the thread of the renderer
+
+    def __init__(self, parent=None):
+        """
+        Initialize.
+        :param parent: parent QObject.
+        """
+        super(ImageRenderer, self).__init__(parent)
+        self.finished.connect(self.image_ready, QtCore.Qt.QueuedConnection)
+
+    def request(self, item):
+        """
+        Start rendering an item unless it has already been requested.
+        :param item: Image or LaTeX item.
+        :return: ImageTicket of the item.
+        """
+        ticket = getattr(item, 'ticket', None)
+        if ticket is None:
+            ticket = ImageTicket(item)
+            item.ticket = ticket
+            _thread_pool().start(_RenderJob(ticket, self))
+        return ticket
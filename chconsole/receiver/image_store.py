@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class ImageStore:
+    """
+    Sources of the images of a transcript by content key: the most recently used sources are kept in memory
+    up to a budget; the others are spilled to files in a temporary directory, which is removed with the store.
+    """
+    max_bytes = 16 * 1024 * 1024  # memory budget for the sources
+    directory = ''  # directory of spilled sources; '' until the first source is spilled
+
+    _memory = None  # OrderedDict: key -> str or bytes source, least recently used first
+    _bytes = 0  # bytes of the sources in memory
+    _spilled = None  # dict: key -> whether the spilled source is str
+    _finalizer = None  # weakref.finalize removing the directory
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        Initialize empty store.
+        :param max_bytes: memory budget for the sources; a non-positive number spills every source.
+        """
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._spilled = dict()
+
+    def __contains__(self, key):
+        return key in self._memory or key in self._spilled
+
+    @property
+    def size(self):
+        """
+        Memory used by the sources.
+        :return: number of bytes.
+        """
+        return self._bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def put(self, key, data):
+        """
+        Store a source unless it is stored already, spilling least recently used sources beyond the budget.
+        :param key: content key of the image.
+        :param data: str or bytes source of the image.
+        :return:
+        """
+        if key in self:
+            return
+        self._memory[key] = data
+        self._bytes += len(data)
+        self._shrink()
+
+    def get(self, key):
+        """
+        Look up a source, reading it back into memory if it has been spilled.
+        :param key: content key of the image.
+        :return: str or bytes source or None if it is not available.
+        """
+        data = self._memory.get(key, None)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+        is_text = self._spilled.pop(key, None)
+        if is_text is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.remove(self._path(key))
+        except OSError:
+            return None  # lost with the temporary directory
+        data = data.decode('utf-8') if is_text else data
+        self.put(key, data)
+        return data
+
+    def discard(self, key):
+        """
+        Forget a source.
+        :param key: content key of the image.
+        :return:
+        """
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._bytes -= len(data)
+        elif self._spilled.pop(key, None) is not None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Forget all sources and remove the spilled ones.
+        :return:
+        """
+        self._memory.clear()
+        self._bytes = 0
+        self._spilled.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self.directory = ''
+
+    def _shrink(self):
+        """
+        Spill least recently used sources beyond the budget; a source that cannot be written stays in memory.
+        :return:
+        """
+        while self._bytes > self.max_bytes and self._memory:
+            key, data = self._memory.popitem(last=False)
+            self._bytes -= len(data)
+            if not self._spill(key, data):
+                self._memory[key] = data  # kept until it can be written; the store may exceed its budget
+                self._bytes += len(data)
+                break
+
+    def _spill(self, key, data):
+        """
+        Write a source to the temporary directory.
+        :param key: content key of the image.
+        :param data: str or bytes source of the image.
+        :return: whether the source has been written.
+        """
+        try:
+            if not self.directory:
+                self.directory = tempfile.mkdtemp(prefix='chconsole-transcript-')
+                self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+            with open(self._path(key), 'wb') as f:
+                f.write(data.encode('utf-8') if isinstance(data, str) else bytes(data))
+        except OSError:
+            return False
+        self._spilled[key] = isinstance(data, str)
+        return True
@@ -0,0 +1,169 @@
+import json
+from bisect import bisect_left
+from xml.sax.saxutils import escape
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+time_bounds = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)  # bucket bounds for times in msec
+count_bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 10000)  # bucket bounds for numbers of items
+size_bounds = (100, 1000, 10000, 100000, 1000000, 10000000)  # bucket bounds for numbers of bytes
+
+
+class Histogram:
+    """
+    Distribution of observed values in buckets with fixed upper bounds.
+    """
+    bounds = time_bounds  # upper bounds of the buckets; values above the last bound go into an extra bucket
+    counts = None  # list of numbers of values per bucket
+    count = 0  # number of values observed
+    total = 0.0  # sum of the values observed
+    maximum = 0.0  # largest value observed
+
+    def __init__(self, bounds=time_bounds):
+        """
+        Initialize.
+        :param bounds: increasing upper bounds of the buckets.
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def add(self, value):
+        """
+        Observe a value.
+        :param value: number.
+        :return:
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """
+        Estimate a percentile by the upper bound of its bucket.
+        :param fraction: fraction of the values below the percentile, between 0 and 1.
+        :return: upper bound of the bucket of the percentile, at most the largest value observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        """
+        Summary of the histogram.
+        :return: dict.
+        """
+        buckets = [[bound, count] for bound, count in zip(self.bounds, self.counts)]
+        buckets.append([None, self.counts[-1]])
+        return {'count': self.count, 'total': self.total, 'mean': self.mean, 'max': self.maximum,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95), 'p99': self.percentile(0.99),
+                'buckets': buckets}
+
+
+class Metrics:
+    """
+    Registry of named counters, gauges and histograms.
+    """
+    _counters = None  # dict: name -> number
+    _gauges = None  # dict: name -> callable returning the current value
+    _histograms = None  # dict: name -> Histogram
+
+    def __init__(self):
+        self._counters = dict()
+        self._gauges = dict()
+        self._histograms = dict()
+
+    def count(self, name, increment=1):
+        """
+        Increment a counter.
+        :param name: name of the counter.
+        :param increment: number to add.
+        :return:
+        """
+        self._counters[name] = self._counters.get(name, 0) + increment
+
+    def gauge(self, name, read):
+        """
+        Register a gauge.
+        :param name: name of the gauge.
+        :param read: callable without arguments returning the current value.
+        :return:
+        """
+        self._gauges[name] = read
+
+    def observe(self, name, value, bounds=time_bounds):
+        """
+        Add a value to a histogram.
+        :param name: name of the histogram.
+        :param value: number.
+        :param bounds: bounds of the buckets if the histogram is new.
+        :return:
+        """
+        histogram = self._histograms.get(name, None)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(bounds)
+        histogram.add(value)
+
+    def histogram(self, name):
+        """
+        Histogram by name.
+        :param name: name of the histogram.
+        :return: Histogram or None if nothing has been observed.
+        """
+        return self._histograms.get(name, None)
+
+    def reset(self):
+        """
+        Reset the counters and histograms; gauges remain registered.
+        :return:
+        """
+        self._counters = dict()
+        self._histograms = dict()
+
+    def snapshot(self):
+        """
+        Current values of all metrics.
+        :return: dict with keys 'counters', 'gauges', 'histograms'.
+        """
+        return {'counters': dict(self._counters),
+                'gauges': {name: read() for name, read in self._gauges.items()},
+                'histograms': {name: histogram.to_dict() for name, histogram in self._histograms.items()}}
+
+    def to_json(self):
+        """
+        Current values of all metrics in JSON.
+        :return: str.
+        """
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_html(self):
+        """
+        Current values of all metrics as html tables.
+        :return: str.
+        """
+        snapshot = self.snapshot()
+        values = dict(snapshot['gauges'])
+        values.update(snapshot['counters'])
+        rows = ['<tr><td>{}</td><td align="right">{}</td></tr>'.format(escape(name), values[name])
+                for name in sorted(values)]
+        html = '<h3>Receiver Statistics</h3><table>' + ''.join(rows) + '</table>'
+
+        header = ''.join('<th>{}</th>'.format(title) for title in ('', 'count', 'mean', 'p50', 'p95', 'p99', 'max'))
+        rows = list()
+        for name in sorted(snapshot['histograms']):
+            summary = snapshot['histograms'][name]
+            cells = ''.join('<td align="right">{:.4g}</td>'.format(summary[key])
+                            for key in ('mean', 'p50', 'p95', 'p99', 'max'))
+            rows.append('<tr><td>{}</td><td align="right">{}</td>{}</tr>'.format(escape(name), summary['count'], cells))
+        return html + '<table><tr>' + header + '</tr>' + ''.join(rows) + '</table>'
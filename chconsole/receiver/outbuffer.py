@@ -1,75 +1,121 @@
+from queue import Empty
+
 from qtconsole.qt import QtCore
 
-from chconsole.messages import SplitItem, ClearOutput
+from chconsole.messages import ClearOutput
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
 
-class OutBuffer(QtCore.QThread):
+class OutBuffer(QtCore.QObject):
     """
-    Buffer of items that correspond to blocks for output.
+    Scheduler that flushes the items queued for output in the GUI thread.
+    It is woken up when items are queued and flushes as many items as fit into a time budget per frame;
+    then it yields to the event loop and continues with the remaining items.
     """
     _target = None  # Receiver
+    _timer = None  # QTimer, single shot, firing when the event loop is idle
+
+    default_budget = 16  # default time budget per flush, in msec
+    frame_budget = 0  # time budget per flush in msec.
 
-    default_sleep = 100  # default sleep interval, in msec
-    _sleep_time = 0  # sleep time in msec., updated by the thread
+    _carry_over = None  # rest of a split item, to be flushed first
+    _precede_output = None  # ClearOutput waiting for the next output
 
-    item_ready = QtCore.Signal(SplitItem)
+    _wake = QtCore.Signal()  # request a flush; queued when emitted from another thread
 
-    def __init__(self, target, parent=None):
+    def __init__(self, target, frame_budget=0, parent=None):
         """
         Initialize.
-        :param target: target object for output and timer parent;
-                        has the method target.receive: OutItem->None that outputs one item as one block.
-        :param parent: parent object; recommended for efficiency of QThread.
+        :param target: target object for output;
+                        has the attribute target.output_q, queue of items to be output,
+                        the attribute target.max_blocks, configured maximum number of blocks in the document,
+                        and the method target.on_items_ready: iterable of OutItem->None that outputs each item as one block.
+        :param frame_budget: time budget per flush in msec.; default_budget if not positive.
+        :param parent: parent object.
         :return:
         """
         super(OutBuffer, self).__init__(parent)
         self._target = target
-        self._sleep_time = self.default_sleep
+        self.frame_budget = frame_budget if frame_budget > 0 else self.default_budget
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.flush)
+        self._wake.connect(self._schedule)
+
+    @property
+    def pending(self):
+        """
+        Whether items are waiting to be flushed.
+        :return: bool.
+        """
+        return bool(self._carry_over or not self._target.output_q.empty())
+
+    def wake(self):
+        """
+        Schedule a flush for when the event loop is idle, unless one is scheduled already.
+        :return:
+        """
+        self._wake.emit()
+
+    @QtCore.Slot()
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _next(self):
+        """
+        Next item to be flushed.
+        :return: item or None if there is none.
+        """
+        if self._carry_over:
+            item = self._carry_over
+            self._carry_over = None
+            return item
+        try:
+            item = self._target.output_q.get_nowait()
+        except Empty:
+            return None
+        self._target.output_q.task_done()
+        return item
+
+    def _batch(self, stamp):
+        """
+        Items to be flushed, until the time budget is used up, at most the configured maximum block count of lines.
+        The configured count is used rather than that of the document, which is unlimited while paged back.
+        :param stamp: QElapsedTimer started at the beginning of the flush.
+        :return: generator of items.
+        """
+        max_blocks = self._target.max_blocks
+        lines_left = max_blocks if max_blocks > 0 else 1
+        # if no max_blocks, then flush line by line, yielding after each line
+        while lines_left > 0 and stamp.elapsed() < self.frame_budget:
+            item = self._next()
+            if item is None:
+                break
+            if isinstance(item, ClearOutput) and item.wait:
+                if self._precede_output:
+                    yield self._precede_output
+                self._precede_output = item  # hold back until new output is available
+            else:  # not a ClearOutput that requires waiting or any other item
+                lines, item_first, item_rest = item.split(lines_left)
+                lines_left -= lines
+                self._carry_over = item_rest
+                if self._precede_output:
+                    precede_output = self._precede_output
+                    self._precede_output = None
+                    yield precede_output
+                yield item_first
 
-    def run(self):
+    @QtCore.Slot()
+    def flush(self):
         """
-        Flush pending items.
+        Flush pending items as one batch within the time budget.
         :return:
         """
-        # When to flush? timeout after a certain time interval
-        # What to flush? up to maximum block count
-        # How long to wait? Heuristics: time it took last time to flush
-        # The assumption for this heuristic is that the kernel sends a lot of output and there should be
-        # enough time for the application to process other events then drawing output. The interval between flush
-        # is chosen such that the time used for flushing is approximately equal to the time available for processing
-        # other events.
-        carry_over = None
-        precede_output = None
-        while self.isRunning():
-            self.msleep(self._sleep_time)
-            max_blocks = self._target.document().maximumBlockCount()
-            lines_left = max_blocks if max_blocks > 0 else 1
-            # if no max_blocks, then flush line by line with short brakes after each line
-            total_time = 0
-            while lines_left > 0 and (carry_over or not self._target.output_q.empty()):
-                item = carry_over if carry_over else self._target.output_q.get()
-                if isinstance(item, ClearOutput) and item.wait:
-                    if precede_output:  # send preceding ClearOutput
-                        self.item_ready.emit(precede_output)
-                        self._target.timing_guard.acquire()
-                        total_time += self._target.receive_time
-                    precede_output = item
-                else:  # not a ClearOutput that requires waiting or any other item
-                    lines, item_first, item_rest = item.split(lines_left)
-                    lines_left -= lines
-                    if precede_output:
-                        self.item_ready.emit(precede_output)
-                        self._target.timing_guard.acquire()
-                        total_time += self._target.receive_time
-                        precede_output = None
-                    self.item_ready.emit(item_first)
-                    self._target.timing_guard.acquire()
-                    total_time += self._target.receive_time
-                    if not carry_over:
-                        self._target.output_q.task_done()
-                    carry_over = item_rest
-            # Set the flush interval to equal the maximum time to flush this time around
-            # to give the system equal time to catch up with other events.
-            self._sleep_time = max(self.default_sleep, total_time)
+        stamp = QtCore.QElapsedTimer()
+        stamp.start()
+        self._target.on_items_ready(self._batch(stamp))
+        if self.pending:
+            self._schedule()  # yield to the event loop and continue
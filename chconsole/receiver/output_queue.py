@@ -0,0 +1,400 @@
+from queue import Queue
+
+from chconsole.messages import Stdout, Stderr, SplitText, PageDoc, ClearOutput
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def _merge_key(item):
+    """
+    Key identifying stream items that can be merged into one.
+    :param item: item to be output.
+    :return: key; None if the item cannot be merged.
+    """
+    if type(item) in (Stdout, Stderr):
+        data = item.content.data
+        if len(data) == 1 and type(data[0]) is SplitText:
+            return type(item), item.username, item.clearable, data[0].ansi_codes
+    return None
+
+
+def measure(item, images=True):
+    """
+    Size of an item to be output.
+    :param item: item to be output.
+    :param images: whether to count the characters of its images.
+    :return: number of characters of its text and, if counted, images; number of lines of its text.
+    """
+    if isinstance(item, PageDoc):
+        streams = [stream for stream in (item.text_stream, item.html_stream) if stream]
+    else:
+        streams = [item]
+    size = 0
+    lines = 0
+    for stream in streams:
+        content = getattr(stream, 'content', None)
+        for part in getattr(content, 'data', ()):
+            text = getattr(part, 'text', None)
+            if text is not None:
+                size += len(text)
+                lines += text.count('\n')
+            elif images:
+                size += len(getattr(part, 'image', None) or '')
+    return size, lines
+
+
+def has_image(item):
+    """
+    Determine whether an item to be output shows an image.
+    :param item: item to be output.
+    :return: bool.
+    """
+    content = getattr(item, 'content', None)
+    return any(getattr(part, 'image', None) is not None for part in getattr(content, 'data', ()))
+
+
+def elidable(item):
+    """
+    Determine whether an item to be output may be elided: only stream text is, while chat items such as
+    Input and Result, pages, banners, ClearOutput and images are always output.
+    :param item: item to be output.
+    :return: bool.
+    """
+    return type(item) in (Stdout, Stderr) and not has_image(item)
+
+
+def _overwrite(segments):
+    """
+    Line resulting from overwriting text from the start of the line.
+    :param segments: list of strings, each written from the start of the line.
+    :return: str.
+    """
+    line = ''
+    for segment in segments:
+        line = segment + line[len(segment):]
+    return line
+
+
+def collapse_returns(text):
+    """
+    Collapse carriage returns that rewrite lines, as progress bars do, into the latest state of each line.
+    Lines with escape sequences or backspaces are kept as they are, since their visible length is not known.
+    :param text: text with ansi codes.
+    :return: text with equivalent output.
+    """
+    if '\r' not in text:
+        return text
+    lines = text.split('\n')
+    for index, line in enumerate(lines):
+        if '\r' not in line or '\x1b' in line or '\b' in line:
+            continue
+        newline = '\r' if index < len(lines) - 1 and line.endswith('\r') else ''  # part of \r\n
+        if newline:
+            line = line[:-1]
+        segments = line.split('\r')
+        if len(segments) > 1:
+            # a leading \r still overwrites output preceding the text; a trailing one output following it
+            lines[index] = ('\r' if segments[0] == '' else '') + _overwrite(segments) + \
+                ('\r' if segments[-1] == '' else '') + newline
+    return '\n'.join(lines)
+
+
+def elision_text(lines, size):
+    """
+    Text of the marker replacing elided output.
+    :param lines: number of lines elided.
+    :param size: number of characters elided.
+    :return: marker text.
+    """
+    return '\n[... {} lines / {} bytes elided ...]\n'.format(lines, size)
+
+
+class _Elision:
+    """
+    Place of elided output in the queue.
+    """
+    lines = 0  # number of lines elided
+    size = 0  # number of characters elided
+
+
+class _Kept:
+    """
+    Item kept in the tail of elided output.
+    """
+    item = None  # item to be output
+    key = None  # merge key of item
+    chunks = None  # list of text chunks of item, if it can be merged
+    size = 0  # number of characters
+    lines = 0  # number of lines
+    elidable = True  # whether the item may be elided; only stream text is
+
+    def __init__(self, item, key, size, lines):
+        self.item = item
+        self.key = key
+        self.chunks = [item.content.data[0].text] if key is not None else None
+        self.size = size
+        self.lines = lines
+        self.elidable = elidable(item)
+
+
+class OutputQueue(Queue):
+    """
+    Queue of items to be output, which merges adjacent stream items of the same kind
+    (Stdout or Stderr, user, clearability) into one item, so that a flood of small stream messages
+    is rendered as few items. Other items, such as ClearOutput, separate the streams merged.
+    Lines rewritten by carriage returns in the merged text are collapsed into their latest state.
+    When frames of an animation, each output following a ClearOutput that waits for it, are queued faster
+    than they are rendered, the frames superseded by a later one are dropped.
+
+    The queue holds at most a budget of characters and lines of text. Half of the budget is available for
+    the head of the output. When the head is full, the queue only keeps the most recent output, up to the
+    other half of the budget, and the output in between is replaced by a marker stating how much
+    has been elided. Only stream text is elided: images, which are not counted, and other items such as
+    Input, Result, PageDoc, Banner and ClearOutput are always output, and so is an item put into an empty queue,
+    however large.
+    """
+    max_bytes = 0  # budget of characters of text; unbounded if not positive
+    max_lines = 0  # budget of lines of text; unbounded if not positive
+    collapse = True  # whether to collapse carriage returns rewriting lines of stream text
+    drop_frames = True  # whether to drop superseded frames
+
+    size = 0  # number of characters of text in the head of the queue
+    lines = 0  # number of lines in the head of the queue
+    merged = 0  # number of items merged into preceding items
+    elisions = 0  # number of elision markers inserted
+    elided_lines = 0  # number of lines elided
+    elided_bytes = 0  # number of characters elided
+    dropped_frames = 0  # number of frames dropped
+    dropped_items = 0  # number of items dropped with the frames
+
+    _open = None  # last item in the queue if it can take more text
+    _open_key = None  # merge key of _open
+    _open_chunks = None  # list of text chunks of _open not yet joined
+
+    _elision = None  # _Elision at the end of the head while output is elided
+    _kept = None  # list of _Kept, the tail of the output following _elision
+    _kept_size = 0  # number of characters in _kept
+    _kept_lines = 0  # number of lines in _kept
+
+    _frame = None  # last ClearOutput waiting for output in the queue, starting a frame
+    _frame_clearable = False  # whether all items after _frame are cleared by a ClearOutput
+
+    def __init__(self, maxsize=0, max_bytes=0, max_lines=0, collapse=True, drop_frames=True):
+        """
+        Initialize.
+        :param maxsize: maximum number of items; unbounded if not positive.
+        :param max_bytes: budget of characters of text; unbounded if not positive.
+        :param max_lines: budget of lines of text; unbounded if not positive.
+        :param collapse: whether to collapse carriage returns rewriting lines of stream text with ansi codes.
+        :param drop_frames: whether to drop superseded frames of animations.
+        """
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.collapse = collapse
+        self.drop_frames = drop_frames
+        super(OutputQueue, self).__init__(maxsize)
+
+    def _init(self, maxsize):
+        super(OutputQueue, self)._init(maxsize)
+        self._open_chunks = list()
+        self._kept = list()
+
+    def _exceeds(self, size, lines):
+        """
+        Determine whether output exceeds half of the budget.
+        :param size: number of characters.
+        :param lines: number of lines.
+        :return: bool.
+        """
+        return (0 < self.max_bytes < 2 * size) or (0 < self.max_lines < 2 * lines)
+
+    def _seal_open(self):
+        """
+        Finish the text of the open item, which then takes no more text.
+        :return:
+        """
+        if self._open is not None:
+            self._finish(self._open, self._open_chunks)
+            self._open = None
+            self._open_key = None
+            self._open_chunks = list()
+
+    def _finish(self, item, chunks):
+        """
+        Join the text chunks of a merged item and collapse its carriage returns.
+        :param item: item in the head of the queue.
+        :param chunks: list of text chunks of item.
+        :return:
+        """
+        text = chunks[0] if len(chunks) == 1 else ''.join(chunks)
+        if self.collapse and item.content.data[0].ansi_codes:
+            collapsed = collapse_returns(text)
+            if len(collapsed) != len(text):
+                self.size -= len(text) - len(collapsed)
+                self.lines -= text.count('\n') - collapsed.count('\n')
+                text = collapsed
+        if item.content.data[0].text is not text:
+            item.content.data[0].text = text
+
+    def _put(self, item):
+        size, lines = measure(item, images=False)
+        if self._elision is None and self.queue and elidable(item) and \
+                self._exceeds(self.size + size, self.lines + lines):
+            self._seal_open()
+            self._frame = None
+            self._elision = _Elision()
+            self.queue.append(self._elision)  # counted as the item put
+            self.elisions += 1
+            self._keep(item, size, lines)
+            return
+        if self._elision is not None:
+            self._keep(item, size, lines)
+            self.unfinished_tasks -= 1  # compensates the increment by put, since no entry is added
+            return
+
+        if self.drop_frames and isinstance(item, ClearOutput) and item.wait:
+            if self._frame is not None and self._frame_clearable:
+                self._drop_frame()  # the pending ClearOutput starts the new frame
+                self.unfinished_tasks -= 1  # compensates the increment by put, since no entry is added
+                return
+            self._seal_open()
+            super(OutputQueue, self)._put(item)
+            self._frame = item
+            self._frame_clearable = True
+            return
+        if self._frame is not None and not (isinstance(item, (Stdout, Stderr)) and item.clearable):
+            self._frame_clearable = False
+
+        self.size += size
+        self.lines += lines
+        key = _merge_key(item)
+        if key is not None and key == self._open_key:
+            self._open_chunks.append(item.content.data[0].text)
+            self.merged += 1
+            self.unfinished_tasks -= 1  # compensates the increment by put, since no entry is added
+            return
+        self._seal_open()
+        super(OutputQueue, self)._put(item)
+        if key is not None:
+            self._open = item
+            self._open_key = key
+            self._open_chunks = [item.content.data[0].text]
+
+    def _drop_frame(self):
+        """
+        Drop the items following the last ClearOutput waiting for output.
+        :return:
+        """
+        self._seal_open()
+        count = 0
+        while self.queue[-1] is not self._frame:
+            size, lines = measure(self.queue.pop(), images=False)
+            self.size -= size
+            self.lines -= lines
+            count += 1
+        if count:
+            self.unfinished_tasks -= count
+            self.dropped_frames += 1
+            self.dropped_items += count
+
+    def _keep(self, item, size, lines):
+        """
+        Add an item to the tail of elided output and elide the oldest output of the tail beyond the budget.
+        :param item: item to be output.
+        :param size: number of characters of item.
+        :param lines: number of lines of item.
+        :return:
+        """
+        key = _merge_key(item)
+        if key is not None and self._kept and self._kept[-1].key == key:
+            last = self._kept[-1]
+            last.chunks.append(item.content.data[0].text)
+            last.size += size
+            last.lines += lines
+            self.merged += 1
+        else:
+            self._kept.append(_Kept(item, key, size, lines))
+        self._kept_size += size
+        self._kept_lines += lines
+        while self._exceeds(self._kept_size, self._kept_lines) and self._elide_first():
+            pass
+
+    def _elide_first(self):
+        """
+        Elide the oldest elidable output of the tail: one chunk of text, some leading lines of text,
+        or one other item.
+        :return: whether output has been elided.
+        """
+        index = next((index for index, kept in enumerate(self._kept) if kept.elidable), None)
+        if index is None:
+            return False
+        first = self._kept[index]
+        if first.chunks is None or (len(first.chunks) == 1 and first.lines <= 1):
+            del self._kept[index]
+            self._elide(first.size, first.lines)
+        elif len(first.chunks) > 1:
+            chunk = first.chunks.pop(0)
+            self._elide(len(chunk), chunk.count('\n'))
+            first.size -= len(chunk)
+            first.lines -= chunk.count('\n')
+        else:  # a single chunk of several lines: drop its first half of the lines
+            text = first.chunks[0]
+            cut = 0
+            for _ in range(max(1, first.lines // 2)):
+                cut = text.index('\n', cut) + 1
+            first.chunks[0] = text[cut:]
+            lines = first.lines - first.chunks[0].count('\n')
+            self._elide(cut, lines)
+            first.size -= cut
+            first.lines -= lines
+        return True
+
+    def _elide(self, size, lines):
+        """
+        Account for elided output.
+        :param size: number of characters elided.
+        :param lines: number of lines elided.
+        :return:
+        """
+        self._elision.size += size
+        self._elision.lines += lines
+        self._kept_size -= size
+        self._kept_lines -= lines
+        self.elided_bytes += size
+        self.elided_lines += lines
+
+    def _get(self):
+        item = super(OutputQueue, self)._get()
+        if item is self._elision:
+            return self._end_elision()
+        if item is self._open:
+            self._seal_open()
+        elif item is self._frame:
+            self._frame = None
+        size, lines = measure(item, images=False)
+        self.size -= size
+        self.lines -= lines
+        return item
+
+    def _end_elision(self):
+        """
+        Move the tail of elided output into the queue.
+        :return: item showing the elision marker; the first item of the tail if nothing has been elided.
+        """
+        for kept in self._kept:
+            if kept.chunks is not None:
+                self._finish(kept.item, kept.chunks)
+            super(OutputQueue, self)._put(kept.item)
+        self.size += self._kept_size
+        self.lines += self._kept_lines
+        self.unfinished_tasks += len(self._kept)
+        elision = self._elision
+        self._elision = None
+        self._kept = list()
+        self._kept_size = 0
+        self._kept_lines = 0
+        if not elision.size and not elision.lines:
+            # the tail fitted into the budget after all
+            self.unfinished_tasks -= 1  # the marker is not output
+            return self._get()
+        return Stderr(elision_text(elision.lines, elision.size), clearable=False)
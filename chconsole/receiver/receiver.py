@@ -1,21 +1,25 @@
 import re
+import time
 from functools import singledispatch
-from queue import Queue
 
 from qtconsole.qt import QtCore, QtGui
 from qtconsole.util import MetaQObjectHasTraits
-from traitlets import Integer, Unicode
+from traitlets import Integer, Unicode, Bool
 
 from chconsole._version import __version__
-from chconsole.media import (register_qimage, is_comment, de_comment,
-                             TextRegister)
+from chconsole.media import (is_comment, de_comment,
+                             TextRegister, ImageRegister, shared_image_cache)
 from chconsole.messages import (ExportItem, AtomicText, Image, SvgXml,
-                                Jpeg, Png, SplitText, LaTeX, to_qimage,
+                                Jpeg, Png, SplitText, LaTeX,
                                 Stderr, Stdout, HtmlText, PageDoc, Banner,
-                                Input, Result, ClearOutput, SplitItem)
+                                Input, Result, ClearOutput)
 from chconsole.standards import DocumentConfig
 from chconsole.standards import ViewportFilter, TextAreaFilter
 from .outbuffer import OutBuffer
+from .output_queue import OutputQueue, measure
+from .metrics import Metrics, count_bounds, size_bounds
+from .transcript import Transcript
+from .image_renderer import ImageRenderer
 from .receiver_filter import ReceiverFilter
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -59,15 +63,41 @@ def _covers(edit_widget, text):
     return re.match("(?:[^\n]*\n){%i}" % min_lines, text)
 
 
-def _insert_stream_content(target, item, cursor):
-    img = item.content.get(Jpeg)
+def _select_image(content):
+    """
+    Select the image to be shown from stream content.
+    :param content: Content of a stream.
+    :return: Image or LaTeX item; None if there is none to be shown.
+    """
+    img = content.get(Jpeg)
     # RichJupyterWidget:
     # Do we support jpg?
     # it seems that sometime jpg support is a plugin of QT, so try to assume
     # it is not always supported.
     jpeg_supported = QtCore.QByteArray(b'jpeg') in QtGui.QImageReader.supportedImageFormats()
     if not img or not jpeg_supported:
-        img = item.content.get((SvgXml, Png, LaTeX))
+        img = content.get((SvgXml, Png, LaTeX))
+    return img
+
+
+def _insert_rendered_image(target, ticket, cursor):
+    """
+    Insert an image that has been rendered.
+    :param target: Receiver.
+    :param ticket: ready ImageTicket.
+    :param cursor: QTextCursor where to insert.
+    :return:
+    """
+    if ticket.error is not None:
+        _receive(Stderr('Received invalid image/latex data.\n'), target)
+    else:
+        name = target.image_register.insert(cursor, ticket.key, ticket.image)
+        if isinstance(ticket.item, SvgXml):
+            target.name_to_svg_map[name] = ticket.item
+
+
+def _insert_stream_content(target, item, cursor):
+    img = _select_image(item.content)
     if img and isinstance(target, QtGui.QTextEdit):
         #Test:
         # from IPython.display import Image
@@ -77,15 +107,12 @@ def _insert_stream_content(target, item, cursor):
         # Image(filename='../yy_testing/baby-squirrel.png')
 
         cursor.insertText('\n')
-        try:
-            qimage = to_qimage(img)
-        except ValueError:
-            _receive(Stderr('Received invalid image/latex data.\n'), target)
-        else:
-            image_format = register_qimage(target.document(), qimage)
-            target.insert_qimage(image_format, cursor)
-            if isinstance(img, SvgXml):
-                target.name_to_svg_map[image_format.name()] = img
+        # usually rendering has been started when the item was posted
+        ticket = target.image_renderer.request(img)
+        if ticket.ready:
+            _insert_rendered_image(target, ticket, cursor)
+        else:  # keep the order of the output with a placeholder until the image is ready
+            target.insert_pending_image(ticket, cursor)
     else:
         html = item.content.get(HtmlText)
         if html:
@@ -97,6 +124,19 @@ def _insert_stream_content(target, item, cursor):
                 target.ansi_processor.reset_sgr()
 
 
+def _metric_class(item):
+    """
+    Class of an item for render time statistics.
+    :param item: item to be output.
+    :return: name of the class of the item, or of its image if it shows one.
+    """
+    if isinstance(item, (Result, Stdout, Stderr)):
+        img = item.content.get((Jpeg, SvgXml, Png, LaTeX))
+        if img:
+            return type(img).__name__
+    return type(item).__name__
+
+
 @singledispatch
 def _receive(item, target):
     pass
@@ -123,19 +163,29 @@ def _(item, target):
 
 @_receive.register(Banner)
 def _(item, target):
-    if target.show_banner.tryAcquire():
-        cursor = target.end_cursor
-        target.clear_cursor = None
-        stream = item.stream
-        stream.content.text = target.banner + stream.content.text
-        _receive(stream, target)
-        if item.help_links:
-            cursor.insertText('\nHelp Links')
-            for helper in item.help_links:
-                target.insert_ansi_text('\n' + helper['text'] + ': ', item.ansi_codes and target.use_ansi, cursor)
-                url = helper['url']
-                target.insert_html('<a href="' + url + '">' + url + '</a>', cursor)
-        cursor.insertText('\n')
+    cursor = target.end_cursor
+    target.clear_cursor = None
+    _receive(item.stream, target)
+    if item.help_links:
+        cursor.insertText('\nHelp Links')
+        for helper in item.help_links:
+            target.insert_ansi_text('\n' + helper['text'] + ': ', item.ansi_codes and target.use_ansi, cursor)
+            url = helper['url']
+            target.insert_html('<a href="' + url + '">' + url + '</a>', cursor)
+    cursor.insertText('\n')
+
+
+def _claim_banner(item, target):
+    """
+    Claim the only showing of the banner, which is prefixed by the banner of the receiver.
+    :param item: Banner.
+    :param target: Receiver.
+    :return: Banner to record and show, or None if the banner has been claimed before.
+    """
+    if not target.show_banner.tryAcquire():
+        return None
+    content = AtomicText(target.banner + item.content.text, ansi_codes=item.ansi_codes, username=item.username)
+    return Banner(content, help_links=item.help_links, clearable=item.clearable, username=item.username)
 
 
 @_receive.register(Input)
@@ -171,7 +221,6 @@ def _(item, target):
     cursor = target.end_cursor
     target.clear_cursor = None
     cursor.insertText(target.output_sep)
-    target.text_register.append(cursor.position())
     target.insert_html(_make_out_prompt(target.out_prompt, item.execution_count), cursor)
     # JupyterWidget: If the repr is multiline, make sure we start on a new line,
     # so that its lines are aligned.
@@ -186,7 +235,6 @@ def _(item, target):
     cursor = target.end_cursor
     target.clear_cursor = None
     cursor.insertText(target.output_sep)
-    target.text_register.append(cursor.position())
     # do not show prompt, since there is none for images; otherwise same as regular Result display
 
     result = Result()
@@ -220,19 +268,62 @@ def receiver_template(edit_class):
         max_blocks = Integer(500, config=True,
                              help="""
             The maximum number of blocks in the document before truncating the document.
+            Truncated output is kept in the transcript and paged in again when scrolling back.
             Specifying a non-positive number disables truncation (not recommended).
             """)
         in_prompt = Unicode(default_in_prompt, config=True)
         chat_prompt = Unicode(default_chat_prompt, config=True)
         out_prompt = Unicode(default_out_prompt, config=True)
 
+        transcript_image_bytes = Integer(16 * 1024 * 1024, config=True,
+                                         help="""
+            Memory budget in bytes for the sources of images kept in the transcript.
+            Sources beyond it are kept in a temporary directory until they are paged in again.
+            """)
+        transcript_text_bytes = Integer(16 * 1024 * 1024, config=True,
+                                        help="""
+            Memory budget in bytes for the text kept in the transcript.
+            Older text beyond it is kept in a temporary file until it is paged in again.
+            """)
+
         text_register = None  # TextRegister for code input and output lines
+        transcript = None  # Transcript of all output received
+        _window = None  # (first, last + 1) index of the records in the document when paged; None when live
+        _paging = False  # whether the document is being paged
 
-        output_q = None  # Queue
+        image_cache_size = Integer(64 * 1024 * 1024, config=True,
+                                   help="""
+            Memory budget in bytes for rendered images kept for reuse by all tabs.
+            """)
+        image_register = None  # ImageRegister of the images in the document
+        image_renderer = None  # ImageRenderer
+        _pending_images = None  # dict: ImageTicket -> list of (resource name, QTextCursor at the placeholder)
+        _placeholder = None  # QImage shown while an image is rendered
+        _placeholder_count = 0  # number of placeholders inserted, for unique resource names
+
+        output_q = None  # OutputQueue
+        output_queue_bytes = Integer(8 * 1024 * 1024, config=True,
+                                     help="""
+            Number of characters of text output waiting to be rendered before the middle of the output is elided.
+            Images are not counted. Specifying a non-positive number disables the limit.
+            """)
+        output_queue_lines = Integer(50000, config=True,
+                                     help="""
+            Number of lines of output waiting to be rendered before the middle of the output is elided.
+            Specifying a non-positive number disables the limit.
+            """)
+        drop_frames = Bool(True, config=True,
+                           help="""
+            Whether to skip frames of animations, each output following clear_output(wait=True),
+            that have been superseded by a later frame before they are rendered.
+            """)
         _out_buffer = None  # OutBuffer
-
-        timing_guard = None  # QSemaphore
-        receive_time = 0
+        metrics = None  # Metrics of the output pipeline
+        _last_flush = 0  # time.perf_counter() at the start of the last flush
+        frame_budget = Integer(16, config=True,
+                               help="""
+            Time in milliseconds spent on rendering queued output before yielding to other events.
+            """)
 
         show_banner = None  # QSemaphore; allow showing the banner only once
 
@@ -261,6 +352,7 @@ def receiver_template(edit_class):
         release_focus = QtCore.Signal()  # signal to release the focus
 
         please_export = QtCore.Signal(ExportItem)  # signal items to be handled by the kernel
+        output_rendered = QtCore.Signal()  # all output posted so far has been rendered, including its images
 
         def __init__(self, text='', use_ansi=True, show_users=False,
                      parent=None, **kwargs):
@@ -281,14 +373,24 @@ def receiver_template(edit_class):
             # Setting a positive maximum block count will automatically
             # disable the undo/redo history
             self.document().setMaximumBlockCount(self.max_blocks)
-            self.output_q = Queue()
-            self.timing_guard = QtCore.QSemaphore()
-            self._out_buffer = OutBuffer(self, self)
-            self._out_buffer.item_ready.connect(self.on_item_ready)
-            self._out_buffer.start()
+            self.transcript = Transcript(self.transcript_image_bytes, self.transcript_text_bytes)
+            self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+            self.output_q = OutputQueue(max_bytes=self.output_queue_bytes, max_lines=self.output_queue_lines,
+                                        collapse=self.use_ansi, drop_frames=self.drop_frames)
+            self._out_buffer = OutBuffer(self, self.frame_budget, self)
+            self.metrics = Metrics()
+            self._register_gauges()
 
             self.show_banner = QtCore.QSemaphore(1)
 
+            shared_image_cache().set_budget(self.image_cache_size)
+            self.image_register = ImageRegister(self.document(), released=self._on_image_released)
+            self.image_renderer = ImageRenderer(self)
+            self.image_renderer.image_ready.connect(self._on_image_ready)
+            self._pending_images = dict()
+            self._placeholder = QtGui.QImage(1, 1, QtGui.QImage.Format_ARGB32)
+            self._placeholder.fill(QtCore.Qt.transparent)
+
             self.setAcceptDrops(True)
 
             self.viewport_filter = ViewportFilter(self)
@@ -333,16 +435,178 @@ def receiver_template(edit_class):
 
             return QtCore.QSize(width, height)
 
-        @QtCore.Slot(SplitItem)
-        def on_item_ready(self, item):
-            # print('receive: '+item.text)
-            stamp = QtCore.QTime()
-            stamp.start()
-            _receive(item, self)
-            self.receive_time = stamp.elapsed()
-            if self.timing_guard:
-                self.timing_guard.release()
-            self.ensureCursorVisible()
+        def on_items_ready(self, items):
+            """
+            Output a batch of items within one edit block, so that the document is laid out once.
+            :param items: iterable of items, each output as one block.
+            :return:
+            """
+            start = time.perf_counter()
+            depth = self.output_q.qsize()
+            count = 0
+            size = 0
+            cursor = QtGui.QTextCursor(self.document())
+            cursor.beginEditBlock()
+            try:
+                for item in items:
+                    if isinstance(item, Banner):
+                        item = _claim_banner(item, self)
+                        if item is None:
+                            continue
+                    self.transcript.record(item)
+                    if self._window is None:  # otherwise paged in when scrolling to the end
+                        stamp = time.perf_counter()
+                        _receive(item, self)
+                        self.metrics.observe('render_ms.' + _metric_class(item), (time.perf_counter() - stamp) * 1000)
+                        count += 1
+                    size += measure(item)[0]
+            finally:
+                cursor.endEditBlock()
+            if count:
+                self.ensureCursorVisible()
+
+            end = time.perf_counter()
+            if size or count:
+                if self._last_flush:
+                    self.metrics.observe('flush.interval_ms', (start - self._last_flush) * 1000)
+                self._last_flush = start
+                self.metrics.observe('flush.ms', (end - start) * 1000)
+                self.metrics.observe('flush.items', count, count_bounds)
+                self.metrics.observe('flush.bytes', size, size_bounds)
+                self.metrics.observe('flush.queue_depth', depth, count_bounds)
+            if self.idle:
+                self.output_rendered.emit()
+
+        def _register_gauges(self):
+            """
+            Register the gauges of the output pipeline with the metrics.
+            :return:
+            """
+            queue = self.output_q
+            for name in ('merged', 'elisions', 'elided_lines', 'elided_bytes', 'dropped_frames', 'dropped_items'):
+                self.metrics.gauge('output_q.' + name, lambda name=name: getattr(queue, name))
+            self.metrics.gauge('output_q.depth', queue.qsize)
+            self.metrics.gauge('output_q.bytes', lambda: queue.size)
+            self.metrics.gauge('output_q.lines', lambda: queue.lines)
+            self.metrics.gauge('transcript.records', lambda: len(self.transcript))
+            self.metrics.gauge('transcript.bytes', lambda: self.transcript.size)
+            self.metrics.gauge('transcript.image_bytes', lambda: self.transcript.image_size)
+            self.metrics.gauge('document.blocks', lambda: self.document().blockCount())
+            self.metrics.gauge('images.cached_bytes', lambda: shared_image_cache().size)
+
+        def clear(self):
+            """
+            Clear the document and the transcript.
+            :return:
+            """
+            edit_class.clear(self)
+            self.text_register.clear()
+            self.transcript.clear()
+            self.clear_cursor = None
+            self._go_live()
+
+        def _go_live(self):
+            """
+            Show output as it is received, truncating the document to the maximum block count.
+            :return:
+            """
+            self._window = None
+            self.document().setMaximumBlockCount(self.max_blocks)
+
+        def _first_shown(self):
+            """
+            Index of the first record in the document.
+            :return: int.
+            """
+            if self._window is not None:
+                return self._window[0]
+            return self._back(len(self.transcript), self.max_blocks)
+
+        def _back(self, end, lines):
+            """
+            Index of the first record of records ending before a given index that have a given number of lines.
+            :param end: index after the last record.
+            :param lines: number of lines.
+            :return: int.
+            """
+            start = end
+            while start > 0 and lines > 0:
+                start -= 1
+                lines -= self.transcript.lines(start)
+            return start
+
+        def _forward(self, start, lines):
+            """
+            Index after the last record of records starting at a given index that have a given number of lines.
+            :param start: index of the first record.
+            :param lines: number of lines.
+            :return: int.
+            """
+            end = start
+            while end < len(self.transcript) and lines > 0:
+                lines -= self.transcript.lines(end)
+                end += 1
+            return end
+
+        def _page(self, start, end, anchor, at_top):
+            """
+            Replace the document by records of the transcript and keep the view at a record.
+            :param start: index of the first record.
+            :param end: index after the last record.
+            :param anchor: index of the record to keep in view.
+            :param at_top: whether the anchor is shown at the top of the view; otherwise at the bottom.
+            :return:
+            """
+            self._paging = True
+            self.metrics.count('transcript.pages')
+            document = self.document()
+            document.setMaximumBlockCount(0)
+            document.setUndoRedoEnabled(False)
+            edit_class.clear(self)
+            self.text_register.clear()
+            self.clear_cursor = None
+            anchor_position = None
+            cursor = QtGui.QTextCursor(document)
+            cursor.beginEditBlock()
+            try:
+                for index in range(start, end):
+                    if index == anchor:
+                        anchor_position = self.end_cursor.position()
+                    _receive(self.transcript.item(index), self)
+            finally:
+                cursor.endEditBlock()
+            if anchor_position is None:
+                anchor_position = self.end_cursor.position()
+            if end >= len(self.transcript):
+                self._go_live()
+            else:
+                self._window = (start, end)
+            cursor.setPosition(anchor_position)
+            bar = self.verticalScrollBar()
+            top = self.cursorRect(cursor).top()
+            bar.setValue(bar.value() + (top if at_top else top - self.viewport().height()))
+            self._paging = False
+
+        @QtCore.Slot(int)
+        def _on_scrolled(self, value):
+            """
+            Page older records in when scrolled to the top and newer records when scrolled to the bottom.
+            :param value: value of the vertical scroll bar.
+            :return:
+            """
+            bar = self.verticalScrollBar()
+            if self._paging or bar.minimum() == bar.maximum() or self.max_blocks <= 0:
+                return
+            if value == bar.minimum():
+                first = self._first_shown()
+                if first > 0:
+                    start = self._back(first, self.max_blocks // 2)
+                    self._page(start, self._forward(start, self.max_blocks), first, True)
+            elif value == bar.maximum() and self._window is not None:
+                last = min(self._window[1], len(self.transcript))
+                end = self._forward(last, self.max_blocks // 2)
+                start = self._back(end, self.max_blocks)
+                self._page(start, end, last, False)
 
         @QtCore.Slot()
         def set_focus(self):
@@ -352,8 +616,76 @@ def receiver_template(edit_class):
             """
             self.setFocus()
 
+        @property
+        def idle(self):
+            """
+            Whether all output posted so far has been rendered, including its images.
+            :return: bool.
+            """
+            return not self._out_buffer.pending and not self._pending_images
+
         def post(self, item):
+            if isinstance(self, QtGui.QTextEdit):
+                # start rendering images while the item waits in the queue
+                if isinstance(item, (Image, LaTeX)):
+                    img = _select_image(Result(item).content)
+                elif isinstance(item, (Result, Stdout, Stderr)):
+                    img = _select_image(item.content)
+                else:
+                    img = None
+                if img:
+                    self.image_renderer.request(img)
             self.output_q.put(item)
+            self._out_buffer.wake()
+
+        def insert_pending_image(self, ticket, cursor):
+            """
+            Insert a placeholder for an image that is being rendered.
+            :param ticket: ImageTicket of the image.
+            :param cursor: QTextCursor where to insert.
+            :return:
+            """
+            self._placeholder_count += 1
+            name = 'pending-image-{}'.format(self._placeholder_count)
+            self.document().addResource(QtGui.QTextDocument.ImageResource, QtCore.QUrl(name), self._placeholder)
+            image_format = QtGui.QTextImageFormat()
+            image_format.setName(name)
+            self.insert_qimage(image_format, cursor)
+            anchor = QtGui.QTextCursor(self.document())
+            anchor.setPosition(cursor.position() - 2)  # the image precedes a block separator
+            self._pending_images.setdefault(ticket, list()).append((name, anchor))
+
+        @QtCore.Slot(object)
+        def _on_image_ready(self, ticket):
+            """
+            Replace the placeholders of an image that has been rendered.
+            :param ticket: ImageTicket of the image.
+            :return:
+            """
+            for name, anchor in self._pending_images.pop(ticket, list()):
+                anchor.movePosition(QtGui.QTextCursor.NextCharacter, QtGui.QTextCursor.KeepAnchor)
+                image_format = anchor.charFormat()
+                # the placeholder may have been removed by truncation or clearing
+                if image_format.isImageFormat() and image_format.toImageFormat().name() == name:
+                    if ticket.error is not None:
+                        anchor.insertText('Received invalid image/latex data.')
+                    else:
+                        anchor.setPosition(anchor.selectionStart())
+                        image_name = self.image_register.replace(anchor, ticket.key, ticket.image)
+                        if isinstance(ticket.item, SvgXml):
+                            self.name_to_svg_map[image_name] = ticket.item
+                # free the placeholder resource, also if the placeholder has been removed
+                self.document().addResource(QtGui.QTextDocument.ImageResource, QtCore.QUrl(name), QtGui.QImage())
+            if self.idle:
+                self.output_rendered.emit()
+
+        def _on_image_released(self, name):
+            """
+            Forget about an image resource that is not shown anymore.
+            :param name: resource name.
+            :return:
+            """
+            self.name_to_svg_map.pop(name, None)
 
         # Adopted from ConsoleWidget
         def covers(self, page_doc):
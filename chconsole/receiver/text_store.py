@@ -0,0 +1,104 @@
+import tempfile
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class TextStore:
+    """
+    Append-only utf-8 text of a transcript: the most recent text is kept in memory up to a budget;
+    older text is spilled to an anonymous temporary file, which is removed with the store.
+    """
+    max_bytes = 16 * 1024 * 1024  # memory budget for the text
+
+    _memory = None  # bytearray of the text from _offset on
+    _offset = 0  # number of bytes spilled; offset of _memory in the text
+    _file = None  # temporary file of the spilled text; None until text is spilled
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        Initialize empty store.
+        :param max_bytes: memory budget for the text; a non-positive number spills all text.
+        """
+        self.max_bytes = max_bytes
+        self._memory = bytearray()
+
+    def __len__(self):
+        return self._offset + len(self._memory)
+
+    @property
+    def size(self):
+        """
+        Memory used by the text.
+        :return: number of bytes.
+        """
+        return len(self._memory)
+
+    def extend(self, data):
+        """
+        Append text, spilling older text beyond the budget.
+        :param data: utf-8 bytes.
+        :return:
+        """
+        self._memory.extend(data)
+        if len(self._memory) > self.max_bytes:
+            self._spill(len(self._memory) - max(0, self.max_bytes) // 2)
+
+    def get(self, start, end):
+        """
+        Text between two offsets.
+        :param start: start offset.
+        :param end: end offset.
+        :return: utf-8 bytes; empty if spilled text cannot be read back.
+        """
+        data = b''
+        if start < self._offset:
+            try:
+                self._file.seek(start)
+                data = self._file.read(min(end, self._offset) - start)
+            except OSError:
+                return b''
+        return data + bytes(self._memory[max(0, start - self._offset):max(0, end - self._offset)])
+
+    def truncate(self, length):
+        """
+        Remove the text from an offset on.
+        :param length: offset of the text to remove.
+        :return:
+        """
+        if length >= self._offset:
+            del self._memory[length - self._offset:]
+            return
+        self._memory = bytearray()
+        self._offset = length
+        try:
+            self._file.truncate(length)
+        except OSError:
+            pass  # the spilled text beyond the offset is not read anymore
+
+    def clear(self):
+        """
+        Forget all text and remove the spilled text.
+        :return:
+        """
+        self._memory = bytearray()
+        self._offset = 0
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _spill(self, count):
+        """
+        Write the oldest text in memory to the temporary file; text that cannot be written stays in memory.
+        :param count: number of bytes to spill.
+        :return:
+        """
+        try:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(prefix='chconsole-transcript-')
+            self._file.seek(self._offset)
+            self._file.write(self._memory[:count])
+            self._file.flush()
+        except OSError:
+            return  # kept until it can be written; the store may exceed its budget
+        del self._memory[:count]
+        self._offset += count
@@ -0,0 +1,304 @@
+from array import array
+from functools import singledispatch
+
+from chconsole.media import image_key
+from chconsole.messages import (Stdout, Stderr, Input, Result, PageDoc, Banner, ClearOutput,
+                                Content, Image, Jpeg, Png, SvgXml, LaTeX, SplitText, HtmlText, AtomicText)
+from .image_store import ImageStore
+from .text_store import TextStore
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+_kinds = (Stdout, Stderr, Input, Result, Image, PageDoc)  # classes of records; index is the kind stored
+_image_classes = (Jpeg, Png, SvgXml, LaTeX)  # classes of images; index is the image class stored
+
+_CLEARABLE = 1  # flag: the record can be cleared by ClearOutput
+_HTML = 2  # flag: the text is html
+_ANSI = 4  # flag: the text has ansi codes
+
+unavailable_image_text = '[image no longer available]'  # shown for an image whose source has been lost
+
+
+class Transcript:
+    """
+    Compact record of all output received by a Receiver, from which any part of the output can be rendered again.
+    Each record holds the kind of an item, its user, its execution count, its text and a reference to its image,
+    in arrays indexed by record; the text of all records is kept in one utf-8 TextStore, bounded in memory.
+    Images are referenced by content key; their sources are kept in an ImageStore, bounded in memory,
+    and fetched again when a record is rendered again.
+    """
+    _kinds = None  # array of kind indexes
+    _flags = None  # array of flags
+    _users = None  # array of user indexes into _user_names
+    _counts = None  # array of execution counts
+    _starts = None  # array of start offsets of the text in _text
+    _lines = None  # array of numbers of lines
+    _images = None  # array of image indexes into _image_refs; -1 if there is no image
+    _text = None  # TextStore of the utf-8 text of the records
+    _image_refs = None  # list of (image class index, content key, metadata)
+    _image_counts = None  # dict: content key -> number of references in _image_refs
+    _image_store = None  # ImageStore of the image sources by content key
+    _user_names = None  # list of user names
+    _user_index = None  # dict: user name -> index into _user_names
+    _clearable = False  # whether the last record can be cleared by ClearOutput
+
+    def __init__(self, image_bytes=16 * 1024 * 1024, text_bytes=16 * 1024 * 1024):
+        """
+        Initialize empty transcript.
+        :param image_bytes: memory budget for the image sources; sources beyond it are spilled to disk.
+        :param text_bytes: memory budget for the text; older text beyond it is spilled to disk.
+        """
+        self._image_store = ImageStore(image_bytes)
+        self._text = TextStore(text_bytes)
+        self.clear()
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def clear(self):
+        """
+        Forget all records.
+        :return:
+        """
+        self._kinds = array('B')
+        self._flags = array('B')
+        self._users = array('I')
+        self._counts = array('i')
+        self._starts = array('Q')
+        self._lines = array('I')
+        self._images = array('i')
+        self._text.clear()
+        self._image_refs = list()
+        self._image_counts = dict()
+        self._image_store.clear()
+        self._user_names = list()
+        self._user_index = dict()
+        self._clearable = False
+
+    @property
+    def size(self):
+        """
+        Number of bytes of text held in memory.
+        :return: int.
+        """
+        return self._text.size
+
+    @property
+    def image_size(self):
+        """
+        Number of bytes of image sources held in memory.
+        :return: int.
+        """
+        return self._image_store.size
+
+    def append(self, kind, text='', username='', execution_count=0, clearable=False, html=False, ansi_codes=False,
+               image=None):
+        """
+        Append a record.
+        :param kind: class of the item, one of Stdout, Stderr, Input, Result, Image, PageDoc.
+        :param text: text of the item.
+        :param username: user name of the item.
+        :param execution_count: execution count of the item.
+        :param clearable: whether the item can be cleared by ClearOutput.
+        :param html: whether the text is html.
+        :param ansi_codes: whether the text has ansi codes.
+        :param image: Image or LaTeX item shown by the item, or None.
+        :return:
+        """
+        user = self._user_index.get(username, None)
+        if user is None:
+            user = len(self._user_names)
+            self._user_names.append(username)
+            self._user_index[username] = user
+        if image is None:
+            image_ref = -1
+        else:
+            image_ref = len(self._image_refs)
+            if isinstance(image, LaTeX):
+                data, metadata = image.text, None
+                key = image_key('latex', data)
+            else:
+                data, metadata = image.image, image.metadata
+                key = image_key(type(image).__name__.lower(), data, metadata)
+            self._image_refs.append((_image_classes.index(type(image)), key, metadata))
+            self._image_counts[key] = self._image_counts.get(key, 0) + 1
+            self._image_store.put(key, data)
+        self._kinds.append(_kinds.index(kind))
+        self._flags.append((_CLEARABLE if clearable else 0) | (_HTML if html else 0) | (_ANSI if ansi_codes else 0))
+        self._users.append(user)
+        self._counts.append(execution_count)
+        self._starts.append(len(self._text))
+        lines = text.count('\n') + (0 if text.endswith('\n') else 1)
+        self._lines.append(max(1, lines + (1 if image is not None else 0)))
+        self._images.append(image_ref)
+        self._text.extend(text.encode('utf-8'))
+        self._clearable = clearable
+
+    def pop(self):
+        """
+        Remove the last record.
+        :return:
+        """
+        self._text.truncate(self._starts.pop())
+        image_ref = self._images.pop()
+        if image_ref >= 0:
+            key = self._image_refs.pop()[1]
+            self._image_counts[key] -= 1
+            if not self._image_counts[key]:
+                del self._image_counts[key]
+                self._image_store.discard(key)
+        for records in (self._kinds, self._flags, self._users, self._counts, self._lines):
+            records.pop()
+        self._clearable = False
+
+    def clear_output(self):
+        """
+        Remove the last record if it can be cleared by ClearOutput.
+        :return:
+        """
+        if self._clearable:
+            self.pop()
+
+    def lines(self, index):
+        """
+        Number of lines of a record.
+        :param index: index of the record.
+        :return: int.
+        """
+        return self._lines[index]
+
+    def text(self, index):
+        """
+        Text of a record.
+        :param index: index of the record.
+        :return: str.
+        """
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else len(self._text)
+        return self._text.get(self._starts[index], end).decode('utf-8')
+
+    def username(self, index):
+        """
+        User name of a record.
+        :param index: index of the record.
+        :return: str.
+        """
+        return self._user_names[self._users[index]]
+
+    def item(self, index):
+        """
+        Item to render a record.
+        :param index: index of the record.
+        :return: item.
+        """
+        kind = _kinds[self._kinds[index]]
+        flags = self._flags[index]
+        username = self.username(index)
+        text = self.text(index)
+        image = None
+        if self._images[index] >= 0:
+            image_class, key, metadata = self._image_refs[self._images[index]]
+            image_class = _image_classes[image_class]
+            data = self._image_store.get(key)
+            if data is None:
+                text += ('\n' if text and not text.endswith('\n') else '') + unavailable_image_text
+            elif image_class is LaTeX:
+                image = image_class(data, username=username)
+            else:
+                image = image_class(data, metadata, username=username)
+
+        if kind is Image:
+            if image is None:
+                return Stdout(text, username=username)
+            return image
+        if kind is PageDoc:
+            return PageDoc(html=text, username=username) if flags & _HTML else PageDoc(text=text, username=username)
+        if kind is Input:
+            return Input(text, execution_count=self._counts[index], username=username)
+
+        content = Content(username=username)
+        if flags & _HTML:
+            content.append(HtmlText(text, username=username))
+        elif text or image is None:
+            content.append(SplitText(text, ansi_codes=bool(flags & _ANSI), username=username))
+        if image is not None:
+            content.append(image)
+        if kind is Result:
+            return Result(content, execution_count=self._counts[index], username=username)
+        return kind(content, clearable=bool(flags & _CLEARABLE), username=username)
+
+    def record(self, item):
+        """
+        Record an item that has been rendered.
+        :param item: item.
+        :return:
+        """
+        _record(item, self)
+
+
+def _stream_parts(content):
+    """
+    Text and image shown for stream content.
+    :param content: Content.
+    :return: text, whether the text is html, whether the text has ansi codes, Image or LaTeX item or None.
+    """
+    image = content.get(_image_classes)
+    html = content.get(HtmlText)
+    if html:
+        return html.text, True, False, image
+    regular = content.get((SplitText, AtomicText))
+    if regular and regular is not image:
+        return regular.text, False, regular.ansi_codes, image
+    return '', False, False, image
+
+
+@singledispatch
+def _record(item, transcript):
+    pass
+
+
+@_record.register(Stdout)
+@_record.register(Stderr)
+def _(item, transcript):
+    text, html, ansi_codes, image = _stream_parts(item.content)
+    transcript.append(type(item), text, item.username, clearable=item.clearable, html=html, ansi_codes=ansi_codes,
+                      image=image)
+
+
+@_record.register(Banner)
+def _(item, transcript):
+    # paged in again as plain text
+    text = item.content.text
+    if item.help_links:
+        text += '\nHelp Links' + ''.join('\n' + helper['text'] + ': ' + helper['url'] for helper in item.help_links)
+    transcript.append(Stdout, text + '\n', item.username, ansi_codes=item.ansi_codes)
+
+
+@_record.register(Input)
+def _(item, transcript):
+    transcript.append(Input, item.code, item.username, execution_count=item.execution_count, ansi_codes=True)
+
+
+@_record.register(Result)
+def _(item, transcript):
+    text, html, ansi_codes, image = _stream_parts(item.content)
+    transcript.append(Result, text, item.username, execution_count=item.execution_count, html=html,
+                      ansi_codes=ansi_codes, image=image)
+
+
+@_record.register(Image)
+def _(item, transcript):
+    transcript.append(Image, username=item.username, image=item)
+
+
+@_record.register(PageDoc)
+def _(item, transcript):
+    if item.html_stream:
+        transcript.append(PageDoc, item.html_stream.content.text, item.username, html=True)
+    else:
+        transcript.append(PageDoc, item.text_stream.content.text, item.username, ansi_codes=True)
+
+
+@_record.register(ClearOutput)
+def _(item, transcript):
+    transcript.clear_output()
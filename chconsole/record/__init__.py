@@ -0,0 +1,3 @@
+from .recorder import Recorder
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -0,0 +1,94 @@
+import sys
+from traitlets import Dict, Unicode
+from traitlets.config.application import catch_config_error
+from jupyter_core.application import JupyterApp, base_flags, base_aliases
+from jupyter_client.consoleapp import JupyterConsoleApp, app_aliases, app_flags
+from chconsole import __version__
+from chconsole.connect import RemoteConnector, Curie
+from chconsole.launch.launch_config import LaunchConfig
+from chconsole.record.recorder import Recorder
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+_examples = """
+jupyter chrecord --key=<session key>             # record a remote session
+jupyter chrecord --curie=<gate>/<session key>    # record a remote session through a given gate
+jupyter chrecord --existing=<connection file>    # record a session given by a connection file
+"""
+
+flags = dict(base_flags)
+flags.update(app_flags)
+
+aliases = dict(base_aliases)
+aliases.update(app_aliases)
+aliases.update(dict(
+    key='RecordApp.key',
+    curie='RecordApp.curie',
+    user='Recorder.user_name',
+    username='Recorder.user_name',
+    secret='Recorder.chat_secret'
+))
+
+
+class RecordApp(JupyterApp, JupyterConsoleApp):
+
+    name = 'jupyter-chrecord'
+    version = __version__
+    description = """
+        Record a Chat Console session.
+
+        This connects to a running kernel without a user interface and saves
+        all messages the kernel broadcasts to its clients in the database.
+        Chat consoles connected to the same kernel may then turn off save_messages.
+    """
+    examples = _examples
+
+    classes = [LaunchConfig, Recorder] + JupyterConsoleApp.classes
+    flags = Dict(flags)
+    aliases = Dict(aliases)
+
+    key = Unicode('', config=True, help='Session identifier to connect to.')
+    curie = Unicode('', config=True,
+                    help='Curie consisting of ip address and Session identifier to connect to.')
+
+    launch_config = None  # LaunchConfig
+    recorder = None  # Recorder
+
+    @catch_config_error
+    def initialize(self, argv=None):
+        super(RecordApp, self).initialize(argv)
+        if self._dispatching:
+            return
+        self.launch_config = LaunchConfig()
+        if self.curie or self.key:
+            curie = self.curie if self.curie else self.launch_config.kernel_gate + '/' + self.key
+            remote = RemoteConnector(self.launch_config.gate_tunnel_user, Curie(curie))
+            self.existing = remote.abs_conn_file
+            self.sshserver = remote.ssh_target
+            self.sshkey = remote.abs_key_file
+        if not self.existing:
+            print('Provide --key, --curie or --existing parameter.')
+            self.exit(1)
+        JupyterConsoleApp.initialize(self, argv)
+        self.recorder = Recorder(parent=self)
+
+    def start(self):
+        super(RecordApp, self).start()
+        self.log.info('Recording %s', self.connection_file)
+        try:
+            self.recorder.record(self.kernel_client)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.kernel_client.stop_channels()
+            self.recorder.close()
+            self.log.info('Recorded messages: %s', self.recorder.stats)
+
+
+def main():
+    RecordApp.launch_instance()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
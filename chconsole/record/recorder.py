@@ -0,0 +1,127 @@
+import getpass
+import queue
+from datetime import datetime
+from uuid import uuid4
+
+from traitlets import Bool, Float, Integer, Unicode, Enum
+from traitlets.config.configurable import LoggingConfigurable
+
+from chconsole.messages import KernelMessage
+from chconsole.archive import Archiver, Spool, shared_pool, close_pools
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class Recorder(LoggingConfigurable):
+    """
+    Record the messages a kernel broadcasts to all clients in the importer table of a database,
+    without any user interface.
+    """
+    user_name = Unicode('', config=True, help='user name recorded with the messages; ch_rec_<login> if empty')
+    chat_secret = Unicode('abcdefgh', config=True, help='secret string of the chat session recorded')
+    poll_interval = Float(0.5, config=True,
+                          help='seconds to wait for a message before checking whether to stop recording')
+
+    db_host = Unicode('db0.chgate.net', config=True,
+                      help='database host where to save messages received')
+    db_port = Integer(5432, config=True,
+                      help='port on the database host')
+    db_name = Unicode('messages', config=True,
+                      help='name of the database on the database host')
+    db_user = Unicode('analyzer', config=True,
+                      help='data base user for the database host')
+    db_password = Unicode('This_is_4analyzer!', config=True,
+                          help='password for the database')
+    archive_queue_size = Integer(100000, config=True,
+                                 help='maximum number of messages waiting to be saved')
+    archive_batch_size = Integer(1000, config=True,
+                                 help='maximum number of messages saved at once')
+    archive_flush_interval = Float(1.0, config=True,
+                                   help='seconds to wait for a batch of messages to fill up before saving it')
+    archive_overflow = Enum(['drop_oldest', 'drop_newest', 'block'], 'block', config=True,
+                            help='what to do with a message if archive_queue_size messages are waiting to be saved')
+    archive_segment_size = Integer(16 * 1024 * 1024, config=True,
+                                   help='bytes after which a segment of the local spool of messages to be saved '
+                                        'is handed to the database')
+    archive_once = Bool(True, config=True,
+                        help='whether each message is to be saved only once, also if other clients save it')
+
+    client_id = ''  # unique id string for this recorder
+    recorded = 0  # number of messages recorded
+    _archiver = None  # Archiver
+    _stopped = False  # whether recording is to be stopped
+
+    def __init__(self, pool=None, spool=None, **kwargs):
+        """
+        Initialize and start the archiver.
+        :param pool: ConnectionPool of the database; the pool shared for db_host, db_port, etc. if None.
+        :param spool: Spool of the messages to be saved; one in the default directory for the database if None.
+        :param kwargs: arguments for LoggingConfigurable.
+        """
+        super(Recorder, self).__init__(**kwargs)
+        if not self.user_name:
+            try:
+                self.user_name = 'ch_rec_' + getpass.getuser()
+            except Exception:
+                self.user_name = 'ch_rec'
+        self.client_id = 'rec,' + datetime.isoformat(datetime.utcnow()) + ',' + str(uuid4())
+
+        if pool is None:
+            pool = shared_pool(host=self.db_host, port=self.db_port, dbname=self.db_name,
+                               user=self.db_user, password=self.db_password)
+        if spool is None:
+            spool = Spool(segment_size=self.archive_segment_size, key=pool.key)
+        self._archiver = Archiver(pool, spool,
+                                  queue_size=self.archive_queue_size, batch_size=self.archive_batch_size,
+                                  flush_interval=self.archive_flush_interval, overflow=self.archive_overflow,
+                                  dedup=self.archive_once, parent=self)
+
+    @property
+    def stats(self):
+        """
+        Counters of the recorder.
+        :return: dict with the number of messages recorded and the counters of the archiver.
+        """
+        stats = self._archiver.stats
+        stats['recorded'] = self.recorded
+        return stats
+
+    def convert(self, msg):
+        """
+        Record a message if it is broadcast to all clients.
+        :param msg: KernelMessage.
+        :return: True iff the message has been recorded.
+        """
+        if not msg.broadcast:
+            return False
+        self.recorded += 1
+        return self._archiver.put(self.client_id, self.user_name, self.chat_secret, msg.raw)
+
+    def record(self, kernel_client):
+        """
+        Record the iopub messages of a kernel until stop is called.
+        :param kernel_client: jupyter_client BlockingKernelClient with started channels.
+        :return:
+        """
+        self._stopped = False
+        while not self._stopped:
+            try:
+                msg = kernel_client.get_iopub_msg(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            self.convert(KernelMessage(msg, from_here=False))
+
+    def stop(self):
+        """
+        Stop recording after the current message.
+        :return:
+        """
+        self._stopped = True
+
+    def close(self):
+        """
+        Save the remaining messages to the spool and close the database connections.
+        :return:
+        """
+        self._archiver.close(wait=True)
+        close_pools()
@@ -25,6 +25,9 @@ __author__ = 'Manfred Minimair <manfred@minimair.org>'
 code_active_color = QtCore.Qt.black  # color used for widget's frame if in code mode
 chat_active_color = QtCore.Qt.red  # color used for the widget's frame if in chat mode
 
+# characters that require the ansi processor; text without them is inserted in one piece
+_ansi_special = re.compile('[\x01\x02\x1b\a\b\f\r]')
+
 
 class DocumentConfig(LoggingConfigurable):
     """
@@ -72,6 +75,7 @@ class DocumentConfig(LoggingConfigurable):
     lexer = Any()
 
     ansi_processor = None  # QtAnsiCodeProcessor
+    _ansi_formats = None  # dict: graphics attributes of ansi_processor -> QTextCharFormat
 
     increase_font_size = None  # action for increasing font size
     decrease_font_size = None  # action for decreasing font size
@@ -121,6 +125,7 @@ class DocumentConfig(LoggingConfigurable):
         layout.documentSizeChanged.connect(self.adjust_scrollbars)
 
         self.ansi_processor = QtAnsiCodeProcessor()
+        self._ansi_formats = dict()
 
         # JupyterWidget
         # Initialize widget styling.
@@ -216,12 +221,12 @@ class DocumentConfig(LoggingConfigurable):
         viewport_height = self.viewport().height()
         if isinstance(self, QtGui.QPlainTextEdit):
             maximum = max(0, document.lineCount() - 1)
-            step = viewport_height / self.fontMetrics().lineSpacing()
+            step = viewport_height // self.fontMetrics().lineSpacing()
         else:
             # QTextEdit does not do line-based layout and blocks will not in
             # general have the same height. Therefore it does not make sense to
             # attempt to scroll in line height increments.
-            maximum = document.size().height()
+            maximum = int(document.size().height())
             step = viewport_height
         diff = maximum - scrollbar.maximum()
         scrollbar.setRange(0, maximum)
@@ -346,6 +351,7 @@ class DocumentConfig(LoggingConfigurable):
         # bg_color = self.palette().window().color()
         bg_color = 'default'
         self.ansi_processor.set_background_color(bg_color)
+        self._ansi_formats = dict()
 
         # if self._page_control is not None:
         #     self._page_control.document().setDefaultStyleSheet(self.style_sheet)
@@ -488,10 +494,31 @@ class DocumentConfig(LoggingConfigurable):
             return '<b>Unrecognized image format</b>'
 
 
+    def _ansi_format(self):
+        """
+        Character format for the current graphics attributes of the ansi processor.
+        :return: QTextCharFormat, shared for equal attributes.
+        """
+        processor = self.ansi_processor
+        key = tuple(tuple(value) if isinstance(value, list) else value
+                    for value in (processor.foreground_color, processor.background_color, processor.intensity,
+                                  processor.bold, processor.italic, processor.underline))
+        ansi_format = self._ansi_formats.get(key, None)
+        if ansi_format is None:
+            ansi_format = processor.get_format()
+            self._ansi_formats[key] = ansi_format
+        return ansi_format
+
     # adopted from ConsoleWidget
     def insert_ansi_text(self, text, ansi_codes=True, cursor=None):
         cursor = cursor if cursor else self.textCursor()
-        if ansi_codes:
+        if ansi_codes and not cursor.hasSelection() and cursor.atBlockEnd() and not _ansi_special.search(text):
+            # plain text and newlines only: nothing for the ansi processor to do but formatting
+            cursor.insertText(text, self._ansi_format())
+        elif ansi_codes:
+            osc = '\x1b]' in text  # operating system commands may change the color map
+            if osc:
+                self._ansi_formats = dict()
             for substring in self.ansi_processor.split_string(text):
                 for act in self.ansi_processor.actions:
 
@@ -525,7 +552,7 @@ class DocumentConfig(LoggingConfigurable):
                     elif act.action == 'newline':
                         cursor.movePosition(cursor.EndOfLine)
 
-                ansi_format = self.ansi_processor.get_format()
+                ansi_format = self.ansi_processor.get_format() if osc else self._ansi_format()
 
                 selection = cursor.selectedText()
                 if len(selection) == 0:
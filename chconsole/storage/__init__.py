@@ -1,6 +1,8 @@
 from .json_storage import JSONStorage
 from .file_chooser import FileChooser
 from .paths import chconsole_data_dir, get_home_dir
+from .atomic import write_atomically
+from .shared import SharedInstances
 from .default_names import DefaultNames
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
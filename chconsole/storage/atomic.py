@@ -0,0 +1,30 @@
+import os
+import threading
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+def write_atomically(path, data):
+    """
+    Write a file in one piece: the data is written to a temporary file next to it, which then replaces the file.
+    Readers, also of other processes, see either the old or the new file, never a partly written one,
+    so that several processes may share the directory of the file.
+    :param path: path of the file; its directory is created if needed.
+    :param data: bytes, or str to be written as utf-8.
+    :return:
+    :raise OSError: if the file cannot be written; the file is left as it was.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp = '{}.{}-{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(temp, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,38 @@
+import threading
+
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
+
+class SharedInstances:
+    """
+    Instances shared by the whole process, looked up by key and created on first use; thread-safe.
+    """
+    _instances = None  # dict: key -> instance
+    _lock = None  # threading.Lock guarding _instances
+
+    def __init__(self):
+        self._instances = dict()
+        self._lock = threading.Lock()
+
+    def get(self, create, key=None):
+        """
+        Instance of a key, created if there is none yet.
+        :param create: callable without arguments returning a new instance.
+        :param key: hashable key of the instance.
+        :return: instance.
+        """
+        with self._lock:
+            instance = self._instances.get(key, None)
+            if instance is None:
+                instance = self._instances[key] = create()
+            return instance
+
+    def pop_all(self):
+        """
+        Forget all instances.
+        :return: list of the instances forgotten.
+        """
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+            return instances
@@ -1,9 +1,4 @@
 import time
-import json
-import datetime
-import psycopg2
-import psycopg2.extras
-from base64 import decodebytes
 
 from qtconsole.qt import QtCore
 from qtconsole.util import MetaQObjectHasTraits
@@ -19,6 +14,7 @@ from chconsole.messages import (CompleteItems, PageDoc,
                                 SvgXml, Png, Jpeg, LaTeX,
                                 filter_meta_command, AddUser)
 from chconsole.standards import Importable
+from chconsole.archive import Archiver, Spool, shared_pool
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
@@ -33,24 +29,6 @@ def _show_msg(msg, show_other):
     return msg.from_here or show_other
 
 
-class _DateTimeEncoder(json.JSONEncoder):
-    """ To encode datetime.datetime ocrring in kernel message dicts."""
-    def default(self, obj):
-        if isinstance(obj, datetime.datetime):
-            return str(obj.timestamp())
-        else:
-            json.JSONEncoder.default(self. obj)
-
-
-def _extended_dumps(obj, *args, **kwargs):
-    """
-    Extend dumps with DateTimeEncoder.
-    :param: obj to be encoded as json.
-    :return: json.
-    """
-    return json.dumps(obj, *args, cls=_DateTimeEncoder, **kwargs)
-
-
 class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
                                                 QtCore.QObject), {})):
     """
@@ -88,16 +66,32 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
     # data base user for the database host
     db_password = ''
     # password for the database
-
-    _conn = None  # database connection
-    _cur = None  # database cursor
+    archive_queue_size = 10000
+    # maximum number of messages waiting to be saved
+    archive_batch_size = 200
+    # maximum number of messages saved by one insert
+    archive_flush_interval = 1.0
+    # seconds to wait for a batch of messages to fill up before saving it
+    archive_overflow = 'drop_oldest'
+    # what to do with a message if too many are waiting to be saved
+    archive_segment_size = 4 * 1024 * 1024
+    # bytes after which a segment of the local spool of saved messages is handed to the database
+    archive_once = True
+    # whether messages broadcast to all clients are saved only once, also if several clients save them
+    history_tail = 100
+    # number of most recent history items requested again if the history request is aborted
+
+    _archiver = None  # Archiver saving the messages in the background
 
     def __init__(self, parent=None, chat_secret='',
                  client_id='', user_name='',
                  show_arriving_msg=False,
                  save_messages=False, db_host='', db_port=5432,
                  db_name='', db_user='', db_password='',
-                 **kwargs):
+                 archive_queue_size=10000, archive_batch_size=200,
+                 archive_flush_interval=1.0, archive_overflow='drop_oldest',
+                 archive_segment_size=4 * 1024 * 1024, archive_once=True,
+                 history_tail=100, **kwargs):
         """
         Initialize.
         :param client_id: unique id for this client instance
@@ -120,6 +114,17 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
         self.db_name = db_name
         self.db_user = db_user
         self.db_password = db_password
+        self.archive_queue_size = archive_queue_size
+        self.archive_batch_size = archive_batch_size
+        self.archive_flush_interval = archive_flush_interval
+        if archive_overflow == 'block':
+            # convert runs on the GUI thread, which must not wait for the archiver
+            self.log.warn("archive_overflow 'block' would stall the user interface; using 'drop_oldest'")
+            archive_overflow = 'drop_oldest'
+        self.archive_overflow = archive_overflow
+        self.archive_segment_size = archive_segment_size
+        self.archive_once = archive_once
+        self.history_tail = history_tail
 
         self._retry_history = QtCore.QSemaphore(1)
 
@@ -130,24 +135,26 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
             self._payload_source_next_input: self._handle_payload_next_input}
 
         if self.save_messages:
-            self._conn = psycopg2.connect(
-                host=self.db_host, port=self.db_port, dbname=self.db_name,
-                user=self.db_user, password=self.db_password)
-            self._conn.set_session(autocommit=True)
-            self._cur = self._conn.cursor()
+            # messages are spooled locally; the database is only connected to when the spool is replayed
+            pool = shared_pool(host=self.db_host, port=self.db_port, dbname=self.db_name,
+                               user=self.db_user, password=self.db_password)
+            try:
+                spool = Spool(segment_size=self.archive_segment_size, key=pool.key)
+            except OSError as e:
+                self.log.warn('cannot save messages: %s', e)
+            else:
+                self._archiver = Archiver(pool, spool, queue_size=self.archive_queue_size,
+                                          batch_size=self.archive_batch_size,
+                                          flush_interval=self.archive_flush_interval,
+                                          overflow=self.archive_overflow, dedup=self.archive_once,
+                                          parent=self)
 
     def __del__(self):
         """
         Finalizer.
         """
-        if self.save_messages:
-            # autocommit
-            # if self._conn:
-            #    self._conn.commit()
-            if self._cur:
-                self._cur.close()
-            if self._conn:
-                self._conn.close()
+        if self._archiver:
+            self._archiver.close()
         if hasattr(super(Importer, self), '__del__'):
             super(Importer, self).__del__()
 
@@ -162,20 +169,8 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
             # print(msg.raw)
             if self.show_arriving_msg:
                 print(msg.raw)
-            if self.save_messages:
-                try:
-                    self._cur.execute('insert into importer \
-                                      (client_id, user_name, chat_secret, msg_raw)\
-                                      values (%s, %s, %s, %s);',
-                                      (self.client_id, self.user_name,
-                                       self.chat_secret,
-                                       psycopg2.extras.Json(msg.raw,
-                                                            dumps=_extended_dumps)))
-                    # autocommit
-                    # self._conn.commit()
-                except TypeError:
-                    pass
-                    # drop it
+            if self._archiver:
+                self._archiver.put(self.client_id, self.user_name, self.chat_secret, msg.raw, shared=msg.broadcast)
 
             handler = getattr(self, '_handle_' + msg.type, None)
             if handler and _show_msg(msg, self.target.show_other):
@@ -258,7 +253,7 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
                     self.log.error("Retrying aborted history request")
                     # wait out the kernel's queue flush, which is currently timed at 0.1s
                     time.sleep(0.25)
-                    self.please_export.emit(TailHistory(1000, username=msg.username))
+                    self.please_export.emit(TailHistory(self.history_tail))
                 else:
                     self._retry_history.release()
         else:
@@ -302,11 +297,10 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
         if 'image/svg+xml' in data:
             self.please_process.emit(SvgXml(data['image/svg+xml'], username=msg.username))
         elif 'image/png' in data:
-            img = decodebytes(data['image/png'].encode('ascii'))
-            self.please_process.emit(Png(img, metadata=metadata.get('image/png', None), username=msg.username))
+            # base64 decoding is left to the image renderer
+            self.please_process.emit(Png(data['image/png'], metadata=metadata.get('image/png', None), username=msg.username))
         elif 'image/jpeg' in data:
-            img = decodebytes(data['image/jpeg'].encode('ascii'))
-            self.please_process.emit(Jpeg(img, metadata=metadata.get('image/jpeg', None), username=msg.username))
+            self.please_process.emit(Jpeg(data['image/jpeg'], metadata=metadata.get('image/jpeg', None), username=msg.username))
         elif 'text/latex' in data:
             self.please_process.emit(LaTeX(data['text/latex'], username=msg.username))
         elif 'text/plain' in data:
@@ -329,11 +323,9 @@ class Importer(MetaQObjectHasTraits('NewBase', (LoggingConfigurable,
         if 'image/svg+xml' in data:
             result.content.append(SvgXml(data['image/svg+xml'], username=msg.username))
         elif 'image/png' in data:
-            img = decodebytes(data['image/png'].encode('ascii'))
-            result.content.append(Png(img, metadata=metadata.get('image/png', None), username=msg.username))
+            result.content.append(Png(data['image/png'], metadata=metadata.get('image/png', None), username=msg.username))
         elif 'image/jpeg' in data:
-            img = decodebytes(data['image/jpeg'].encode('ascii'))
-            result.content.append(Jpeg(img, metadata=metadata.get('image/jpeg', None), username=msg.username))
+            result.content.append(Jpeg(data['image/jpeg'], metadata=metadata.get('image/jpeg', None), username=msg.username))
         elif 'text/latex' in data:
             result.content.append(LaTeX(data['text/latex'], username=msg.username))
 
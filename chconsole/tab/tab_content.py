@@ -15,7 +15,7 @@ from chconsole.messages import Stderr, Stdout, AddUser, DropUser, StartRoundTabl
 from chconsole.pager import pager_template
 from chconsole.receiver import receiver_template
 from chconsole.standards import NoDefaultEditor, CommandError
-from .user_tracker import UserTracker
+from .user_tracker import UserTracker, user_label
 from .round_table import RoundTable
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
@@ -74,7 +74,9 @@ def _(item, target):
     # Use AddUser only if it goes to the current client
     if item.to(target.client_id, target.user_name):
         # print(item.username + ' joined')
-        target.user_tracker.insert(item.sender, item.sender_client_id)
+        index = target.user_tracker.insert(item.sender, item.sender_client_id)
+        if index is not None:
+            target.update_user_list(index, item.sender, True)
         # print(target.user_tracker.users)
         # If item goes to all clients by a wildcard, send an AddUser reply to the sender to notify that
         # the current receiver client exists.
@@ -92,7 +94,9 @@ def _(item, target):
 @_post.register(DropUser)
 def _(item, target):
     # print(item.username + ' left')
-    target.user_tracker.remove(item.sender, item.sender_client_id)
+    index = target.user_tracker.remove(item.sender, item.sender_client_id)
+    if index is not None:
+        target.update_user_list(index, item.sender, False)
     # print(target.user_tracker.users)
     # print('round_table: ', item.parameters['round_table'])
     # print('last_client: ', item.parameters['last_client'])
@@ -179,14 +183,7 @@ def _(item, target):
 
 @_post.register(History)
 def _(item, target):
-    items = []
-    last_cell = u""
-    for _, _, cell in item.items:
-        cell = cell.rstrip()
-        if cell != last_cell:
-            items.append(cell)
-            last_cell = cell
-    target.history.set_history(items)
+    target.history.merge_history(item.items)
 
 
 def tab_content_template(edit_class):
@@ -258,6 +255,7 @@ def tab_content_template(edit_class):
         show_users = Bool(True)  # Whether to show the users in
         # command input and output listings
         user_tracker = None  # UserTracker for tracking users
+        _user_list_state = 1  # user state of the pager block listing the users, while the pager shows them
         round_table = None  # RoundTable
 
         def __init__(self, chat_secret, client_id, is_complete, show_users, editor=default_editor, **kwargs):
@@ -395,6 +393,50 @@ def tab_content_template(edit_class):
             out_text = self.user_tracker.html_user_list(self.user_name)
             out = PageDoc(html=out_text)
             self.pager.post(out)
+            if len(self.user_tracker):
+                self.pager.document().lastBlock().setUserState(self._user_list_state)
+
+        def update_user_list(self, index, name, added):
+            """
+            Insert or remove the entry of a user in the list of users if the pager shows it.
+            The entries of the list block are the labels of the users, each preceded by a line separator.
+            If the block does not show the list before the change, the list is rendered again.
+            :param index: index of the user in the user tracker, as returned by its insert or remove.
+            :param name: name of the user.
+            :param added: True if the user has been added, False if removed.
+            """
+            block = self.pager.document().lastBlock()
+            if block.userState() != self._user_list_state:
+                return
+            labels = [user_label(n, self.user_name) for n in self.user_tracker.names]
+            label = user_label(name, self.user_name)
+            shown = labels[:index] + labels[index + 1:] if added else labels[:index] + [label] + labels[index:]
+            if not labels or block.text().rstrip(' ') != ''.join('\u2028' + l for l in shown):
+                self.pager.replace(PageDoc(html=self.user_tracker.html_user_list(self.user_name)))
+                if labels:
+                    self.pager.document().lastBlock().setUserState(self._user_list_state)
+                return
+            cursor = QtGui.QTextCursor(block)
+            cursor.setPosition(block.position() + sum(len(l) + 1 for l in labels[:index]))
+            if added:
+                cursor.insertText('\u2028' + label)
+            else:
+                cursor.movePosition(QtGui.QTextCursor.Right, QtGui.QTextCursor.KeepAnchor, len(label) + 1)
+                cursor.removeSelectedText()
+
+        def show_receiver_stats(self):
+            """
+            Show the statistics of the output pipeline of the receiver in the pager.
+            """
+            self.pager.post(PageDoc(html=self.receiver.metrics.to_html()))
+
+        def export_receiver_stats(self, filename):
+            """
+            Export the statistics of the output pipeline of the receiver as JSON.
+            :param filename: name of the file to write.
+            """
+            with open(filename, 'w') as f:
+                f.write(self.receiver.metrics.to_json())
 
         # JupyterWidget
         def external_edit(self, filename, line=None):
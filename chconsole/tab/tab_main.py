@@ -7,13 +7,14 @@ from uuid import uuid4
 from qtconsole.base_frontend_mixin import BaseFrontendMixin
 from qtconsole.qt import QtGui, QtCore
 from qtconsole.util import MetaQObjectHasTraits
-from traitlets import Bool, Float, Any, Unicode, Integer
+from traitlets import Bool, Float, Any, Unicode, Integer, Enum
 from traitlets.config.configurable import LoggingConfigurable
 
+from chconsole.entry import HistoryCache, history_key
 from chconsole.media import default_editor
 from chconsole.messages import (Exit, Execute, Inspect, Complete,
                                 Restart, Interrupt, ClearAll,
-                                KernelMessage, TailHistory,
+                                KernelMessage, TailHistory, RangeHistory,
                                 Stderr, UserInput, AddUser, DropUser,
                                 StartRoundTable, StopRoundTable)
 from chconsole.standards import Importable
@@ -63,6 +64,11 @@ def _(item, target):
     target.kernel_client.history(hist_access_type='tail',n=item.length)
 
 
+@_export.register(RangeHistory)
+def _(item, target):
+    target.kernel_client.history(hist_access_type='range', session=item.session, start=item.start, stop=item.stop)
+
+
 @_export.register(Inspect)
 def _(item, target):
     if target.kernel_client.shell_channel.is_alive():
@@ -220,6 +226,30 @@ def tab_main_template(edit_class):
                           help='data base user for the database host')
         db_password = Unicode('This_is_4analyzer!', config=True,
                               help='password for the database')
+        archive_queue_size = Integer(10000, config=True,
+                                     help='maximum number of messages waiting to be saved')
+        archive_batch_size = Integer(200, config=True,
+                                     help='maximum number of messages saved by one database insert')
+        archive_flush_interval = Float(1.0, config=True,
+                                       help='seconds to wait for a batch of messages to fill up before saving it')
+        archive_overflow = Enum(['drop_oldest', 'drop_newest'], 'drop_oldest', config=True,
+                                help='what to do with a message if archive_queue_size messages are waiting to be saved; '
+                                     'messages are saved from the user interface, which must not wait for them')
+        archive_once = Bool(True, config=True,
+                            help='whether each message broadcast to all clients of a kernel is to be saved only once, '
+                                 'also if several clients save messages')
+        archive_segment_size = Integer(4 * 1024 * 1024, config=True,
+                                       help='bytes after which a segment of the local spool of messages to be saved '
+                                            'is handed to the database')
+
+        history_tail = Integer(100, config=True,
+                               help='number of most recent history items requested from the kernel on connecting')
+        history_page = Integer(500, config=True,
+                               help='number of older history items requested from the kernel when browsing past '
+                                    'the ones loaded')
+        cache_history = Bool(True, config=True,
+                             help='whether to keep the history of each kernel session on disk, so that only history '
+                                  'items not kept need to be requested from the kernel')
 
         def __init__(self, parent=None, **kw):
             """
@@ -247,7 +277,14 @@ def tab_main_template(edit_class):
                                       db_port=self.db_port,
                                       db_name=self.db_name,
                                       db_user=self.db_user,
-                                      db_password=self.db_password)
+                                      db_password=self.db_password,
+                                      archive_queue_size=self.archive_queue_size,
+                                      archive_batch_size=self.archive_batch_size,
+                                      archive_flush_interval=self.archive_flush_interval,
+                                      archive_overflow=self.archive_overflow,
+                                      archive_segment_size=self.archive_segment_size,
+                                      archive_once=self.archive_once,
+                                      history_tail=self.history_tail)
             self.message_arrived.connect(self._importer.convert)
             self._importer.please_process.connect(self.main_content.post)
             self._importer.please_export.connect(self.export)
@@ -291,8 +328,14 @@ def tab_main_template(edit_class):
             # The reply will trigger %guiref load provided language=='python' (not implemented)
             # The kernel also automatically sends the info on startup
             self.kernel_client.kernel_info()
-            # 3) load history
-            self.kernel_client.history(hist_access_type='tail', n=1000)
+            # 3) load history: the cached part at once, the most recent items from the kernel, older ones on demand
+            history = self.main_content.history
+            history.page = self.history_page
+            if self.cache_history:
+                session = self.kernel_client.session
+                history.set_cache(HistoryCache(history_key(self.kernel_client.ip, self.kernel_client.shell_port,
+                                                           session.key)))
+            self.kernel_client.history(hist_access_type='tail', n=self.history_tail)
             # 4) Register user
             # is done when and through receiving the history request
             self.export(AddUser(self.chat_secret, self.client_id, self.user_name,
@@ -429,10 +472,11 @@ def tab_main_template(edit_class):
 
         def drop_user(self):
             """
-            Drop the current client/user from the session.
+            Drop the current client/user from the session and write the history received to its cache.
             :return:
             """
             # print('tab_main: drop_user')
+            self.main_content.history.save_cache()
             self.export(DropUser(chat_secret=self.chat_secret,
                                  sender_client_id=self.client_id, sender=self.user_name,
                                  round_table=self.main_content.round_table.user_is_moderator,
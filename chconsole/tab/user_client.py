@@ -3,14 +3,14 @@ __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
 class UserClient:
     """
-    Stores the user name and list of client ids used by the user.
+    Stores the user name and set of client ids used by the user.
     """
     name = ''  # user name
-    clients = None  # list of client ids
+    clients = None  # set of client ids
 
-    def __init__(self, name='', clients=list()):
+    def __init__(self, name='', clients=()):
         self.name = name
-        self.clients = clients
+        self.clients = set(clients)
 
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
@@ -1,28 +1,47 @@
+from bisect import bisect_left
+from html import escape
+
 from .user_client import UserClient
 
 
 __author__ = 'Manfred Minimair <manfred@minimair.org>'
 
 
+def user_label(name, user_name):
+    """
+    Label of a user in the list of users.
+    :param name: name of the user listed.
+    :param user_name: name of the current user.
+    :return: name, followed by (me) for the current user.
+    """
+    return name + ' (me)' if name == user_name else name
+
+
 class UserTracker:
     """
-    Sorted list of users in ascending order.
+    Users in ascending order of their names, looked up by name.
+    Insertions and removals report where the sorted list changed, so that views of it can be updated in place.
     """
-    _users = None  # list of UserClient
+    _clients = None  # dict: user name -> UserClient
+    _names = None  # sorted list of user names
 
     def __init__(self):
         """
         Initialize empty list.
         """
-        self._users = list()
+        self._clients = dict()
+        self._names = list()
+
+    def __len__(self):
+        return len(self._names)
 
     @property
     def users(self):
         """
         List of users.
-        :return: list of users and client ids.
+        :return: list of UserClient in ascending order of the user names.
         """
-        return self._users
+        return [self._clients[name] for name in self._names]
 
     @property
     def names(self):
@@ -30,43 +49,41 @@ class UserTracker:
         List of user names.
         :return: list of user names.
         """
-        names_list = [user.name for user in self._users]
-        return names_list
+        return list(self._names)
 
     def insert(self, user, client_id):
         """
         Add user alphabethically.
         :param user: string of user name.
         :param client_id: string of unique client id of user.
-        :return: 
-        """
-        i = 0
-        length = len(self._users)
-        while i < length and user > self._users[i].name:
-            i += 1
-        if length == 0 or (i != length and user != self._users[i].name) or i == length:
-            self._users.insert(i, UserClient(user, [client_id]))
-        elif user == self._users[i].name and client_id not in self._users[i].clients:
-            self._users[i].clients.append(client_id)
+        :return: index of the user in the list if the user is new; None if only the client is added.
+        """
+        user_client = self._clients.get(user, None)
+        if user_client is not None:
+            user_client.clients.add(client_id)
+            return None
+        index = bisect_left(self._names, user)
+        self._names.insert(index, user)
+        self._clients[user] = UserClient(user, [client_id])
+        return index
 
     def remove(self, user, client_id):
         """
         Remove user from the list; no error if no such item.
         :param user: string of user name
         :param client_id: string of unique client id of user.
-        :return: 
-        """
-        length = len(self._users)
-        for i in range(0, length):
-            user_client = self._users[i]
-            if user == user_client.name:
-                try:
-                    user_client.clients.remove(client_id)
-                except ValueError:
-                    pass
-                if not user_client.clients:
-                    del self._users[i]
-                break
+        :return: index the user had in the list if the user left with the last client; None otherwise.
+        """
+        user_client = self._clients.get(user, None)
+        if user_client is None:
+            return None
+        user_client.clients.discard(client_id)
+        if user_client.clients:
+            return None
+        del self._clients[user]
+        index = bisect_left(self._names, user)
+        del self._names[index]
+        return index
 
     def find_user(self, user_name):
         """
@@ -74,12 +91,7 @@ class UserTracker:
         :param user_name: name of the user.
         :return: UserClient object of the user if found; None otherwise.
         """
-        found = None
-        for user_client in self._users:
-            if user_name == user_client.name:
-                found = user_client
-                break
-        return found
+        return self._clients.get(user_name, None)
 
     def last_client(self, user_name):
         """
@@ -88,29 +100,16 @@ class UserTracker:
         :return: True iff this is the only client of the current user.
         """
         connected = self.find_user(user_name)
-        answer = False
-        if connected and len(connected.clients) > 0:
-            answer = len(connected.clients) == 1
-        return answer
+        return connected is not None and len(connected.clients) == 1
 
     def html_user_list(self, user_name):
         """
         List all users connected to the tab.
+        User names are html-escaped, so that they are shown as entered rather than interpreted as markup.
         :param user_name: name of the current user.
         :return: html text listing all users; current user indicated with (me); empty string if no users.
         """
-        names = self.names
-        num = len(names)
-        if num > 0:
-            out_text = 'Connected Users (Press Esc button to exit view)<hr><br>'
-            out_text = out_text + names[0]
-            if names[0] == user_name:
-                out_text = out_text + ' (me)'
-            # print(out_text)
-            for i in range(1, num):
-                out_text = out_text + '<br>' + names[i]
-                if names[i] == user_name:
-                    out_text = out_text + ' (me)'
-        else:
-            out_text = ''
-        return out_text
+        if not self._names:
+            return ''
+        labels = (escape(user_label(name, user_name)) for name in self._names)
+        return 'Connected Users (Press Esc button to exit view)<hr><br>' + '<br>'.join(labels)
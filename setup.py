@@ -119,6 +119,8 @@ if 'setuptools' in sys.modules:
             'chconsole = chconsole.main.launch_app:main',
             'jupyter-chrun = chconsole.run_kernel.run_remote:start_remote',
             'chrun = chconsole.run_kernel.run_remote:start_remote',
+            'jupyter-chrecord = chconsole.record.record:main',
+            'chrecord = chconsole.record.record:main',
         ],
         'gui_scripts': [
             'chc-python = chconsole.run_kernel.chc_python:start_local',
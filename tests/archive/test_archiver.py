@@ -0,0 +1,220 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import psycopg2
+
+from chconsole.archive import Archiver, Spool, ConnectionPool, pool_key, extended_dumps
+
+__author__ = 'minimair'
+
+
+class _Recorder(Archiver):
+    """
+    Archiver recording the batches instead of writing them to a database.
+    """
+    def __init__(self, directory, **kwargs):
+        self.batches = list()
+        self.gate = threading.Event()
+        self.gate.set()
+        super(_Recorder, self).__init__(_Unreachable(), Spool(directory), **kwargs)
+
+    def _write(self, batch):
+        self.gate.wait()
+        self.batches.append(batch)
+        with self._lock:
+            self.written += len(batch)
+
+
+class _Unreachable:
+    """
+    Pool of a database that cannot be reached.
+    """
+    @staticmethod
+    def run(work):
+        raise psycopg2.OperationalError('database unreachable')
+
+
+class _Blocked:
+    """
+    Pool of a database whose connection hangs until released.
+    """
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def run(self, work):
+        self.entered.set()
+        self.release.wait(10)
+        raise psycopg2.OperationalError('database unreachable')
+
+
+class _Database:
+    """
+    Pool of a database recording the statements executed, with or without a unique index on msg_id.
+    """
+    encoding = 'UTF8'
+
+    def __init__(self, unique):
+        self.unique = unique
+        self.statements = list()
+        self.connection = self
+
+    def run(self, work):
+        return work(self)
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        self.statements.append(sql if isinstance(sql, str) else sql.decode('utf-8'))
+
+    def fetchone(self):
+        return (1,) if self.unique else None
+
+    @staticmethod
+    def mogrify(template, args):
+        return repr(tuple(args)).encode('utf-8')
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_batches(self):
+        archiver = _Recorder(self.dir, batch_size=3, flush_interval=10)
+        for i in range(7):
+            archiver.put('c', 'u', 's', {'i': i})
+        archiver.close(wait=True)
+        self.assertEqual([len(b) for b in archiver.batches], [3, 3, 1])
+        self.assertEqual(archiver.stats, {'queued': 7, 'spooled': 0, 'written': 7, 'dropped': 0, 'pending': 0})
+
+    def test_drop_oldest(self):
+        archiver = _Recorder(self.dir, queue_size=2, batch_size=10, flush_interval=10)
+        archiver.gate.clear()
+        for i in range(5):
+            archiver.put('c', 'u', 's', {'i': i})
+        archiver.gate.set()
+        archiver.close(wait=True)
+        self.assertEqual(archiver.dropped, 3)
+        self.assertEqual([row[3]['i'] for row in archiver.batches[0]], [3, 4])
+
+    def test_drop_newest(self):
+        archiver = _Recorder(self.dir, queue_size=2, batch_size=10, flush_interval=10, overflow='drop_newest')
+        archiver.gate.clear()
+        accepted = [archiver.put('c', 'u', 's', {'i': i}) for i in range(4)]
+        archiver.gate.set()
+        archiver.close(wait=True)
+        self.assertEqual(accepted, [True, True, False, False])
+        self.assertEqual([row[3]['i'] for row in archiver.batches[0]], [0, 1])
+
+    def test_put_after_close(self):
+        archiver = _Recorder(self.dir)
+        archiver.close(wait=True)
+        self.assertFalse(archiver.put('c', 'u', 's', {}))
+        self.assertEqual(archiver.dropped, 1)
+
+    def test_outage(self):
+        archiver = Archiver(_Unreachable(), Spool(self.dir), batch_size=2, flush_interval=0.01, replay_interval=0.01)
+        for i in range(5):
+            archiver.put('c', 'u', 's', {'i': i})
+        archiver.close(wait=True)
+        self.assertEqual(archiver.spooled, 5)
+        self.assertEqual(archiver.written, 0)
+        sealed = [name for name in os.listdir(self.dir) if name.endswith(Spool.sealed_suffix)]
+        self.assertEqual(len(sealed), 1)
+        lines = Spool.read(os.path.join(self.dir, sealed[0]))
+        self.assertEqual(len(lines), 5)
+
+    def test_close_blocked(self):
+        database = _Blocked()
+        archiver = Archiver(database, Spool(self.dir, segment_age=0), flush_interval=0.01, replay_interval=0.01)
+        archiver.put('c', 'u', 's', {})
+        self.assertTrue(database.entered.wait(5))
+        start = time.monotonic()
+        archiver.close()
+        self.assertLess(time.monotonic() - start, 1)
+        database.release.set()
+        archiver._replayer.join(5)
+
+    def replay(self, database, dedup):
+        archiver = Archiver(database, Spool(self.dir), replay_interval=60, dedup=dedup)
+        archiver.put('c', 'u', 's', {'header': {'msg_id': 'm'}})
+        archiver.close(wait=True)
+        self.assertTrue(archiver._replay_segment(archiver._spool.claim()))
+        self.assertEqual(archiver.written, 1)
+        return database.statements[-1]
+
+    def test_insert(self):
+        statement = self.replay(_Database(unique=True), dedup=False)
+        self.assertTrue(statement.startswith('insert into importer (client_id, user_name, chat_secret, msg_raw)'))
+        self.assertNotIn('on conflict', statement)
+
+    def test_insert_once(self):
+        statement = self.replay(_Database(unique=True), dedup=True)
+        self.assertIn("'m'", statement)
+        self.assertIn('on conflict (msg_id) do nothing', statement)
+
+    def test_insert_without_index(self):
+        database = _Database(unique=False)
+        statement = self.replay(database, dedup=True)
+        self.assertTrue(database.statements[0].startswith('select 1 from pg_indexes'))
+        self.assertNotIn('on conflict', statement)
+
+    def test_index_added(self):
+        database = _Database(unique=False)
+        archiver = Archiver(database, Spool(self.dir, segment_size=1), batch_size=1, replay_interval=60, dedup=True)
+        for i in range(3):
+            archiver.put('c', 'u', 's', {'header': {'msg_id': str(i)}})
+        archiver.close(wait=True)
+        statements = list()
+        for unique in (False, True, False):
+            database.unique = unique
+            self.assertTrue(archiver._replay_segment(archiver._spool.claim()))
+            statements.append(database.statements[-1])
+        self.assertNotIn('on conflict', statements[0])
+        self.assertIn('on conflict', statements[1])
+        self.assertIn('on conflict', statements[2])
+        self.assertEqual(sum(statement.startswith('select 1 from pg_indexes') for statement in database.statements), 2)
+
+    def test_databases(self):
+        keys = [ConnectionPool(host='h', dbname=name, user='u', password='p').key for name in ('a', 'b')]
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], pool_key(host='h', dbname='a', user='u', password='other'))
+        databases = [_Database(unique=True) for key in keys]
+        archivers = [Archiver(database, Spool(self.dir, key=key), replay_interval=60, dedup=False)
+                     for database, key in zip(databases, keys)]
+        for name, archiver in zip(('a', 'b'), archivers):
+            archiver.put('c', name, 's', {})
+            archiver.close(wait=True)
+        for archiver in archivers:
+            claimed = archiver._spool.claim()
+            while claimed is not None:
+                self.assertTrue(archiver._replay_segment(claimed))
+                claimed = archiver._spool.claim()
+        for name, other, database in (('a', 'b', databases[0]), ('b', 'a', databases[1])):
+            statements = ''.join(database.statements)
+            self.assertIn("'c', '{}', 's'".format(name), statements)
+            self.assertNotIn("'c', '{}', 's'".format(other), statements)
+
+    def test_extended_dumps(self):
+        import datetime
+        now = datetime.datetime.now()
+        self.assertIn(str(now.timestamp()), extended_dumps({'date': now}))
+        self.assertRaises(TypeError, extended_dumps, {'obj': object()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import psycopg2
+import psycopg2.pool
+
+from chconsole.archive import ConnectionPool, shared_pool, close_pools
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.params = {'host': '127.0.0.1', 'port': 1, 'dbname': 'messages', 'user': 'analyzer',
+                       'connect_timeout': 1}
+
+    def tearDown(self):
+        close_pools()
+
+    def test_shared(self):
+        pool = shared_pool(**self.params)
+        self.assertIs(shared_pool(**self.params), pool)
+        self.assertIsNot(shared_pool(**dict(self.params, dbname='other')), pool)
+        close_pools()
+        self.assertIsNot(shared_pool(**self.params), pool)
+
+    def test_connect_timeout(self):
+        params = dict(self.params)
+        del params['connect_timeout']
+        self.assertEqual(shared_pool(**params).params['connect_timeout'], 5)
+
+    def test_unreachable(self):
+        pool = ConnectionPool(maxconn=1, **self.params)
+        self.assertRaises(psycopg2.OperationalError, pool.run, lambda conn: None)
+        # the slot has been released
+        self.assertRaises(psycopg2.OperationalError, pool.run, lambda conn: None, 1)
+
+    def test_closed(self):
+        pool = ConnectionPool(**self.params)
+        pool.close()
+        self.assertRaises(psycopg2.pool.PoolError, pool.run, lambda conn: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from chconsole.archive.spool import Spool, encode_record, decode_record
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.spool = Spool(self.dir, segment_size=100, segment_age=3600)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_record(self):
+        line = encode_record('c\t1', 'u\n', 's', None, '{"a": "\\t"}')
+        self.assertEqual(line.count(b'\n'), 1)
+        self.assertEqual(decode_record(line), ('c\t1', 'u\n', 's', None, '{"a": "\\t"}'))
+        self.assertRaises(ValueError, decode_record, line[:-20])
+
+    def test_rotate(self):
+        self.spool.append([encode_record('c', 'u', 's', 'm', '{"i": 0}')])
+        self.assertIsNone(self.spool.claim())
+        self.assertFalse(self.spool.seal())
+        self.spool.append([encode_record('c', 'u', 's', 'm', '{"i": %i}' % i) for i in range(1, 5)])
+        claimed = self.spool.claim()
+        self.assertEqual(len(Spool.read(claimed)), 5)
+        self.assertIsNone(self.spool.claim())
+        self.spool.release(claimed)
+        claimed = self.spool.claim()
+        self.spool.remove(claimed)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_order(self):
+        for i in range(3):
+            self.spool.append([encode_record('c', 'u', 's', 'm', '{"i": %i}' % i)])
+            self.spool.seal(force=True)
+        values = [decode_record(Spool.read(self.spool.claim())[0])[4] for _ in range(3)]
+        self.assertEqual(values, ['{"i": 0}', '{"i": 1}', '{"i": 2}'])
+
+    def test_recover(self):
+        orphan = os.path.join(self.dir, 'other' + Spool.open_suffix)
+        with open(orphan, 'wb') as f:
+            f.write(encode_record('c', 'u', 's', 'm', '{}'))
+        self.assertEqual(self.spool.recover(), 0)
+        old = time.time() - 2 * self.spool.stale_after
+        os.utime(orphan, (old, old))
+        self.assertEqual(self.spool.recover(), 1)
+        self.assertIsNotNone(self.spool.claim())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from chconsole.entry.fuzzy_search import FuzzySearch, fuzzy_score
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.items = ['import os', 'df = read_csv(path)', 'print(df)', 'rc = 1', 'df = read_csv(path)', 'plot(df)']
+        self.search = FuzzySearch(self.items)
+
+    def tearDown(self):
+        pass
+
+    def test_score(self):
+        self.assertIsNone(fuzzy_score('xyz', 'read_csv'))
+        self.assertEqual(fuzzy_score('', 'read_csv'), 0)
+        self.assertGreater(fuzzy_score('rc', 'read_csv'), fuzzy_score('rc', 'xrxxxc'))
+        self.assertGreater(fuzzy_score('csv', 'read_csv'), fuzzy_score('csv', 'c_s_v'))
+
+    def test_search(self):
+        self.search.search('DF')
+        self.assertTrue(self.search.work())
+        top = [item for score, item in self.search.top()]
+        self.assertEqual(sorted(top), ['df = read_csv(path)', 'plot(df)', 'print(df)'])
+        self.assertEqual(top[0], 'plot(df)')  # the most recent of equal matches
+
+    def test_incremental(self):
+        self.search.search('p')
+        self.assertTrue(self.search.work())
+        self.search.search('pd')
+        self.assertEqual(self.search.pattern, 'pd')
+        self.assertFalse(self.search.done)
+        self.assertTrue(self.search.work())
+        self.assertEqual([item for score, item in self.search.top()], ['plot(df)', 'print(df)'])
+        self.search.search('p')
+        self.assertTrue(self.search.done)  # restored
+        self.assertEqual(len(self.search.top()), 4)
+
+    def test_append(self):
+        self.search.append('print(df.shape)')
+        self.search.search('')
+        self.search.search('prdf')
+        self.search.work()
+        self.assertEqual(self.search.top()[0][1], 'print(df.shape)')
+
+    def test_budget(self):
+        search = FuzzySearch(['item {}'.format(i) for i in range(20000)])
+        search.search('i9')
+        while not search.work(1):
+            self.assertGreater(len(search.top()), 0)
+        self.assertEqual(search.top()[0][1], 'item 9999')
+
+
+if __name__ == '__main__':
+    unittest.main()
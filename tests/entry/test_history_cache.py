@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+import unittest
+
+from qtconsole.qt import QtGui, QtCore
+
+from chconsole.entry import HistoryCache, history_key
+from chconsole.entry.history import History
+from chconsole.messages import ExportItem, Source
+
+__author__ = 'minimair'
+
+
+class _Edit(QtGui.QPlainTextEdit):
+    please_export = QtCore.Signal(ExportItem)
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.app = QtGui.QApplication.instance() or QtGui.QApplication([])
+        self.dir = tempfile.mkdtemp()
+        self.edit = _Edit()
+        self.requests = list()
+        self.edit.please_export.connect(self.requests.append)
+        self.history = History(self.edit)
+        self.history.page = 2
+        self.history.fetch_ahead = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cache(self):
+        key = history_key('127.0.0.1', 50001, b'secret')
+        self.assertNotIn('secret', key)
+        self.assertEqual(HistoryCache(key, self.dir).load(), [])
+        HistoryCache(key, self.dir, max_entries=2).save([(1, 1, 'a'), (1, 2, 'b'), (2, 1, 'c')])
+        self.assertEqual(HistoryCache(key, self.dir).load(), [(1, 2, 'b'), (2, 1, 'c')])
+
+    def test_pages(self):
+        self.history.merge_history([(2, 3, 'c'), (2, 4, 'd')])
+        self.history.store(Source('e'))
+        self.assertTrue(self.history.previous())
+        self.assertTrue(self.history.previous())
+        self.assertEqual(self.edit.toPlainText(), 'd')
+        self.assertTrue(self.history.previous())
+        self.assertEqual(self.edit.toPlainText(), 'c')
+        self.assertFalse(self.history.previous())
+        request = self.requests[-1]
+        self.assertEqual((request.session, request.start, request.stop), (2, 1, 3))
+
+        self.history.merge_history([(2, 1, 'a'), (2, 2, 'b')])
+        self.assertEqual(self.edit.toPlainText(), 'c')
+        self.assertTrue(self.history.previous())
+        self.assertEqual(self.edit.toPlainText(), 'b')
+        self.assertTrue(self.history.previous())
+        self.assertFalse(self.history.previous())
+        request = self.requests[-1]
+        self.assertEqual((request.session, request.start, request.stop), (1, 1, 3))
+
+        self.history.merge_history([])  # session 1 is empty; there are no older sessions
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(self.history.next())
+        self.assertTrue(self.history.next())
+        self.assertTrue(self.history.next())
+        self.assertTrue(self.history.next())
+        self.assertEqual(self.edit.toPlainText(), 'e')
+
+    def test_merge(self):
+        cache = HistoryCache('test', self.dir)
+        cache.save([(1, 1, 'a'), (1, 2, 'b')])
+        self.history.set_cache(cache)
+        self.history.store(Source('c'))
+        self.history.merge_history([(1, 2, 'b'), (1, 3, 'c'), (1, 4, 'c')])
+        self.assertEqual(self.history.fuzzy_search._items, ['a', 'b', 'c'])
+        self.assertEqual(cache.load(), [(1, 1, 'a'), (1, 2, 'b')])  # written later
+        self.history.save_cache()
+        self.assertEqual(cache.load(), [(1, 1, 'a'), (1, 2, 'b'), (1, 3, 'c'), (1, 4, 'c')])
+
+    def test_keep_local(self):
+        self.history.merge_history([(2, 3, 'c'), (2, 4, 'd')])
+        self.history.store(Source('import numpy as np'))
+        self.history.merge_history([(2, 1, 'import numpy as np'), (2, 2, 'b')])  # older page with the same text
+        self.assertTrue(self.history.previous())
+        self.assertEqual(self.edit.toPlainText(), 'import numpy as np')
+        self.assertTrue(self.history.previous())
+        self.assertEqual(self.edit.toPlainText(), 'd')
+        self.history.merge_history([(2, 5, 'import numpy as np')])  # the tail includes the item stored
+        self.assertEqual(self.history.fuzzy_search._items, ['import numpy as np', 'b', 'c', 'd', 'import numpy as np'])
+
+    def test_save_later(self):
+        cache = HistoryCache('test', self.dir)
+        self.history.save_delay = 10
+        self.history.set_cache(cache)
+        self.history.merge_history([(1, 1, 'a')])
+        self.history.merge_history([(1, 2, 'b')])
+        self.assertEqual(cache.load(), [])
+        QtCore.QTimer.singleShot(100, self.app.quit)
+        self.app.exec_()
+        self.assertEqual(cache.load(), [(1, 1, 'a'), (1, 2, 'b')])
+
+    def test_gap(self):
+        cache = HistoryCache('test', self.dir)
+        cache.save([(1, 1, 'a'), (1, 2, 'b')])
+        self.history.set_cache(cache)
+        self.history.merge_history([(1, 9, 'i'), (1, 10, 'j')])  # tail newer than the cache
+        self.assertEqual(self.history.fuzzy_search._items, ['a', 'b', 'i', 'j'])
+        for start in (7, 5, 3):
+            request = self.requests[-1]
+            self.assertEqual((request.session, request.start, request.stop), (1, start, start + 2))
+            self.history.merge_history([(1, start, chr(ord('a') + start - 1)), (1, start + 1, chr(ord('a') + start))])
+        self.assertEqual(len(self.requests), 3)  # line 3 adjoins the cached items
+        self.assertEqual(self.history.fuzzy_search._items, list('abcdefghij'))
+        self.assertEqual(self.history._ranges, [((1, 1), (1, 10))])
+
+    def test_unaligned_gap(self):
+        cache = HistoryCache('test', self.dir)
+        cache.save([(1, 1, 'a'), (1, 2, 'b')])
+        self.history.set_cache(cache)
+        self.history.merge_history([(1, 8, 'h'), (1, 9, 'i')])
+        for start, stop in ((6, 8), (4, 6), (3, 4)):  # the cached lines are not requested again
+            request = self.requests[-1]
+            self.assertEqual((request.session, request.start, request.stop), (1, start, stop))
+            self.history.merge_history([(1, line, chr(ord('a') + line - 1)) for line in range(start, stop)])
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.history.fuzzy_search._items, list('abcdefghi'))
+
+    def test_previous_session(self):
+        self.history.fetch_ahead = 5
+        self.history.merge_history([(2, 1, 'x'), (2, 2, 'y')])
+        self.history.previous()
+        for start, stop, lines in ((1, 3, (1, 2)), (3, 5, (3, 4)), (5, 7, (5,))):  # paged forwards
+            request = self.requests[-1]
+            self.assertEqual((request.session, request.start, request.stop), (1, start, stop))
+            self.history.merge_history([(1, line, chr(ord('a') + line - 1)) for line in lines])
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.history._ranges, [((1, 1), (2, 2))])
+        self.assertEqual(self.history.fuzzy_search._items, list('abcdexy'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+
+from chconsole.entry.history_index import HistoryIndex
+
+__author__ = 'minimair'
+
+
+def _previous(items, substring, index, as_prefix):
+    while index > 0:
+        index -= 1
+        if (as_prefix and items[index].startswith(substring)) or (not as_prefix and substring in items[index]):
+            return index
+    return None
+
+
+def _next(items, substring, index, as_prefix):
+    while index + 1 < len(items):
+        index += 1
+        if (as_prefix and items[index].startswith(substring)) or (not as_prefix and substring in items[index]):
+            return index
+    return None
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.items = ['import os', 'x = 1', 'print(x)', 'import sys', 'x = 2', 'print(os.getcwd())']
+        self.index = HistoryIndex(self.items)
+
+    def tearDown(self):
+        pass
+
+    def test_prefix(self):
+        self.assertEqual(self.index.previous('import', 6), 3)
+        self.assertEqual(self.index.previous('import', 3), 0)
+        self.assertIsNone(self.index.previous('import', 0))
+        self.assertEqual(self.index.next('x =', 1), 4)
+        self.assertIsNone(self.index.next('x =', 4))
+        self.assertEqual(self.index.previous('', 6), 5)
+        self.assertEqual(self.index.next('', 2), 3)
+
+    def test_substring(self):
+        self.assertEqual(self.index.previous('os', 6, as_prefix=False), 5)
+        self.assertEqual(self.index.previous('os', 5, as_prefix=False), 0)
+        self.assertEqual(self.index.previous('(x', 6, as_prefix=False), 2)
+        self.assertEqual(self.index.next('= ', 1, as_prefix=False), 4)
+        self.assertIsNone(self.index.previous('missing', 6, as_prefix=False))
+
+    def test_append(self):
+        self.assertEqual(self.index.matches('print'), [2, 5])
+        self.assertEqual(self.index.matches('rint', as_prefix=False), [2, 5])
+        self.index.append('print(sys.path)')
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(self.index.previous('print', 7), 6)
+        self.assertEqual(self.index.previous('sys', 7, as_prefix=False), 6)
+        self.index.reset(['a'])
+        self.assertIsNone(self.index.previous('print', 1))
+
+    def test_random(self):
+        rng = random.Random(5)
+        items = [''.join(rng.choice('abc ') for _ in range(rng.randint(1, 8))) for _ in range(200)]
+        index = HistoryIndex(items[:100])
+        for item in items[100:]:
+            index.append(item)
+        for _ in range(500):
+            substring = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 4)))
+            position = rng.randint(0, len(items))
+            as_prefix = rng.random() < 0.5
+            self.assertEqual(index.previous(substring, position, as_prefix),
+                             _previous(items, substring, position, as_prefix))
+            self.assertEqual(index.next(substring, position, as_prefix),
+                             _next(items, substring, position, as_prefix))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from qtconsole.qt import QtGui, QtCore
+from PyQt5.QtTest import QTest
+
+from chconsole.entry.code_area_filter import CodeAreaFilter
+from chconsole.main.main_window import MainWindow
+
+__author__ = 'minimair'
+
+
+class _HistorySearch:
+    def __init__(self):
+        self.started = 0
+
+    def start(self):
+        self.started += 1
+
+
+class _Frontend(QtGui.QWidget):
+    """
+    Tab with an input area that has the event filter of the code area.
+    """
+    exit_requested = QtCore.Signal(object)
+
+    def __init__(self):
+        super(_Frontend, self).__init__()
+        self.code_area = QtGui.QPlainTextEdit(self)
+        self.code_area.history_search = _HistorySearch()
+        self.code_area_filter = CodeAreaFilter(self.code_area)
+        self.code_area.installEventFilter(self.code_area_filter)
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.app = QtGui.QApplication.instance() or QtGui.QApplication([])
+        self.window = MainWindow(self.app, confirm_exit=False)
+        self.frontend = _Frontend()
+        self.window.add_tab_with_frontend(self.frontend)
+        self.window.init_window_menu()
+        self.renamed = list()
+        self.window.rename_current_tab_act.triggered.disconnect()
+        self.window.rename_current_tab_act.triggered.connect(self.renamed.append)
+        self.window.show()
+        self.window.activateWindow()
+        QTest.qWaitForWindowActive(self.window)
+
+    def tearDown(self):
+        self.window.hide()
+        self.window.deleteLater()
+
+    def test_history_search(self):
+        self.frontend.code_area.setFocus()
+        QTest.keyClick(self.frontend.code_area, QtCore.Qt.Key_R, QtCore.Qt.ControlModifier)
+        self.assertEqual(self.frontend.code_area.history_search.started, 1)
+        self.assertEqual(self.renamed, [])
+
+    def test_rename_tab(self):
+        self.window.setFocus()
+        QTest.keyClick(self.window, QtCore.Qt.Key_R, QtCore.Qt.ControlModifier)
+        self.assertEqual(len(self.renamed), 1)
+        self.assertEqual(self.frontend.code_area.history_search.started, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
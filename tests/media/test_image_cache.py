@@ -0,0 +1,45 @@
+import unittest
+
+from qtconsole.qt import QtGui
+
+from chconsole.media import ImageCache, image_key
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.image = QtGui.QImage(10, 10, QtGui.QImage.Format_ARGB32)  # 400 bytes
+        self.cache = ImageCache(max_bytes=1000)
+
+    def tearDown(self):
+        pass
+
+    def test_key(self):
+        self.assertEqual(image_key('png', 'abc'), image_key('png', b'abc'))
+        self.assertNotEqual(image_key('png', 'abc'), image_key('jpeg', 'abc'))
+        self.assertNotEqual(image_key('png', 'abc'), image_key('png', 'abc', {'width': 5}))
+
+    def test_lru(self):
+        self.cache.put('a', self.image)
+        self.cache.put('b', self.image)
+        self.assertIs(self.cache.get('a'), self.image)
+        self.cache.put('c', self.image)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.size, 800)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_budget(self):
+        self.cache.put('a', self.image)
+        self.cache.put('a', self.image)
+        self.assertEqual(self.cache.size, 400)
+        self.cache.put('big', QtGui.QImage(100, 100, QtGui.QImage.Format_ARGB32))
+        self.assertIsNone(self.cache.get('big'))
+        self.cache.set_budget(100)
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
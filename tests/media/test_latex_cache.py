@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chconsole.media import LatexCache, latex_key
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.calls = list()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def render(self, text, **params):
+        self.calls.append(text)
+        return None if text == 'bad' else ('png:' + text).encode('utf-8')
+
+    def test_key(self):
+        self.assertEqual(latex_key('x', color='Black', scale=1.0), latex_key('x', scale=1.0, color='Black'))
+        self.assertNotEqual(latex_key('x', scale=1.0), latex_key('x', scale=2.0))
+
+    def test_memory(self):
+        cache = LatexCache('', max_entries=1)
+        self.assertEqual(cache.render(self.render, 'a'), b'png:a')
+        self.assertEqual(cache.render(self.render, 'a'), b'png:a')
+        cache.render(self.render, 'b')
+        cache.render(self.render, 'a')
+        self.assertEqual(self.calls, ['a', 'b', 'a'])
+
+    def test_disk(self):
+        LatexCache(self.dir).render(self.render, 'a', scale=1.0)
+        self.assertEqual(len(os.listdir(self.dir)), 1)
+        # a new cache, as after a restart, finds the rendering on disk
+        self.assertEqual(LatexCache(self.dir).render(self.render, 'a', scale=1.0), b'png:a')
+        self.assertEqual(self.calls, ['a'])
+
+    def test_failure(self):
+        cache = LatexCache(self.dir)
+        self.assertIsNone(cache.render(self.render, 'bad'))
+        self.assertIsNone(cache.render(self.render, 'bad'))
+        self.assertEqual(self.calls, ['bad', 'bad'])
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
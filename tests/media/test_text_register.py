@@ -0,0 +1,72 @@
+import unittest
+
+from qtconsole.qt import QtGui
+
+from chconsole.media import TextRegister
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.app = QtGui.QApplication.instance() or QtGui.QApplication([])
+        self.edit = QtGui.QTextEdit()
+        self.register = TextRegister(self.edit, max_field=10)
+        self.cursor = QtGui.QTextCursor(self.edit.document())
+
+    def tearDown(self):
+        self.edit.deleteLater()
+
+    def _label(self, text, username):
+        self.cursor.insertText('\n')
+        self.register.append(self.cursor.position(), username, style='in-prompt')
+        self.cursor.insertText(text)
+
+    def test_label(self):
+        self._label('a = 1', 'alice')
+        self.cursor.insertText('\noutput')
+        self._label('b = 2', 'bob')
+        document = self.edit.document()
+        labels = [self.register.label(document.findBlockByNumber(i)) for i in range(document.blockCount())]
+        self.assertEqual(labels, [None, ('alice', 'in-prompt'), None, ('bob', 'in-prompt')])
+        self.assertEqual(self.edit.toPlainText(), '\na = 1\noutput\nb = 2')
+
+    def test_visible(self):
+        self._label('a = 1', 'alice')
+        text = self.edit.toPlainText()
+        self.register.hide()
+        self.assertFalse(self.register.get_visible())
+        self.assertEqual(self.edit.toPlainText(), text)
+        self.register.show()
+        self.assertTrue(self.register.get_visible())
+
+    def test_field(self):
+        self._label('a = 1', 'al')
+        self.assertEqual(self.register._field, 4)
+        self._label('b = 2', 'bob')
+        self.assertEqual(self.register._field, 4)
+        self._label('c = 3', 'carol')
+        self.assertEqual(self.register._field, 8)
+        self._label('d = 4', 'a name longer than the field')
+        self.assertEqual(self.register._field, 10)
+
+    def test_prune(self):
+        self.edit.document().setMaximumBlockCount(6)
+        for i in range(10):
+            self._label('x = {}'.format(i), 'user{}'.format(i))
+            self.cursor.insertText('\noutput')
+        self.assertEqual(len(self.register), 3)
+        document = self.edit.document()
+        labels = [self.register.label(document.findBlockByNumber(i)) for i in range(document.blockCount())]
+        self.assertEqual([label[0] for label in labels if label], ['user7', 'user8', 'user9'])
+
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.movePosition(QtGui.QTextCursor.PreviousBlock, QtGui.QTextCursor.KeepAnchor, 2)
+        cursor.movePosition(QtGui.QTextCursor.EndOfBlock, QtGui.QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self.assertEqual(len(self.register), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import time
+import unittest
+
+from qtconsole.qt import QtGui, QtCore
+
+from chconsole.media import ImageRegister, insert_qimage_format
+from chconsole.messages import Png
+from chconsole.receiver import receiver_template
+from chconsole.receiver.image_renderer import ImageRenderer, ImageTicket
+
+__author__ = 'minimair'
+
+
+def _png(width):
+    """
+    PNG data of a transparent image.
+    :param width: width of the image.
+    :return: bytes.
+    """
+    image = QtGui.QImage(width, 3, QtGui.QImage.Format_ARGB32)
+    image.fill(QtCore.Qt.transparent)
+    data = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(data)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(data)
+
+
+def _wait(condition, timeout=5.0):
+    """
+    Process events until a condition holds.
+    :param condition: callable returning bool.
+    :param timeout: seconds to wait at most.
+    :return: whether the condition holds.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    return condition()
+
+
+# the thread pool of the renderers lives as long as the application, as it does in the console
+_app = QtGui.QApplication.instance() or QtGui.QApplication([])
+_Receiver = receiver_template(QtGui.QTextEdit)
+
+
+class _Document(QtGui.QTextEdit):
+    """
+    Text edit inserting and replacing placeholders of pending images like the receiver.
+    """
+    output_rendered = QtCore.Signal()
+    _placeholder_count = 0
+    insert_pending_image = _Receiver.insert_pending_image
+    _on_image_ready = _Receiver._on_image_ready
+
+    def __init__(self):
+        super(_Document, self).__init__()
+        self.name_to_svg_map = dict()
+        self.image_register = ImageRegister(self.document())
+        self._pending_images = dict()
+        self._placeholder = QtGui.QImage(1, 1, QtGui.QImage.Format_ARGB32)
+        self._placeholder.fill(QtCore.Qt.transparent)
+
+    @property
+    def idle(self):
+        return not self._pending_images
+
+    def insert_qimage(self, image_format, cursor=None):
+        insert_qimage_format(cursor, image_format)
+
+    def insert_pending(self, ticket):
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText('\n')
+        self.insert_pending_image(ticket, cursor)
+
+    def image_names(self):
+        names = list()
+        block = self.document().begin()
+        while block.isValid():
+            it = block.begin()
+            while not it.atEnd():
+                char_format = it.fragment().charFormat()
+                if char_format.isImageFormat():
+                    names.append(char_format.toImageFormat().name())
+                it += 1
+            block = block.next()
+        return names
+
+    def placeholder_freed(self, count):
+        resource = self.document().resource(QtGui.QTextDocument.ImageResource,
+                                            QtCore.QUrl('pending-image-{}'.format(count)))
+        return resource is None or resource.isNull()
+
+
+def _ready(key, width):
+    """
+    Ticket of an image that has been rendered.
+    :param key: content key of the image.
+    :param width: width of the image.
+    :return: ImageTicket.
+    """
+    ticket = ImageTicket(Png(_png(width)))
+    ticket.key = key
+    ticket.image = QtGui.QImage(width, 3, QtGui.QImage.Format_ARGB32)
+    ticket.ready = True
+    return ticket
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.renderer = ImageRenderer()
+        self.ready = list()
+        self.renderer.image_ready.connect(self.ready.append)
+
+    def tearDown(self):
+        self.renderer.deleteLater()
+
+    def test_render(self):
+        item = Png(_png(7))
+        ticket = self.renderer.request(item)
+        self.assertIs(self.renderer.request(item), ticket)
+        self.assertTrue(_wait(lambda: self.ready))
+        self.assertEqual(self.ready, [ticket])
+        self.assertTrue(ticket.ready)
+        self.assertIsNone(ticket.error)
+        self.assertEqual(ticket.image.width(), 7)
+
+    def test_shared(self):
+        first = self.renderer.request(Png(_png(8)))
+        second = self.renderer.request(Png(_png(8)))
+        self.assertIsNot(first, second)
+        self.assertTrue(_wait(lambda: len(self.ready) == 2))
+        self.assertEqual(first.key, second.key)
+        self.assertEqual(first.image.width(), second.image.width())
+
+    def test_invalid(self):
+        ticket = self.renderer.request(Png(b'no image'))
+        self.assertTrue(_wait(lambda: self.ready))
+        self.assertTrue(ticket.ready)
+        self.assertIsNone(ticket.image)
+        self.assertIsNotNone(ticket.error)
+
+    def test_order(self):
+        document = _Document()
+        document.output_rendered.connect(lambda: self.ready.append(document))
+        first = _ready('first', 4)
+        second = _ready('second', 5)
+        document.insert_pending(first)
+        document.insert_pending(second)
+        document._on_image_ready(second)
+        self.assertEqual(document.image_names(), ['pending-image-1', 'image-second'])
+        self.assertEqual(self.ready, [])
+        document._on_image_ready(first)
+        self.assertEqual(len(self.ready), 1)
+        self.assertEqual(document.image_names(), ['image-first', 'image-second'])
+        self.assertTrue(document.placeholder_freed(1))
+        self.assertTrue(document.placeholder_freed(2))
+        document.deleteLater()
+
+    def test_removed(self):
+        document = _Document()
+        ticket = _ready('removed', 4)
+        document.insert_pending(ticket)
+        self.assertFalse(document.placeholder_freed(1))
+        document.document().setMaximumBlockCount(1)  # truncation cuts off the placeholder
+        document._on_image_ready(ticket)
+        self.assertEqual(document.image_names(), [])
+        self.assertTrue(document.placeholder_freed(1))
+        self.assertEqual(len(document.image_register), 0)
+        document.deleteLater()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from chconsole.receiver.image_store import ImageStore
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.store = ImageStore(max_bytes=4)
+
+    def tearDown(self):
+        self.store.clear()
+
+    def test_spill(self):
+        self.store.put('a', 'abc')
+        self.assertEqual(self.store.directory, '')
+        self.store.put('b', b'de')
+        self.assertEqual(self.store.size, 2)
+        self.assertTrue(os.path.exists(os.path.join(self.store.directory, 'a')))
+        self.assertEqual(self.store.get('a'), 'abc')
+        self.assertEqual(self.store.size, 3)
+        self.assertEqual(self.store.get('b'), b'de')
+        self.assertIn('a', self.store)
+
+    def test_discard(self):
+        self.store.put('a', 'abc')
+        self.store.put('b', 'de')
+        self.store.discard('a')
+        self.store.discard('b')
+        self.assertNotIn('a', self.store)
+        self.assertIsNone(self.store.get('b'))
+        self.assertEqual(os.listdir(self.store.directory), [])
+        directory = self.store.directory
+        self.store.clear()
+        self.assertFalse(os.path.exists(directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from chconsole.receiver.metrics import Histogram, Metrics, count_bounds
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def tearDown(self):
+        pass
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 2, 3, 50, 500):
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.percentile(0.5), 10)
+        self.assertEqual(histogram.percentile(1.0), 500)
+        self.assertEqual(histogram.maximum, 500)
+        self.assertAlmostEqual(histogram.mean, 111.1)
+
+    def test_snapshot(self):
+        depth = [3]
+        self.metrics.gauge('depth', lambda: depth[0])
+        self.metrics.count('pages')
+        self.metrics.count('pages', 2)
+        self.metrics.observe('render_ms.Stdout', 0.3)
+        self.metrics.observe('flush.items', 7, count_bounds)
+        snapshot = json.loads(self.metrics.to_json())
+        self.assertEqual(snapshot['gauges'], {'depth': 3})
+        self.assertEqual(snapshot['counters'], {'pages': 3})
+        self.assertEqual(snapshot['histograms']['render_ms.Stdout']['count'], 1)
+        self.assertEqual(snapshot['histograms']['flush.items']['p50'], 7)
+        self.assertIn('render_ms.Stdout', self.metrics.to_html())
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()['histograms'], {})
+        self.assertEqual(self.metrics.snapshot()['gauges'], {'depth': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
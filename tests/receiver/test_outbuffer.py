@@ -0,0 +1,57 @@
+import unittest
+
+from qtconsole.qt import QtGui
+
+from chconsole.messages import Stdout
+from chconsole.receiver import OutputQueue
+from chconsole.receiver.outbuffer import OutBuffer
+
+__author__ = 'minimair'
+
+
+class _Target:
+    """
+    Receiver paged back: the document is unlimited while the configured window is not.
+    """
+    def __init__(self):
+        self.output_q = OutputQueue()
+        self.max_blocks = 500
+        self._document = QtGui.QTextDocument()
+        self._document.setMaximumBlockCount(0)
+        self.batches = list()
+
+    def document(self):
+        return self._document
+
+    def on_items_ready(self, items):
+        self.batches.append(list(items))
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.app = QtGui.QApplication.instance() or QtGui.QApplication([])
+        self.target = _Target()
+        self.out = OutBuffer(self.target, frame_budget=10000)
+
+    def tearDown(self):
+        pass
+
+    def test_paged_back(self):
+        for user in ('a', 'b', 'c'):
+            self.target.output_q.put(Stdout('1\n2\n3\n', username=user))
+        self.out.flush()
+        self.assertEqual(len(self.target.batches), 1)
+        self.assertEqual([item.content.data[0].text for item in self.target.batches[0]], ['1\n2\n3\n'] * 3)
+        self.assertFalse(self.out.pending)
+
+    def test_window(self):
+        self.target.max_blocks = 2
+        for user in ('a', 'b'):
+            self.target.output_q.put(Stdout('1\n2\n3\n', username=user))
+        self.out.flush()
+        self.assertEqual([item.content.data[0].text for item in self.target.batches[0]], ['1\n2\n'])
+        self.assertTrue(self.out.pending)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+
+from chconsole.messages import Stdout, Stderr, ClearOutput, Banner, Result, Content, Png, Input, PageDoc, SplitText
+from chconsole.receiver import OutputQueue
+from chconsole.receiver.output_queue import elision_text, collapse_returns
+
+__author__ = 'minimair'
+
+
+def _drain(q):
+    items = list()
+    while not q.empty():
+        items.append(q.get())
+        q.task_done()
+    return items
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.q = OutputQueue()
+
+    def tearDown(self):
+        pass
+
+    def test_merge(self):
+        for i in range(100):
+            self.q.put(Stdout('{}\n'.format(i), username='a'))
+        items = _drain(self.q)
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].content.data[0].text, ''.join('{}\n'.format(i) for i in range(100)))
+        self.assertEqual(self.q.merged, 99)
+        self.assertEqual(self.q.unfinished_tasks, 0)
+
+    def test_boundaries(self):
+        self.q.put(Stdout('a', username='a'))
+        self.q.put(Stdout('b', username='b'))
+        self.q.put(Stderr('c', username='b'))
+        self.q.put(Stderr('d', username='b'))
+        self.q.put(ClearOutput(wait=True))
+        self.q.put(Stderr('e', username='b'))
+        self.q.put(Banner('f'))
+        self.q.put(Stderr('g', username='b'))
+        texts = [item.content.data[0].text if type(item) in (Stdout, Stderr) else type(item).__name__
+                 for item in _drain(self.q)]
+        self.assertEqual(texts, ['a', 'b', 'cd', 'ClearOutput', 'e', 'Banner', 'g'])
+
+    def test_get_between_puts(self):
+        self.q.put(Stdout('a'))
+        self.q.put(Stdout('b'))
+        self.assertEqual(self.q.get().content.data[0].text, 'ab')
+        self.q.put(Stdout('c'))
+        self.assertEqual(self.q.get().content.data[0].text, 'c')
+        self.assertTrue(self.q.empty())
+
+    def test_elide(self):
+        q = OutputQueue(max_lines=100)
+        for i in range(1000):
+            q.put(Stdout('{}\n'.format(i), username='a'))
+            self.assertLessEqual(q.lines + q._kept_lines, 100)
+        texts = [item.content.data[0].text for item in _drain(q)]
+        self.assertEqual(texts[0], ''.join('{}\n'.format(i) for i in range(50)))
+        elided = 1000 - 50 - 50
+        self.assertEqual(texts[1], elision_text(elided, q.elided_bytes))
+        self.assertEqual(texts[2], ''.join('{}\n'.format(i) for i in range(950, 1000)))
+        self.assertEqual(q.elided_lines, elided)
+        self.assertEqual((q.size, q.lines, q.unfinished_tasks), (0, 0, 0))
+
+    def test_elide_items(self):
+        q = OutputQueue(max_bytes=10)
+        q.put(Stdout('ab'))
+        q.put(Stderr('cdefgh'))
+        q.put(ClearOutput())
+        q.put(Stdout('xyz\n' * 3))
+        texts = [item.content.data[0].text if type(item) in (Stdout, Stderr) else type(item).__name__
+                 for item in _drain(q)]
+        self.assertEqual(texts, ['ab', elision_text(2, 14), 'ClearOutput', 'xyz\n'])
+
+    def test_keep_chat(self):
+        q = OutputQueue(max_lines=100)
+        for i in range(200):
+            q.put(Stdout('{}\n'.format(i), username='a'))
+        q.put(Input('print(1)', execution_count=1, username='bob'))
+        q.put(Result(Content(SplitText('1')), execution_count=1, username='bob'))
+        q.put(PageDoc(text='help', username='bob'))
+        q.put(Banner('banner'))
+        for i in range(200):
+            q.put(Stdout('{}\n'.format(i), username='a'))
+        kinds = [type(item).__name__ for item in _drain(q)]
+        self.assertEqual(kinds, ['Stdout', 'Stderr', 'Input', 'Result', 'PageDoc', 'Banner', 'Stdout'])
+        self.assertEqual(q.unfinished_tasks, 0)
+
+    def test_keep_large(self):
+        q = OutputQueue(max_bytes=10)
+        q.put(Stdout('x' * 100))
+        q.put(Result(Content(Png('p' * 100))))
+        q.put(Stdout('abcdefgh'))
+        q.put(Result(Content(Png('q' * 100))))
+        q.put(Stdout('ij'))
+        items = _drain(q)
+        self.assertEqual(items[0].content.data[0].text, 'x' * 100)
+        self.assertEqual(items[1].content.data[0].image, 'p' * 100)
+        self.assertEqual(items[2].content.data[0].text, elision_text(0, 8))
+        self.assertEqual(items[3].content.data[0].image, 'q' * 100)
+        self.assertEqual(items[4].content.data[0].text, 'ij')
+        self.assertEqual((q.size, q.lines, q.unfinished_tasks), (0, 0, 0))
+
+        q.put(Stdout('x' * 100))
+        q.put(Result(Content(Png('p' * 100))))
+        q.put(Stderr('ab'))
+        texts = [item.content.data[0].text if type(item) is Stderr else type(item).__name__ for item in _drain(q)]
+        self.assertEqual(texts[1:], ['Result', 'ab'])
+        self.assertEqual(q.unfinished_tasks, 0)
+
+    def test_collapse_returns(self):
+        self.assertEqual(collapse_returns('10%\r20%\r100%\ndone\n'), '100%\ndone\n')
+        self.assertEqual(collapse_returns('abcdef\rxy\r'), 'xycdef\r')
+        self.assertEqual(collapse_returns('\r 5%\r10%'), '\r10%')
+        self.assertEqual(collapse_returns('x\r\ny\rz\r\n'), 'x\r\nz\r\n')
+        self.assertEqual(collapse_returns('a\x1b[1m\rb\n'), 'a\x1b[1m\rb\n')
+
+    def test_collapse_merged(self):
+        for i in range(101):
+            self.q.put(Stderr('\r{}%'.format(i)))
+        self.q.put(Stderr('\n'))
+        self.q.put(ClearOutput())
+        self.assertEqual(self.q.get().content.data[0].text, '\r100%\n')
+        self.assertEqual(self.q.size, 0)
+        self.assertEqual(self.q.lines, 0)
+
+    def test_drop_frames(self):
+        for i in range(10):
+            self.q.put(ClearOutput(wait=True))
+            self.q.put(Stdout('frame {}\n'.format(i)))
+            self.q.put(Stdout('more\n'))
+        items = _drain(self.q)
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[0], ClearOutput)
+        self.assertEqual(items[1].content.data[0].text, 'frame 9\nmore\n')
+        self.assertEqual(self.q.dropped_frames, 9)
+        self.assertEqual((self.q.size, self.q.lines, self.q.unfinished_tasks), (0, 0, 0))
+
+    def test_keep_frames(self):
+        self.q.put(ClearOutput(wait=True))
+        self.q.put(Stderr('error\n'))  # not cleared
+        self.q.put(ClearOutput(wait=True))
+        self.q.put(Stdout('a'))
+        self.assertIsInstance(self.q.get(), ClearOutput)
+        self.assertEqual(self.q.get().content.data[0].text, 'error\n')
+        self.assertIsInstance(self.q.get(), ClearOutput)
+        self.q.put(ClearOutput(wait=True))  # the frame of the ClearOutput taken is kept
+        self.q.put(Stdout('b'))
+        self.q.put(ClearOutput(wait=True))
+        self.q.put(Stdout('c'))
+        texts = [item.content.data[0].text if type(item) in (Stdout, Stderr) else type(item).__name__
+                 for item in _drain(self.q)]
+        self.assertEqual(texts, ['a', 'ClearOutput', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from chconsole.receiver.text_store import TextStore
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.store = TextStore(max_bytes=4)
+
+    def tearDown(self):
+        self.store.clear()
+
+    def test_spill(self):
+        self.store.extend(b'abc')
+        self.assertEqual(self.store.size, 3)
+        self.store.extend(b'de')
+        self.assertEqual(self.store.size, 2)
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(self.store.get(0, 5), b'abcde')
+        self.assertEqual(self.store.get(1, 2), b'b')
+        self.assertEqual(self.store.get(2, 4), b'cd')
+        self.assertEqual(self.store.get(4, 5), b'e')
+
+    def test_truncate(self):
+        self.store.extend(b'abcdef')
+        self.store.truncate(5)
+        self.assertEqual(self.store.get(0, len(self.store)), b'abcde')
+        self.store.truncate(1)
+        self.assertEqual(len(self.store), 1)
+        self.store.extend(b'xyz12')
+        self.assertEqual(self.store.get(0, len(self.store)), b'axyz12')
+
+    def test_clear(self):
+        self.store.extend(b'abcdef')
+        self.store.clear()
+        self.assertEqual((len(self.store), self.store.size), (0, 0))
+        self.store.extend(b'gh')
+        self.assertEqual(self.store.get(0, 2), b'gh')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from chconsole.messages import Stdout, Stderr, ClearOutput, Input, Result, Png, PageDoc, Content, SplitText, Banner
+from chconsole.receiver.transcript import Transcript, unavailable_image_text
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.transcript = Transcript()
+
+    def tearDown(self):
+        pass
+
+    def test_record(self):
+        self.transcript.record(Input('print(1)', execution_count=3, username='a'))
+        self.transcript.record(Stdout('1\n2\n', username='a'))
+        self.transcript.record(Stderr('ü\n', username='b'))
+        self.assertEqual(len(self.transcript), 3)
+        self.assertEqual(self.transcript.lines(1), 2)
+        item = self.transcript.item(0)
+        self.assertIsInstance(item, Input)
+        self.assertEqual((item.code, item.execution_count, item.username), ('print(1)', 3, 'a'))
+        item = self.transcript.item(2)
+        self.assertIs(type(item), Stderr)
+        self.assertEqual((item.content.text, item.username, item.clearable), ('ü\n', 'b', False))
+
+    def test_image(self):
+        content = Content(SplitText('text'))
+        content.append(Png('data', {'width': 3}))
+        self.transcript.record(Result(content, execution_count=2))
+        item = self.transcript.item(0)
+        self.assertIsInstance(item, Result)
+        image = item.content.get(Png)
+        self.assertEqual((image.image, image.metadata), ('data', {'width': 3}))
+        self.assertEqual(item.content.text, 'text')
+        self.transcript.record(PageDoc(html='<b>x</b>'))
+        self.assertEqual(self.transcript.item(1).html_stream.content.text, '<b>x</b>')
+
+    def test_image_store(self):
+        transcript = Transcript(image_bytes=6)
+        for data in ('aaaa', 'bbbb', 'aaaa'):
+            transcript.record(Png(data))
+        self.assertEqual(transcript.image_size, 4)
+        self.assertEqual([transcript.item(i).image for i in range(3)], ['aaaa', 'bbbb', 'aaaa'])
+        transcript.pop()
+        self.assertEqual(transcript.item(0).image, 'aaaa')
+        transcript.pop()
+        transcript.pop()
+        self.assertEqual(transcript.image_size, 0)
+        transcript.clear()
+
+    def test_image_lost(self):
+        transcript = Transcript(image_bytes=0)
+        transcript.record(Stdout(Content(Png('data')), username='a'))
+        transcript._image_store.clear()
+        item = transcript.item(0)
+        self.assertIs(type(item), Stdout)
+        self.assertIsNone(item.content.get(Png))
+        self.assertEqual(item.content.text, unavailable_image_text)
+
+    def test_clear_output(self):
+        self.transcript.record(Stdout('a'))
+        self.transcript.record(ClearOutput())
+        self.assertEqual(len(self.transcript), 0)
+        self.assertEqual(self.transcript.size, 0)
+        self.transcript.record(Stderr('b'))
+        self.transcript.record(ClearOutput())
+        self.assertEqual(self.transcript.text(0), 'b')
+
+    def test_banner(self):
+        self.transcript.record(Banner('Python\n', help_links=[{'text': 'Docs', 'url': 'http://docs'}], username='a'))
+        item = self.transcript.item(0)
+        self.assertIs(type(item), Stdout)
+        self.assertEqual((item.content.text, item.username), ('Python\n\nHelp Links\nDocs: http://docs\n', 'a'))
+
+    def test_text_spill(self):
+        transcript = Transcript(text_bytes=4)
+        for text in ('abc', 'dü', 'efgh', 'ij'):
+            transcript.record(Stdout(text))
+        self.assertLessEqual(transcript.size, 4)
+        self.assertEqual([transcript.text(index) for index in range(4)], ['abc', 'dü', 'efgh', 'ij'])
+        transcript.pop()
+        transcript.pop()
+        transcript.record(Stdout('kl'))
+        self.assertEqual([transcript.text(index) for index in range(3)], ['abc', 'dü', 'kl'])
+        transcript.clear()
+        self.assertEqual(transcript.size, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,2 @@
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
+
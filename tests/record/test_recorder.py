@@ -0,0 +1,78 @@
+import queue
+import shutil
+import tempfile
+import unittest
+
+from chconsole.archive import Spool
+from chconsole.messages import KernelMessage
+from chconsole.record import Recorder
+from chconsole.record.record import RecordApp
+from tests.archive.test_archiver import _Database
+
+__author__ = 'minimair'
+
+
+def _message(msg_id, msg_type, content=None):
+    return {'header': {'msg_id': msg_id, 'msg_type': msg_type, 'username': 'u', 'session': 's'},
+            'parent_header': {}, 'content': content if content is not None else {}}
+
+
+class _KernelClient:
+    """
+    Kernel client replaying a session on the iopub channel, then stopping the recorder.
+    """
+    def __init__(self, recorder, messages):
+        self.recorder = recorder
+        self.messages = list(messages)
+
+    def get_iopub_msg(self, timeout=None):
+        if not self.messages:
+            self.recorder.stop()
+            raise queue.Empty()
+        return self.messages.pop(0)
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.database = _Database(unique=True)
+        self.recorder = Recorder(pool=self.database, spool=Spool(self.dir), user_name='rec', chat_secret='sec')
+
+    def tearDown(self):
+        self.recorder.close()
+        shutil.rmtree(self.dir)
+
+    def test_broadcast(self):
+        self.assertTrue(KernelMessage(_message('1', 'stream')).broadcast)
+        self.assertFalse(KernelMessage(_message('2', 'execute_reply')).broadcast)
+
+    def test_record(self):
+        session = [_message('m1', 'status', {'execution_state': 'busy'}),
+                   _message('m2', 'execute_input', {'code': 'print(1)', 'execution_count': 1}),
+                   _message('m3', 'stream', {'name': 'stdout', 'text': '1\n'}),
+                   _message('m4', 'execute_reply', {'status': 'ok'}),
+                   _message('m5', 'status', {'execution_state': 'idle'})]
+        self.recorder.record(_KernelClient(self.recorder, session))
+        archiver = self.recorder._archiver
+        archiver.close(wait=True)
+        self.assertTrue(archiver._replay_segment(archiver._spool.claim()))
+        self.assertEqual(self.recorder.stats['recorded'], 4)
+        self.assertEqual(self.recorder.stats['written'], 4)
+
+        statement = self.database.statements[-1]
+        self.assertIn('on conflict (msg_id) do nothing', statement)
+        for msg_id in ('m1', 'm2', 'm3', 'm5'):
+            self.assertIn("'{}'".format(msg_id), statement)
+        self.assertNotIn("'m4'", statement)
+        self.assertIn("'rec', 'sec'", statement)
+
+    def test_aliases(self):
+        app = RecordApp()
+        app.parse_command_line(['--user=x', '--secret=s', '--key=k'])
+        self.assertEqual(app.config.Recorder.user_name, 'x')
+        self.assertEqual(app.config.Recorder.chat_secret, 's')
+        self.assertEqual(app.config.RecordApp.key, 'k')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1 @@
+__author__ = 'Manfred Minimair <manfred@minimair.org>'
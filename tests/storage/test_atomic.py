@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chconsole.storage import write_atomically
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'sub', 'file')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write(self):
+        write_atomically(self.path, 'ü')
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), 'ü'.encode('utf-8'))
+        write_atomically(self.path, b'\x00png')
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'\x00png')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['file'])
+
+    def test_failure(self):
+        write_atomically(self.path, 'old')
+        self.assertRaises(TypeError, write_atomically, self.path, None)
+        os.makedirs(self.path + '.dir')
+        self.assertRaises(OSError, write_atomically, self.path + '.dir', 'new')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['file', 'file.dir'])
+
+
+if __name__ == '__main__':
+    unittest.main()
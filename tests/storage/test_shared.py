@@ -0,0 +1,30 @@
+import unittest
+
+from chconsole.storage import SharedInstances
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.shared = SharedInstances()
+
+    def tearDown(self):
+        pass
+
+    def test_get(self):
+        first = self.shared.get(list)
+        self.assertIs(self.shared.get(list), first)
+        other = self.shared.get(list, 'other')
+        self.assertIsNot(other, first)
+        self.assertIs(self.shared.get(dict, 'other'), other)
+
+    def test_pop_all(self):
+        first = self.shared.get(list)
+        self.assertEqual(self.shared.pop_all(), [first])
+        self.assertEqual(self.shared.pop_all(), [])
+        self.assertIsNot(self.shared.get(list), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
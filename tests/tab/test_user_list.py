@@ -0,0 +1,74 @@
+import unittest
+from types import SimpleNamespace
+
+from qtconsole.qt import QtGui
+
+from chconsole.tab import tab_content_template, UserTracker
+
+__author__ = 'minimair'
+
+
+class Tester(unittest.TestCase):
+    def setUp(self):
+        self.app = QtGui.QApplication.instance() or QtGui.QApplication([])
+        self.update = tab_content_template(QtGui.QTextEdit).update_user_list
+        self.tracker = UserTracker()
+        self.tracker.insert('me', '0')
+        self.tracker.insert('b<c', '1')
+        self.pager = QtGui.QTextEdit()
+        self.pager.replace = self.replace
+        self.replaced = 0
+        self.target = SimpleNamespace(pager=self.pager, user_tracker=self.tracker, user_name='me',
+                                      _user_list_state=1)
+        self.show()
+
+    def tearDown(self):
+        self.pager.deleteLater()
+
+    def replace(self, item):
+        self.replaced += 1
+        self.pager.clear()
+        self.pager.insertHtml(item.html_stream.content.text)
+
+    def show(self):
+        self.pager.clear()
+        self.pager.insertHtml(self.tracker.html_user_list('me'))
+        self.pager.document().lastBlock().setUserState(1)
+
+    def shown(self):
+        return self.pager.document().lastBlock().text().split('\u2028')[1:]
+
+    def test_0(self):
+        self.assertEqual(self.shown(), ['b<c', 'me (me)'])
+
+    def test_1(self):
+        index = self.tracker.insert('a', '2')
+        self.update(self.target, index, 'a', True)
+        index = self.tracker.insert('z', '3')
+        self.update(self.target, index, 'z', True)
+        self.assertEqual(self.shown(), ['a', 'b<c', 'me (me)', 'z'])
+        self.assertEqual(self.replaced, 0)
+
+    def test_2(self):
+        index = self.tracker.remove('b<c', '1')
+        self.update(self.target, index, 'b<c', False)
+        self.assertEqual(self.shown(), ['me (me)'])
+        self.assertEqual(self.replaced, 0)
+
+    def test_3(self):
+        self.pager.document().lastBlock().setUserState(-1)
+        index = self.tracker.insert('a', '2')
+        self.update(self.target, index, 'a', True)
+        self.assertEqual(self.shown(), ['b<c', 'me (me)'])
+
+    def test_4(self):
+        # The list shown is out of date: render it again.
+        self.tracker.insert('a', '2')
+        index = self.tracker.insert('z', '3')
+        self.update(self.target, index, 'z', True)
+        self.assertEqual(self.shown(), ['a', 'b<c', 'me (me)', 'z'])
+        self.assertEqual(self.replaced, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
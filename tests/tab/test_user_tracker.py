@@ -79,5 +79,37 @@ class Tester(unittest.TestCase):
         res = self.s.users
         self.assertEqual(res, [UserClient('aa', ['3']), UserClient('ab', ['2']), UserClient('bb', ['1'])])
 
+    def test_10(self):
+        self.assertEqual(self.s.insert('bb', '1'), 0)
+        self.assertEqual(self.s.insert('aa', '0'), 0)
+        self.assertIsNone(self.s.insert('aa', '2'))
+        self.assertEqual(self.s.insert('ab', '3'), 1)
+        self.assertIsNone(self.s.remove('aa', '0'))
+        self.assertIsNone(self.s.remove('cc', '4'))
+        self.assertEqual(self.s.remove('ab', '3'), 1)
+        self.assertEqual(self.s.names, ['aa', 'bb'])
+        self.assertTrue(self.s.last_client('aa'))
+        self.assertFalse(self.s.last_client('cc'))
+
+    def test_11(self):
+        self.assertEqual(self.s.html_user_list('aa'), '')
+        self.s.insert('b<b', '1')
+        self.s.insert('aa', '0')
+        self.assertEqual(self.s.html_user_list('aa'),
+                         'Connected Users (Press Esc button to exit view)<hr><br>aa (me)<br>b&lt;b')
+
+    def test_12(self):
+        header = 'Connected Users (Press Esc button to exit view)<hr><br>'
+        self.s.insert('bb', '1')
+        self.s.insert('aa', '0')  # join
+        self.assertEqual(self.s.html_user_list('bb'), header + 'aa<br>bb (me)')
+        self.s.remove('aa', '0')  # leave
+        self.assertEqual(self.s.html_user_list('bb'), header + 'bb (me)')
+        self.s.remove('bb', '1')  # rename: leave with the old name, join with the new one
+        self.s.insert('cc', '1')
+        self.assertEqual(self.s.html_user_list('cc'), header + 'cc (me)')
+        self.s.insert('<i>x</i> & y', '2')
+        self.assertEqual(self.s.html_user_list('cc'), header + '&lt;i&gt;x&lt;/i&gt; &amp; y<br>cc (me)')
+
 if __name__ == '__main__':
     unittest.main()